@@ -0,0 +1,122 @@
+"""
+Frames of an animated run written to a video or an image sequence instead of
+a window. The run goes as fast as the frames can be drawn, see
+``core.FrameEnvironment``, each frame is the picture the window would show at
+the same simulated time.
+
+- ``*.mp4``, ``*.mkv``, ``*.webm``, ``*.avi``, ``*.mov`` raw frames are piped
+  to ``ffmpeg``, which has to be on the PATH
+- anything else is a folder of ``frame_000000.jpg`` files
+
+    python main.py Cache --export output/video/cache.mp4 --frame-skip 2 --resolution 800x720
+"""
+
+import os
+import time
+import shutil
+import subprocess
+from os.path import join, splitext
+
+import pygame
+from constants import *
+
+VIDEO_FORMATS = (".mp4", ".mkv", ".webm", ".avi", ".mov")
+# Format of image sequences, png is lossless but ten times slower to write
+IMAGE_FORMAT = "jpg"
+# Frames between progress lines in the log
+PROGRESS_INTERVAL = 1000
+
+
+def parse_resolution(text):
+    """ "800x720" -> (800, 720)"""
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+
+class FrameWriter:
+    """
+    Handed every frame the ``FrameRenderer`` draws, keeps one in ``frame_skip``
+
+    :param path: video file or folder of images, see the module docstring
+    :param frame_skip: keep every n-th frame, the video's frame rate is lowered
+        to match so it still plays at the speed of the window
+    :param resolution: ``(width, height)`` of the written frames, the window's by default
+    :param image_format: extension of the images of an image sequence,
+        ``IMAGE_FORMAT`` by default
+    """
+
+    def __init__(
+        self,
+        path,
+        frame_skip=1,
+        resolution=None,
+        image_format=None,
+        logger=None,
+    ):
+        if frame_skip < 1:
+            raise ValueError("frame_skip has to be at least 1")
+        self.path = path
+        self.frame_skip = frame_skip
+        self.resolution = tuple(resolution) if resolution else (WIDTH, HEIGHT)
+        self.image_format = IMAGE_FORMAT if image_format is None else image_format
+        self.logger = logger
+        self.frames_drawn = 0
+        self.frames_written = 0
+        self._started = time.perf_counter()
+
+        self._ffmpeg = None
+        if splitext(path)[1].lower() in VIDEO_FORMATS:
+            ffmpeg = shutil.which("ffmpeg")
+            if ffmpeg is None:
+                raise RuntimeError(
+                    f"ffmpeg is needed to write {path}, export to a folder of images instead"
+                )
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            width, height = self.resolution
+            # Piped raw, the encoder is far faster than saving each frame
+            self._ffmpeg = subprocess.Popen(
+                [ffmpeg, "-y", "-loglevel", "error"]
+                + ["-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}"]
+                + ["-r", str(FPS / frame_skip), "-i", "-"]
+                + ["-pix_fmt", "yuv420p", path],
+                stdin=subprocess.PIPE,
+            )
+        else:
+            os.makedirs(path, exist_ok=True)
+
+    def take_frame(self):
+        """Whether the next frame is written, the renderer skips it otherwise"""
+        take = self.frames_drawn % self.frame_skip == 0
+        self.frames_drawn += 1
+        return take
+
+    def write(self, surface):
+        if surface.get_size() != self.resolution:
+            surface = pygame.transform.smoothscale(surface, self.resolution)
+
+        if self._ffmpeg is not None:
+            self._ffmpeg.stdin.write(pygame.image.tobytes(surface, "RGB"))
+        else:
+            name = f"frame_{self.frames_written:06d}.{self.image_format}"
+            pygame.image.save(surface, join(self.path, name))
+        self.frames_written += 1
+
+        if self.logger is not None and self.frames_written % PROGRESS_INTERVAL == 0:
+            self.logger.info(
+                "Exported %d frames, %.0f frames/s"
+                % (self.frames_written, self.frames_written / self.elapsed())
+            )
+
+    def elapsed(self):
+        return time.perf_counter() - self._started
+
+    def close(self):
+        if self._ffmpeg is not None:
+            self._ffmpeg.stdin.close()
+            if self._ffmpeg.wait() != 0:
+                raise RuntimeError(f"ffmpeg failed to write {self.path}")
+        if self.logger is not None:
+            self.logger.info(
+                "Exported %d frames to %s in %.1fs"
+                % (self.frames_written, self.path, self.elapsed())
+            )
@@ -0,0 +1,41 @@
+"""
+Fonts and rendered text shared by everything drawn on the window. A font is
+opened once per (name, size), and a text surface is rendered once per
+(font, text, colour) until it falls out of the LRU cache.
+"""
+
+from collections import OrderedDict
+import pygame
+from constants import *
+
+_fonts = {}
+_texts = OrderedDict()
+
+
+def get_font(name, size):
+    """
+    :param name: system font name, looked up with ``match_font``, or None for
+        pygame's default font
+    """
+    key = (name, size)
+    font = _fonts.get(key)
+    if font is None:
+        path = pygame.font.match_font(name) if name is not None else None
+        font = _fonts[key] = pygame.font.Font(path, size)
+
+    return font
+
+
+def render_text(font, text, color, antialias=True):
+    """``font.render``, cached. The surface is shared, callers must not draw on it."""
+    key = (font, text, tuple(color), antialias)
+    surface = _texts.get(key)
+    if surface is None:
+        surface = font.render(text, antialias, color)
+        _texts[key] = surface
+        if len(_texts) > TEXT_CACHE_SIZE:
+            _texts.popitem(last=False)
+    else:
+        _texts.move_to_end(key)
+
+    return surface
@@ -0,0 +1,92 @@
+"""
+Drop-in replacement for ``animation.utils`` used when the simulation runs
+without a display. Every helper keeps the same signature but does no drawing,
+so ``Carpark`` can call them unconditionally.
+
+Only ``moveLift`` does real work: the lift position is simulation state, so it
+is still stepped level by level with the same timeouts as the animated version.
+"""
+
+import simpy
+from simulation import events
+
+
+class NullSprite:
+    """Stands in for a floor sprite when there is no layout to look it up in"""
+
+    def __init__(self):
+        self.pos = (0, 0)
+        self.default_pos = (0, 0)
+
+
+NULL_SPRITE = NullSprite()
+
+
+def findCoord(level_layout, destObj):
+    return (0, 0)
+
+
+def findShuttle(level_layout, shuttle):
+    return NULL_SPRITE
+
+
+def findGroundLiftCoord(layout, lift):
+    return (0, 0)
+
+
+def moveIntoGroundLift(vehicle, dest_coord, time_duration):
+    pass
+
+
+def moveOutOfLift(vehicle, dest_coord, time_duration):
+    pass
+
+
+def moveShuttle(shuttle_sprite, time_duration, coord, lift=False):
+    pass
+
+
+def moveLiftToPallet(vehicle, time_duration, coord):
+    pass
+
+
+def moveOriginToLot(vehicle, shuttle_sprite, time_duration, coord):
+    pass
+
+
+def rotateVehicle(vehicle, time_duration, coord):
+    pass
+
+
+def movePalletToLot(vehicle, time_duration, coord):
+    pass
+
+
+def moveLift(
+    env, layout, lift, dest, time_duration, vehicle=None, recorder=None, fromWhere=None
+):
+    try:
+        if recorder is not None:
+            recorder.record(events.LIFT_CALLED, fromWhere, lift.num, dest, lift.pos)
+        # -ve = going down; +ve = going up; 0 = no change
+        no_of_levels = dest - lift.pos
+
+        if no_of_levels == 0 or time_duration == 0:
+            return
+
+        each_level_time = time_duration / abs(no_of_levels)
+        for _ in range(abs(no_of_levels)):
+            old_pos = lift.pos + 1
+            if no_of_levels < 0:
+                lift.pos -= 1
+            else:
+                lift.pos += 1
+
+            yield env.timeout(each_level_time)
+            if recorder is not None:
+                recorder.record(
+                    events.LIFT_MOVED, lift.num, old_pos, lift.pos + 1, no_of_levels
+                )
+    except simpy.Interrupt:
+        if recorder is not None:
+            recorder.record(events.LIFT_INTERRUPTED, lift.num)
@@ -5,6 +5,7 @@ from os.path import isfile, join
 from pygame.math import Vector2
 
 from constants import *
+from animation.fonts import get_font, render_text
 
 
 class Object(pygame.sprite.Sprite):
@@ -20,8 +21,8 @@ class Object(pygame.sprite.Sprite):
         win.blit(self.image, (self.rect.x, self.rect.y))
 
     def add_text(self, text, font_size):
-        font = pygame.font.Font(pygame.font.match_font("arial"), font_size)
-        text_surface = font.render(text, True, (255, 255, 255))
+        font = get_font("arial", font_size)
+        text_surface = render_text(font, text, (255, 255, 255))
         text_rect = text_surface.get_rect(center=self.image.get_rect().center)
         self.image.blit(text_surface, text_rect.topleft)
 
@@ -113,6 +114,8 @@ class Lift_Floor(Object):
             )
             surface.fill((106, 106, 106, 178))  # 60%
             self.image.blit(surface, (0, 0))
+        # Tells the renderer to composite the lift again
+        self.dirty = True
 
     def toggle_Occupancy(self):
         self.is_Occupied = not self.is_Occupied
@@ -120,7 +123,7 @@ class Lift_Floor(Object):
 
 
 class Shuttle_Floor(Object):
-    def __init__(self, x, y, width, height, id, bounds):
+    def __init__(self, x, y, width, height, id, bounds, env=None):
         super().__init__(x, y, width, height, id)
         floor = generate_floor_texture(
             width,
@@ -131,30 +134,27 @@ class Shuttle_Floor(Object):
         )
         self.image.blit(floor, (0, 0))
         self.add_text("S" + str(id), 18)
-        self.velo = Vector2(0, 0)
         self.pos = Vector2(x, y)
-        self.destination = Vector2(0, 0)
+        # Motion of self.pos, see animation.motion
+        self.motion = None
         self.default_pos = Vector2(x, y)
         self.bounds = bounds
+        # Clock the moves are timed by, None when only drawn
+        self.env = env
 
-    def move(self):
-        # logger.info("bounds: ", self.bounds)
+    def moving(self, now):
+        return self.motion is not None and not self.motion.done(now)
+
+    def move(self, now):
+        """Puts the shuttle where it is at simulated time ``now``"""
+        if self.motion is not None:
+            self.pos = self.motion.at(now)
+            if self.motion.done(now):
+                self.motion = None
 
         self.pos[0] = max(self.bounds[0], min(self.pos[0], self.bounds[1]))
-        distance = self.destination - self.pos
-        if distance.length() < TOLERANCE and self.velo != 0:
-            self.velo = Vector2(0, 0)
-            self.pos = Vector2(self.destination)
-            self.rect.topleft = self.destination
-            return
-
-        self.pos += self.velo
         self.rect.topleft = (int(self.pos[0]), int(self.pos[1]))
 
-    def __call__(self, win):
-        win.blit(self.image, (self.rect.x, self.rect.y))
-        self.move()
-
 
 class Wall_Borders(Object):
     def __init__(self, floors_group, id):
@@ -179,40 +179,48 @@ class Wall_Borders(Object):
         pygame.draw.rect(win, (0, 0, 0), self.rect, 2)
 
         if self.id:
-            font = pygame.font.Font(None, 24)
-            text_surface = font.render(self.id, True, (255, 255, 255))
+            font = get_font(None, 24)
+            text_surface = render_text(font, self.id, (255, 255, 255))
             text_rect = text_surface.get_rect(center=self.rect.center)
             win.blit(text_surface, text_rect)
 
 
 class FloorLayout(pygame.sprite.Group):
-    def __init__(self, y_offset, level_number):
-        self.horizontal_offset = (WIDTH - TOTAL_WIDTH) // 2
-        self.y_offset = y_offset
+    """Sprites of one level, placed by the carpark ``Geometry``"""
+
+    def __init__(self, y_offset, level_number, geometry, env=None):
+        self.geometry = geometry
+        self.env = env
         self.GRID_WIDTH = GRID_WIDTH
         self.GRID_HEIGHT = GRID_HEIGHT
+        self.TOTAL_WIDTH = geometry.track_length * GRID_WIDTH + 4  # Border
+        self.horizontal_offset = (WIDTH - self.TOTAL_WIDTH) // 2
+        self.y_offset = y_offset
         self.level_number = level_number
-        self.TOTAL_WIDTH = TOTAL_WIDTH
         self.floors_group = pygame.sprite.Group()
 
+    def track_x(self, pos):
+        # Left edge of the column at track position ``pos``
+        return self.horizontal_offset + (pos - 1) * self.GRID_WIDTH
+
     def create_floors_group(self, isCache=False):
         floors_group_list = []
         self.create_parking_floors(floors_group_list, isCache)
         self.create_lift_floors(floors_group_list)
         if isCache:
             self.create_lobby_floors(floors_group_list)
-        self.create_south_east_parking_floors(floors_group_list)
+        self.create_shuttle_floor(floors_group_list)
         self.create_wall_borders(floors_group_list)
         floors_group_list.reverse()
         for sprite in floors_group_list:
             self.floors_group.add(sprite)
 
     def create_lobby_floors(self, floors_group):
-        lift_offset = self.horizontal_offset + 128
-        for i, lobby_no in enumerate(range(1, 2)):
+        # Lobby and lift bays are 3 lots wide, centred on their track position
+        for lobby_no, pos in enumerate(self.geometry.lobby, start=1):
             floors_group.append(
                 Lobby_Floor(
-                    lift_offset + i * (3 * self.GRID_WIDTH),
+                    self.track_x(pos - 1),
                     self.y_offset + 96,
                     3 * self.GRID_WIDTH,
                     self.GRID_HEIGHT,
@@ -225,37 +233,28 @@ class FloorLayout(pygame.sprite.Group):
         floors_group.append(wall_borders)
 
     def create_parking_floors(self, floors_group, isCache):
-        for i in range(0, 26):
+        geometry = self.geometry
+        for lot in geometry.level_lots(isCache):
+            y_offset = self.y_offset + (0 if geometry.side[lot] == "north" else 96)
             floors_group.append(
                 Parking_Floor(
-                    self.horizontal_offset + i * self.GRID_WIDTH,
-                    self.y_offset,
+                    self.track_x(geometry.lot_track_pos(lot)),
+                    y_offset,
                     self.GRID_WIDTH,
                     self.GRID_HEIGHT,
-                    i + 1,
-                )
-            )
-
-        range_end = 31 if isCache else 34
-
-        for i, floor_number in enumerate(range(27, range_end)):
-            floors_group.append(
-                Parking_Floor(
-                    self.horizontal_offset + i * self.GRID_WIDTH,
-                    self.y_offset + 96,
-                    self.GRID_WIDTH,
-                    self.GRID_HEIGHT,
-                    floor_number,
+                    lot,
                 )
             )
 
     def create_lift_floors(self, floors_group):
-        lift_offset = self.horizontal_offset + 224
-        for i, lift_no in enumerate(range(1, 5)):
+        geometry = self.geometry
+        for lift_no, (pos, side) in enumerate(
+            zip(geometry.lifts, geometry.lift_sides), start=1
+        ):
             floors_group.append(
                 Lift_Floor(
-                    lift_offset + i * (3 * self.GRID_WIDTH),
-                    self.y_offset + 96,
+                    self.track_x(pos - 1),
+                    self.y_offset + (0 if side == "north" else 96),
                     3 * self.GRID_WIDTH,
                     self.GRID_HEIGHT,
                     lift_no,
@@ -263,29 +262,43 @@ class FloorLayout(pygame.sprite.Group):
                 )
             )
 
-    def create_south_east_parking_floors(self, floors_group):
-        parking_offset_south = self.horizontal_offset + 608
-        for i, parking_no in enumerate(range(34, 40)):
+    def create_shuttle_floor(self, floors_group):
+        # Shuttle n runs on track n only
+        for shuttle_no, track in enumerate(self.geometry.tracks, start=1):
             floors_group.append(
-                Parking_Floor(
-                    parking_offset_south + i * self.GRID_WIDTH,
-                    self.y_offset + 96,
+                Shuttle_Floor(
+                    self.track_x(track["shuttle_home"]),
+                    self.y_offset + 48,
                     self.GRID_WIDTH,
                     self.GRID_HEIGHT,
-                    parking_no,
+                    id=shuttle_no,
+                    bounds=(
+                        self.track_x(track["first"]),
+                        self.track_x(track["last"] + 1),
+                    ),
+                    env=self.env,
                 )
             )
-        position_13 = self.horizontal_offset + GRID_WIDTH * 12
-        floors_group.append(
-            Shuttle_Floor(
-                position_13,
-                self.y_offset + 48,
-                self.GRID_WIDTH,
-                self.GRID_HEIGHT,
-                id=1,
-                bounds=(
-                    self.horizontal_offset,
-                    self.horizontal_offset + GRID_WIDTH * 26,
-                ),
-            )
+
+
+def create_carpark_layout(geometry, isCache=False, env=None):
+    """
+    ``FloorLayout`` groups of every level, ``{level number: group}`` from the top
+    level down, the order they are drawn in. The lobby is on the ground level.
+    The shuttles are moved in the simulated time of ``env``, a layout that is
+    only drawn does without
+    """
+    carpark_layout = {}
+    floor_no = geometry.levels
+    for i in range(0, geometry.levels):
+        floor_group = FloorLayout(
+            level_number=floor_no, y_offset=i * 150 + 12, geometry=geometry, env=env
         )
+        if i == geometry.levels - 1 and isCache:
+            floor_group.create_floors_group(isCache)
+        else:
+            floor_group.create_floors_group()
+        carpark_layout[floor_no] = floor_group.floors_group
+        floor_no -= 1
+
+    return carpark_layout
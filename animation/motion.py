@@ -0,0 +1,31 @@
+"""
+Moves of the sprites in simulated time. A sprite keeps where and when a move
+starts and ends, and works out where it is from the simulated time it is
+drawn at, so frames can come at any rate, or be skipped, without the sprites
+drifting from the simulation.
+"""
+
+from copy import copy
+
+
+class Motion:
+    """
+    ``start`` at ``start_time`` to ``end`` at ``end_time`` at a steady speed,
+    a position or an angle
+    """
+
+    def __init__(self, start, end, start_time, end_time):
+        self.start = start
+        self.end = end
+        self.start_time = start_time
+        self.end_time = end_time
+
+    def done(self, now):
+        return now >= self.end_time
+
+    def at(self, now):
+        """Value at simulated time ``now``, a copy the sprite is free to change"""
+        if self.done(now):
+            return copy(self.end)
+        fraction = max(0.0, now - self.start_time) / (self.end_time - self.start_time)
+        return self.start + (self.end - self.start) * fraction
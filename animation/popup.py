@@ -1,4 +1,5 @@
 import pygame
+from animation.fonts import get_font, render_text
 
 
 # Define a class for the popup
@@ -6,7 +7,7 @@ class Popup(pygame.sprite.Sprite):
     def __init__(self, car_id):
         super().__init__()
         self.font_size = 18
-        self.font = pygame.font.Font(None, self.font_size)
+        self.font = get_font(None, self.font_size)
         self.car_info = {
             "car id": car_id,
             "parked time": None,
@@ -32,6 +33,7 @@ class Popup(pygame.sprite.Sprite):
         self.visible = False
 
     def render(self, screen):
+        """Draws the popup when visible, returns whether it was drawn"""
         if self.visible:
             # Split the text into lines based on commas
             lines = self.text.split(",")
@@ -41,7 +43,7 @@ class Popup(pygame.sprite.Sprite):
 
             # Render each line and find the maximum width and total height
             for line in lines:
-                text_surface = self.font.render(line, True, (0, 0, 0))
+                text_surface = render_text(self.font, line, (0, 0, 0))
                 text_surfaces.append(text_surface)
                 max_width = max(max_width, text_surface.get_width())
                 total_height += text_surface.get_height()
@@ -66,3 +68,8 @@ class Popup(pygame.sprite.Sprite):
                 text_rect = text_surface.get_rect(left=left_margin, top=current_y)
                 screen.blit(text_surface, text_rect)
                 current_y += text_surface.get_height()
+
+            self.rect = white_box_rect
+            return True
+
+        return False
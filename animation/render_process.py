@@ -0,0 +1,137 @@
+"""
+Window of the simulation drawn by a process of its own. The simulation only
+writes a snapshot per frame into a ``SnapshotRing`` and carries on, the
+renderer draws the newest one at its own frame rate. A renderer that cannot
+keep up skips snapshots, counted in the window title, instead of holding up
+simulated time.
+"""
+
+import os
+import time
+import multiprocessing
+
+from constants import *
+from animation.snapshot import SnapshotRing, snapshot_spec, capture, apply
+from animation.snapshot import car_names, status_stores
+
+# Seconds between updates of the dropped snapshot count in the title
+TITLE_INTERVAL = 1.0
+
+
+class RenderProcess:
+    """
+    Starts the renderer and hands it snapshots, used as the ``snapshots`` of
+    a ``FrameRenderer``
+
+    :param geometry: carpark ``Geometry``, the renderer builds the same layout
+    :param video_driver: ``SDL_VIDEODRIVER`` of the renderer, the simulation
+        itself runs with the dummy driver
+    """
+
+    def __init__(self, geometry, isCache, title, video_driver=None):
+        spec = snapshot_spec(geometry)
+        self.ring = SnapshotRing(spec)
+        self.car_index = {name: idx for idx, name in enumerate(car_names())}
+        context = multiprocessing.get_context("spawn")
+        self.process = context.Process(
+            target=renderer_main,
+            args=(
+                self.ring.name,
+                len(self.ring.slots),
+                spec,
+                geometry.to_dict(),
+                isCache,
+                title,
+                video_driver,
+            ),
+            daemon=True,
+        )
+        self.process.start()
+
+    def publish(self, callbacks, vehicles):
+        self.ring.write(lambda slot: capture(slot, callbacks, vehicles, self.car_index))
+
+    @property
+    def closed(self):
+        """Whether the window has gone, closed by the user"""
+        return not self.process.is_alive()
+
+    def close(self):
+        self.ring.finish()
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.ring.close(unlink=True)
+
+
+def renderer_main(ring_name, slots, spec, layout, isCache, title, video_driver=None):
+    if video_driver is None:
+        os.environ.pop("SDL_VIDEODRIVER", None)
+    else:
+        os.environ["SDL_VIDEODRIVER"] = video_driver
+
+    # pygame and everything drawing with it are only needed in this process
+    import pygame
+    import animation.utils
+    from animation.init import create_carpark_layout
+    from animation.popup import Popup
+    from animation.stats import StatsBox
+    from animation.status_tracker import Status_Tracker
+    from classes.geometry import Geometry
+    from classes.vehicle import Vehicle
+    from core import FrameRenderer
+
+    pygame.init()
+    pygame.display.set_caption(title)
+    window = pygame.display.set_mode((WIDTH, HEIGHT))
+    animation.utils.get_sprite_sheets("Cars", True)
+    background, bg_img = animation.utils.get_background("Blue.png")
+    renderer = FrameRenderer(window, background, bg_img, dirty_rects=RENDER_DIRTY_RECTS)
+
+    geometry = Geometry(**layout)
+    for floors_group in create_carpark_layout(geometry, isCache).values():
+        renderer.add(floors_group)
+    renderer.add(StatsBox(logger=None))
+    renderer.add(Status_Tracker(*status_stores(spec)))
+
+    names = car_names()
+
+    def make_vehicle(record):
+        vehicle = Vehicle(
+            float(record["x"]),
+            float(record["y"]),
+            None,
+            id=int(record["id"]),
+            car_png=names[record["car"]],
+            popup=Popup(int(record["id"])),
+        )
+        renderer.add(vehicle)
+        return vehicle
+
+    ring = SnapshotRing(spec, slots, name=ring_name)
+    vehicles = {}
+    clock = pygame.time.Clock()
+    seq, dropped = -1, 0
+    title_time = time.monotonic()
+    try:
+        while not ring.closed:
+            if any(event.type == pygame.QUIT for event in pygame.event.get()):
+                break
+
+            snapshot = ring.latest(after=seq)
+            if snapshot is not None:
+                if seq >= 0:
+                    dropped += int(snapshot["seq"]) - seq - 1
+                seq = int(snapshot["seq"])
+                apply(snapshot, renderer.callbacks, vehicles, make_vehicle)
+            # The boards have nothing to show before the first snapshot
+            if seq >= 0:
+                renderer.render()
+
+            if time.monotonic() - title_time >= TITLE_INTERVAL:
+                title_time = time.monotonic()
+                pygame.display.set_caption(f"{title} - {dropped} frames dropped")
+            clock.tick(FPS)
+    finally:
+        ring.close()
+        pygame.quit()
@@ -0,0 +1,588 @@
+"""
+Recording of an animated run that plays back without simulating it again.
+
+``ReplayRecorder`` stands in for ``animation.utils`` as the carpark's animator.
+After every move command (``moveShuttle``, ``moveLift``, ``rotateVehicle``, ...)
+it records the resulting state of the sprites it moved, their moves included,
+tagged with the frame it comes before. Once per frame it also records the
+frame's simulated time, new cars, popup texts, lift floors and the boards
+when they change, and every ``REPLAY_KEYFRAME_INTERVAL`` mins a keyframe of
+everything on screen. The file is written next to the event trace when the
+run ends.
+
+Sprites work out where they are from the simulated time, see
+animation.motion, so playing back from the keyframe before a frame and
+applying the commands up to it gives the same picture as the live window, and
+seeking anywhere is instant:
+
+    python -m animation.replay "logs/Cache_<timestamp>.replay.npz" [--at 17:42] [--speed 4]
+
+Space pauses, left/right go back/forward a minute (ten with shift), up/down
+double/halve the speed.
+"""
+
+import os
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import json
+import argparse
+import numpy as np
+import simpy
+from pygame.math import Vector2
+
+from constants import *
+from animation.init import Shuttle_Floor
+from animation.motion import Motion
+from animation.popup import Popup
+from animation.snapshot import (
+    DIRECTIONS,
+    board_dtype,
+    snapshot_spec,
+    layout_sprites,
+    capture_board,
+    apply_board,
+    status_stores,
+    car_names,
+)
+from classes.vehicle import Vehicle
+
+# What a command sets
+VEHICLE, SHUTTLE, LIFT_FLOOR, POPUP = range(4)
+MOVES = (
+    "moveIntoGroundLift",
+    "moveOutOfLift",
+    "moveShuttle",
+    "moveVehicle",
+    "moveLiftToPallet",
+    "moveOriginToLot",
+    "rotateVehicle",
+    "movePalletToLot",
+)
+
+# Whole state of a sprite, only the fields of its kind are used. Positions and
+# times are kept to the bit so a replay moves the sprites exactly as the live
+# run did. The times of a move or turn it is not making are NaN
+COMMAND_DTYPE = np.dtype(
+    [
+        ("frame", "i4"),
+        ("kind", "i1"),
+        # Car id, shuttle or lift floor index
+        ("id", "i4"),
+        ("car", "i2"),
+        ("direction", "i1"),
+        ("x", "f8"),
+        ("y", "f8"),
+        ("start_x", "f8"),
+        ("start_y", "f8"),
+        ("end_x", "f8"),
+        ("end_y", "f8"),
+        ("start_time", "f8"),
+        ("end_time", "f8"),
+        ("orientation", "f8"),
+        ("turn_start", "f8"),
+        ("turn_end", "f8"),
+        ("turn_start_time", "f8"),
+        ("turn_end_time", "f8"),
+        ("alpha", "f8"),
+        ("fade_start", "f8"),
+        # Lift floor occupancy
+        ("value", "?"),
+        # Popup text, NaN until known
+        ("parked", "f8"),
+        ("exiting", "f8"),
+    ]
+)
+
+
+def popup_times(vehicle):
+    info = vehicle.popup.car_info
+    return tuple(
+        np.nan if info[key] is None else info[key]
+        for key in ("parked time", "exiting time")
+    )
+
+
+def keyframe_dtype(spec):
+    return np.dtype(
+        [
+            ("frame", "i4"),
+            # Rows of the keyframe's cars in the vehicles array
+            ("vehicles", "i4", (2,)),
+            ("lift_floors", "?", (spec["levels"] * spec["lifts"],)),
+            (
+                "shuttles",
+                COMMAND_DTYPE,
+                (spec["levels"] * spec["shuttles_per_level"],),
+            ),
+            ("board", board_dtype(spec)),
+        ]
+    )
+
+
+class ReplayRecorder:
+    """
+    Animator of an animated run that records what it animates, everything
+    else is passed on to ``animator``
+
+    :param path: file the recording is written to by :meth:`close`
+    :param renderer: the run's ``FrameRenderer``, which calls :meth:`frame`
+    :param meta: policy, period, seed..., kept with the recording
+    """
+
+    def __init__(
+        self,
+        path,
+        renderer,
+        geometry,
+        isCache,
+        animator,
+        meta=None,
+        keyframe_interval=None,
+    ):
+        self.path = path
+        self.renderer = renderer
+        self.animator = animator
+        self.spec = snapshot_spec(geometry)
+        self.meta = dict(
+            meta or {},
+            layout=geometry.to_dict(),
+            isCache=bool(isCache),
+            ticks_per_frame=1.0 / (FACTOR * FPS),
+        )
+        if keyframe_interval is None:
+            keyframe_interval = REPLAY_KEYFRAME_INTERVAL
+        self.frames_per_keyframe = max(1, round(keyframe_interval * FACTOR * FPS))
+        self.car_index = {name: idx for idx, name in enumerate(car_names())}
+
+        self.frames = 0
+        # Simulated time of each frame
+        self.times = []
+        self.commands = []
+        self.boards = []
+        self.keyframes = []
+        self.keyframe_vehicles = []
+        self._sprites = None
+        self._seen = set()
+        self._popups = {}
+        self._lift_floors = None
+        self._board = None
+        self._empty_board = np.zeros((), board_dtype(self.spec))
+
+        for name in MOVES:
+            setattr(self, name, self._recording(getattr(animator, name)))
+
+    def __getattr__(self, name):
+        # find* helpers, which do not move anything
+        return getattr(self.animator, name)
+
+    def sprites(self):
+        """Lift floors, shuttles, stats board and status tracker of the renderer"""
+        if self._sprites is None:
+            lifts, shuttles, stats_box, status_tracker = layout_sprites(
+                self.renderer.callbacks
+            )
+            shuttle_index = {sprite: idx for idx, sprite in enumerate(shuttles)}
+            self._sprites = (lifts, shuttle_index, stats_box, status_tracker)
+        return self._sprites
+
+    def _recording(self, move):
+        def recorded(*args, **kwargs):
+            move(*args, **kwargs)
+            for sprite in args:
+                if isinstance(sprite, Shuttle_Floor) or (
+                    # Not drawn, until added to the renderer or once faded out
+                    isinstance(sprite, Vehicle)
+                    and sprite.alive()
+                ):
+                    self.record(sprite)
+
+        return recorded
+
+    def moveLift(self, env, layout, lift, dest, time_duration, vehicle=None, **kwargs):
+        # Steps through the lift's moves itself, to record the car after each level
+        steps = self.animator.moveLift(
+            env, layout, lift, dest, time_duration, vehicle=vehicle, **kwargs
+        )
+        value, interrupt = None, None
+        while True:
+            try:
+                if interrupt is not None:
+                    event = steps.throw(interrupt)
+                else:
+                    event = steps.send(value)
+            except StopIteration:
+                event = None
+            if vehicle is not None and vehicle.alive():
+                self.record(vehicle)
+            if event is None:
+                return
+
+            value, interrupt = None, None
+            try:
+                value = yield event
+            except simpy.Interrupt as error:
+                interrupt = error
+
+    def record(self, sprite):
+        # Anything before the first frame is in its keyframe, like the moves of
+        # a run that only starts drawing later on
+        if self.frames > 0:
+            self.commands.append(self.state_of(sprite))
+
+    def state_of(self, sprite):
+        record = np.zeros((), COMMAND_DTYPE)
+        record["frame"] = self.frames
+        record["x"], record["y"] = sprite.pos
+        record["start_time"] = record["turn_start_time"] = np.nan
+        if sprite.motion is not None:
+            motion = sprite.motion
+            record["start_x"], record["start_y"] = motion.start
+            record["end_x"], record["end_y"] = motion.end
+            record["start_time"], record["end_time"] = (
+                motion.start_time,
+                motion.end_time,
+            )
+        if isinstance(sprite, Shuttle_Floor):
+            record["kind"] = SHUTTLE
+            record["id"] = self.sprites()[1][sprite]
+            return record
+
+        record["kind"] = VEHICLE
+        record["id"] = sprite.id
+        record["car"] = self.car_index[sprite.car_png_name]
+        record["direction"] = DIRECTIONS.index(sprite.direction)
+        record["orientation"] = sprite.orientation
+        if sprite.turn is not None:
+            turn = sprite.turn
+            record["turn_start"], record["turn_end"] = turn.start, turn.end
+            record["turn_start_time"] = turn.start_time
+            record["turn_end_time"] = turn.end_time
+        record["alpha"] = sprite.alpha
+        record["fade_start"] = (
+            np.nan if sprite.fade_start is None else sprite.fade_start
+        )
+        times = popup_times(sprite)
+        record["parked"], record["exiting"] = times
+        self._popups[sprite.id] = times
+        return record
+
+    def frame(self, now):
+        """Called by the renderer before it draws each frame, at simulated time ``now``"""
+        lifts, shuttle_index, stats_box, status_tracker = self.sprites()
+        vehicles = self.renderer.vehicle_group
+
+        occupied = [sprite.is_Occupied for sprite in lifts]
+        if self._lift_floors is not None:
+            for idx, (was, is_occupied) in enumerate(zip(self._lift_floors, occupied)):
+                if was != is_occupied:
+                    record = np.zeros((), COMMAND_DTYPE)
+                    record["frame"], record["kind"] = self.frames, LIFT_FLOOR
+                    record["id"], record["value"] = idx, is_occupied
+                    self.commands.append(record)
+        self._lift_floors = occupied
+
+        for vehicle in vehicles:
+            if vehicle.id not in self._seen:
+                self._seen.add(vehicle.id)
+                self.commands.append(self.state_of(vehicle))
+                continue
+            times = popup_times(vehicle)
+            # NaN != NaN, so compare the text
+            if repr(times) != repr(self._popups.get(vehicle.id)):
+                self._popups[vehicle.id] = times
+                record = np.zeros((), COMMAND_DTYPE)
+                record["frame"], record["kind"], record["id"] = (
+                    self.frames,
+                    POPUP,
+                    vehicle.id,
+                )
+                record["parked"], record["exiting"] = times
+                self.commands.append(record)
+
+        board = self._empty_board.copy()
+        capture_board(board, stats_box, status_tracker)
+        if self._board is None or board.tobytes() != self._board.tobytes():
+            self._board = board
+            self.boards.append((self.frames, board))
+
+        if self.frames % self.frames_per_keyframe == 0:
+            self.keyframe(lifts, shuttle_index, vehicles, occupied, board)
+        self.times.append(now)
+        self.frames += 1
+
+    def keyframe(self, lifts, shuttle_index, vehicles, occupied, board):
+        start = len(self.keyframe_vehicles)
+        self.keyframe_vehicles.extend(self.state_of(vehicle) for vehicle in vehicles)
+        keyframe = np.zeros((), keyframe_dtype(self.spec))
+        keyframe["frame"] = self.frames
+        keyframe["vehicles"] = (start, len(self.keyframe_vehicles))
+        keyframe["lift_floors"] = occupied
+        keyframe["shuttles"] = [self.state_of(sprite) for sprite in shuttle_index]
+        keyframe["board"] = board
+        self.keyframes.append(keyframe)
+
+    def close(self):
+        boards = np.zeros(
+            len(self.boards), [("frame", "i4"), ("board", board_dtype(self.spec))]
+        )
+        for row, (frame, board) in zip(boards, self.boards):
+            row["frame"], row["board"] = frame, board
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        np.savez_compressed(
+            self.path,
+            meta=np.array(json.dumps(dict(self.meta, frames=self.frames))),
+            times=np.array(self.times, "f8"),
+            commands=np.array(self.commands, COMMAND_DTYPE),
+            boards=boards,
+            keyframes=np.array(self.keyframes, keyframe_dtype(self.spec)),
+            keyframe_vehicles=np.array(self.keyframe_vehicles, COMMAND_DTYPE),
+        )
+
+
+class Replay:
+    """A recording written by ``ReplayRecorder``"""
+
+    def __init__(self, path):
+        with np.load(path) as data:
+            self.meta = json.loads(str(data["meta"]))
+            self.times = data["times"]
+            self.commands = data["commands"]
+            self.boards = data["boards"]
+            self.keyframes = data["keyframes"]
+            self.keyframe_vehicles = data["keyframe_vehicles"]
+        self.frames = self.meta["frames"]
+        self.ticks_per_frame = self.meta["ticks_per_frame"]
+        # Commands and boards are recorded in frame order
+        self._command_frames = self.commands["frame"]
+        self._board_frames = self.boards["frame"]
+
+    def time_of(self, frame):
+        return float(self.times[frame])
+
+    def frame_at(self, time):
+        """Last frame at or before simulated time ``time``"""
+        frame = np.searchsorted(self.times, time, side="right") - 1
+        return int(min(max(0, frame), self.frames - 1))
+
+    def keyframe_before(self, frame):
+        idx = np.searchsorted(self.keyframes["frame"], frame, side="right") - 1
+        return self.keyframes[max(idx, 0)]
+
+    def commands_of(self, first, last):
+        """Commands of frames ``first`` to ``last``, both included"""
+        start = np.searchsorted(self._command_frames, first, side="left")
+        stop = np.searchsorted(self._command_frames, last, side="right")
+        return self.commands[start:stop]
+
+    def board_at(self, frame):
+        idx = np.searchsorted(self._board_frames, frame, side="right") - 1
+        return self.boards[idx]["board"] if idx >= 0 else None
+
+
+class ReplayPlayer:
+    """
+    Puts the sprites of a renderer built from the recorded layout where they
+    were at any frame of the recording
+    """
+
+    def __init__(self, replay, renderer):
+        self.replay = replay
+        self.renderer = renderer
+        lifts, shuttles, stats_box, status_tracker = layout_sprites(renderer.callbacks)
+        self.lifts, self.shuttles = lifts, shuttles
+        self.stats_box, self.status_tracker = stats_box, status_tracker
+        self.names = car_names()
+        self.vehicles = {}
+        # Frame whose commands the sprites have been given
+        self.frame = None
+
+    def show(self, frame):
+        """Draws ``frame``"""
+        keyframe = self.replay.keyframe_before(frame)
+        if self.frame is None or frame < self.frame or keyframe["frame"] > self.frame:
+            self.seek(keyframe)
+
+        if frame > self.frame:
+            for command in self.replay.commands_of(self.frame + 1, frame):
+                self.apply(command)
+            self.frame = frame
+
+        board = self.replay.board_at(frame)
+        if board is not None:
+            apply_board(board, self.stats_box, self.status_tracker)
+        self.renderer.render(self.replay.time_of(frame))
+
+    def seek(self, keyframe):
+        replay = self.replay
+        start, stop = keyframe["vehicles"]
+        records = replay.keyframe_vehicles[start:stop]
+        on_screen = set(records["id"].tolist())
+        for car_id in list(self.vehicles):
+            if car_id not in on_screen:
+                self.vehicles.pop(car_id).kill()
+        for record in records:
+            self.apply(record)
+        # Cars overlap, so they are drawn in the order the live run added them
+        group = self.renderer.vehicle_group
+        group.empty()
+        group.add(*[self.vehicles[car_id] for car_id in records["id"].tolist()])
+        for record in keyframe["shuttles"]:
+            self.apply(record)
+        for sprite, occupied in zip(self.lifts, keyframe["lift_floors"]):
+            if sprite.is_Occupied != occupied:
+                sprite.toggle_Occupancy()
+        self.frame = int(keyframe["frame"])
+
+    def vehicle(self, record):
+        car_id = int(record["id"])
+        vehicle = self.vehicles.get(car_id)
+        if vehicle is None or not vehicle.alive():
+            vehicle = Vehicle(
+                record["x"],
+                record["y"],
+                None,
+                id=car_id,
+                car_png=self.names[record["car"]],
+                popup=Popup(car_id),
+            )
+            self.vehicles[car_id] = vehicle
+            self.renderer.add(vehicle)
+        return vehicle
+
+    def apply(self, record):
+        kind = record["kind"]
+        if kind == LIFT_FLOOR:
+            sprite = self.lifts[record["id"]]
+            if sprite.is_Occupied != record["value"]:
+                sprite.toggle_Occupancy()
+            return
+        if kind == POPUP:
+            vehicle = self.vehicles.get(int(record["id"]))
+            if vehicle is not None:
+                set_popup(vehicle, record)
+            return
+
+        sprite = (
+            self.shuttles[record["id"]] if kind == SHUTTLE else self.vehicle(record)
+        )
+        sprite.pos = Vector2(float(record["x"]), float(record["y"]))
+        sprite.motion = None
+        if not np.isnan(record["start_time"]):
+            sprite.motion = Motion(
+                Vector2(float(record["start_x"]), float(record["start_y"])),
+                Vector2(float(record["end_x"]), float(record["end_y"])),
+                float(record["start_time"]),
+                float(record["end_time"]),
+            )
+        if kind == VEHICLE:
+            sprite.direction = DIRECTIONS[record["direction"]]
+            sprite.orientation = float(record["orientation"])
+            sprite.turn = None
+            if not np.isnan(record["turn_start_time"]):
+                sprite.turn = Motion(
+                    float(record["turn_start"]),
+                    float(record["turn_end"]),
+                    float(record["turn_start_time"]),
+                    float(record["turn_end_time"]),
+                )
+            sprite.alpha = float(record["alpha"])
+            sprite.fade_start = (
+                None if np.isnan(record["fade_start"]) else float(record["fade_start"])
+            )
+            set_popup(sprite, record)
+
+
+def set_popup(vehicle, record):
+    for key, field in (("parked time", "parked"), ("exiting time", "exiting")):
+        value = None if np.isnan(record[field]) else float(record[field])
+        if vehicle.popup.car_info[key] != value:
+            vehicle.popup.set_text(key, value)
+
+
+def parse_time(text):
+    """Simulated mins, "17:42" as on the stats board or a number of mins"""
+    if ":" in text:
+        hours, minutes = text.split(":")
+        return int(hours) * 60 + float(minutes)
+    return float(text)
+
+
+def build_renderer(replay, window):
+    """``FrameRenderer`` with the layout and boards of the recorded run"""
+    from animation.utils import get_background, get_sprite_sheets
+    from animation.init import create_carpark_layout
+    from animation.stats import StatsBox
+    from animation.status_tracker import Status_Tracker
+    from classes.geometry import Geometry
+    from core import FrameRenderer
+
+    get_sprite_sheets("Cars", True)
+    background, bg_img = get_background("Blue.png")
+    renderer = FrameRenderer(window, background, bg_img, dirty_rects=RENDER_DIRTY_RECTS)
+    geometry = Geometry(**replay.meta["layout"])
+    for floors_group in create_carpark_layout(
+        geometry, replay.meta["isCache"]
+    ).values():
+        renderer.add(floors_group)
+    renderer.add(StatsBox(logger=None))
+    renderer.add(Status_Tracker(*status_stores(snapshot_spec(geometry))))
+    return renderer
+
+
+def view(path, at=0.0, speed=1.0):
+    import pygame
+
+    replay = Replay(path)
+    pygame.init()
+    window = pygame.display.set_mode((WIDTH, HEIGHT))
+    player = ReplayPlayer(replay, build_renderer(replay, window))
+    title = "Replay - %s" % replay.meta.get("policy", os.path.basename(path))
+
+    clock = pygame.time.Clock()
+    position = float(replay.frame_at(at))
+    paused = False
+    while True:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                return
+            if event.type != pygame.KEYDOWN:
+                continue
+            # Frames are not evenly spread in time, the run skips idle stretches
+            jump = 10 if event.mod & pygame.KMOD_SHIFT else 1
+            shown = replay.time_of(int(position))
+            if event.key == pygame.K_SPACE:
+                paused = not paused
+            elif event.key == pygame.K_RIGHT:
+                position = max(replay.frame_at(shown + jump), int(position) + 1)
+            elif event.key == pygame.K_LEFT:
+                position = replay.frame_at(shown - jump)
+            elif event.key == pygame.K_UP:
+                speed *= 2
+            elif event.key == pygame.K_DOWN:
+                speed /= 2
+        position = min(max(position, 0), replay.frames - 1)
+
+        player.show(int(position))
+        pygame.display.set_caption(
+            "%s - %.2f mins, x%g%s"
+            % (
+                title,
+                replay.time_of(player.frame),
+                speed,
+                " (paused)" if paused else "",
+            )
+        )
+        if not paused:
+            position += speed
+        clock.tick(FPS)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Plays back a recorded run")
+    parser.add_argument("path")
+    parser.add_argument("--at", type=parse_time, default=0.0, help="e.g. 17:42")
+    parser.add_argument("--speed", type=float, default=1.0)
+    args = parser.parse_args()
+    view(args.path, args.at, args.speed)
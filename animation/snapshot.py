@@ -0,0 +1,292 @@
+"""
+State of the animation at one instant, passed from the simulation to the
+renderer process through a ring of slots in shared memory.
+
+A slot holds what the renderer cannot work out from the layout on its own:
+which lift floors are lit, where the shuttles are, every car on screen and
+the numbers on the boards. The simulation writes a slot per frame, the
+renderer reads whichever slot is newest when it gets round to drawing.
+"""
+
+import os
+import numpy as np
+from os.path import join
+from types import SimpleNamespace
+from multiprocessing import shared_memory
+from pygame.math import Vector2
+
+from constants import *
+from animation.init import Lift_Floor, Shuttle_Floor
+from animation.stats import StatsBox
+from animation.status_tracker import Status_Tracker
+
+# Numbers of the stats board, the rest it works out itself
+COUNTERS = (
+    "Cars Parked",
+    "Cars Exited",
+    "Cars Waiting",
+    "Tick",
+    "Avg. Parking Waiting Time",
+    "Avg. Retrieval Waiting Time",
+    "P95 Parking Wait",
+    "P95 Retrieval Wait",
+)
+DIRECTIONS = ("up", "right", "down", "left")
+
+VEHICLE_DTYPE = np.dtype(
+    [
+        ("id", "i4"),
+        ("car", "i2"),
+        ("direction", "i1"),
+        ("x", "f4"),
+        ("y", "f4"),
+        ("orientation", "f4"),
+        ("alpha", "f4"),
+        # Popup text, NaN until known
+        ("parked", "f8"),
+        ("exiting", "f8"),
+    ]
+)
+
+
+def car_names():
+    """Car sprite names, in the order cars are numbered in a snapshot"""
+    return sorted(
+        os.path.splitext(file)[0] for file in os.listdir(join("assets", "Cars"))
+    )
+
+
+def snapshot_spec(geometry):
+    """Sizes of a slot's arrays for a carpark of ``geometry``"""
+    return {
+        "levels": geometry.levels,
+        "lifts": len(geometry.lifts),
+        "shuttles_per_level": geometry.shuttles_per_level,
+        # Parked cars, and as many again coming and going
+        "vehicles": 2 * geometry.total_lots() + 64,
+    }
+
+
+def board_dtype(spec):
+    """Numbers of the stats board and status tracker"""
+    return np.dtype(
+        [
+            ("counters", "f8", (len(COUNTERS),)),
+            # Counters shown as ints, the averages are too until the first car
+            ("integers", "?", (len(COUNTERS),)),
+            ("lifts_free", "?", (spec["lifts"],)),
+            ("shuttles_free", "?", (spec["levels"], spec["shuttles_per_level"])),
+            ("lots_free", "i4", (spec["levels"],)),
+        ]
+    )
+
+
+def layout_sprites(callbacks):
+    """Lift floors, shuttles, stats board and status tracker among ``callbacks``, in drawing order"""
+    lifts, shuttles, boards = [], [], {}
+    for draw in callbacks:
+        if isinstance(draw, (StatsBox, Status_Tracker)):
+            boards[type(draw)] = draw
+            continue
+        for sprite in draw.sprites() if hasattr(draw, "sprites") else []:
+            if isinstance(sprite, Lift_Floor):
+                lifts.append(sprite)
+            elif isinstance(sprite, Shuttle_Floor):
+                shuttles.append(sprite)
+    return lifts, shuttles, boards.get(StatsBox), boards.get(Status_Tracker)
+
+
+class SnapshotRing:
+    """
+    ``slots`` snapshots in one shared memory block, written one after the other.
+    The header holds the sequence number of the newest complete slot. A slot's
+    own number is -1 while it is being written, so a reader that was overtaken
+    by the writer can tell and read again
+
+    :param spec: sizes of the arrays, see :func:`snapshot_spec`
+    :param slots: number of snapshots, ``SNAPSHOT_SLOTS`` by default, the same
+        on both ends of the block
+    :param name: shared memory block to attach to, a new one when None
+    """
+
+    HEADER = np.dtype([("seq", "i8"), ("closed", "i8")])
+
+    def __init__(self, spec, slots=None, name=None):
+        if slots is None:
+            slots = SNAPSHOT_SLOTS
+        self.spec = dict(spec)
+        levels = spec["levels"]
+        self.slot_dtype = np.dtype(
+            [
+                ("seq", "i8"),
+                ("board", board_dtype(spec)),
+                ("lift_floors", "?", (levels * spec["lifts"],)),
+                ("shuttle_floors", "f4", (levels * spec["shuttles_per_level"], 2)),
+                ("vehicle_count", "i4"),
+                ("vehicles", VEHICLE_DTYPE, (spec["vehicles"],)),
+            ]
+        )
+        size = self.HEADER.itemsize + slots * self.slot_dtype.itemsize
+        create = name is None
+        self.memory = shared_memory.SharedMemory(name=name, create=create, size=size)
+        self.name = self.memory.name
+        self.header = np.ndarray((), self.HEADER, buffer=self.memory.buf)
+        self.slots = np.ndarray(
+            (slots,),
+            self.slot_dtype,
+            buffer=self.memory.buf,
+            offset=self.HEADER.itemsize,
+        )
+        if create:
+            self.header["seq"] = -1
+            self.header["closed"] = 0
+            self.slots["seq"] = -1
+        self._seq = int(self.header["seq"])
+
+    def write(self, fill):
+        """Fills the next slot with ``fill(slot)`` and makes it the newest one"""
+        self._seq += 1
+        slot = self.slots[self._seq % len(self.slots)]
+        slot["seq"] = -1
+        fill(slot)
+        slot["seq"] = self._seq
+        self.header["seq"] = self._seq
+
+    def latest(self, after=-1):
+        """Copy of the newest slot, or None when there is none newer than ``after``"""
+        while True:
+            seq = int(self.header["seq"])
+            if seq <= after:
+                return None
+            snapshot = self.slots[seq % len(self.slots)].copy()
+            if snapshot["seq"] == seq:
+                return snapshot
+
+    @property
+    def closed(self):
+        """Set by the writer once the simulation is over"""
+        return bool(self.header["closed"])
+
+    def finish(self):
+        self.header["closed"] = 1
+
+    def close(self, unlink=False):
+        # Views into the block have to go before it can be closed
+        del self.header, self.slots
+        self.memory.close()
+        if unlink:
+            self.memory.unlink()
+
+
+def capture_board(board, stats_box, status_tracker):
+    """Writes the numbers of the boards into ``board``, see :func:`board_dtype`"""
+    if stats_box is not None:
+        # Worked out when the board is drawn, which may not be in this process
+        stats_box.calculate_waiting_time()
+        values = [stats_box.stats[key] for key in COUNTERS]
+        board["counters"] = values
+        board["integers"] = [isinstance(value, int) for value in values]
+    if status_tracker is not None and status_tracker.s_lifts is not None:
+        free = {lift.num for lift in status_tracker.s_lifts.items}
+        board["lifts_free"] = [num in free for num in status_tracker.default_lifts]
+        shuttles_free = board["shuttles_free"]
+        shuttles_free[...] = False
+        for level, store in enumerate(status_tracker.s_shuttles):
+            for shuttle in store.items:
+                shuttles_free[level, shuttle.num - 1] = True
+        board["lots_free"] = status_tracker.parking_lots
+
+
+def capture(slot, callbacks, vehicles, car_index):
+    """Writes the sprites and boards of the simulation's renderer into ``slot``"""
+    lifts, shuttles, stats_box, status_tracker = layout_sprites(callbacks)
+    slot["lift_floors"] = [sprite.is_Occupied for sprite in lifts]
+    slot["shuttle_floors"] = [tuple(sprite.pos) for sprite in shuttles]
+    capture_board(slot["board"], stats_box, status_tracker)
+
+    records = slot["vehicles"]
+    count = 0
+    for vehicle in vehicles:
+        if count == len(records):
+            break
+        info = vehicle.popup.car_info
+        records[count] = (
+            vehicle.id,
+            car_index[vehicle.car_png_name],
+            DIRECTIONS.index(vehicle.direction),
+            vehicle.pos[0],
+            vehicle.pos[1],
+            vehicle.orientation,
+            vehicle.alpha,
+            np.nan if info["parked time"] is None else info["parked time"],
+            np.nan if info["exiting time"] is None else info["exiting time"],
+        )
+        count += 1
+    slot["vehicle_count"] = count
+
+
+def status_stores(spec):
+    """Stand-ins for the lift and shuttle stores a ``Status_Tracker`` reads"""
+    lifts = SimpleNamespace(
+        items=[SimpleNamespace(num=num) for num in range(1, spec["lifts"] + 1)]
+    )
+    shuttles = [SimpleNamespace(items=[]) for _ in range(spec["levels"])]
+    return lifts, shuttles
+
+
+def apply_board(board, stats_box, status_tracker):
+    """Puts the numbers of ``board`` on the stats board and status tracker"""
+    if stats_box is not None:
+        counters = zip(COUNTERS, board["counters"].tolist(), board["integers"])
+        for key, value, integer in counters:
+            stats_box.stats[key] = int(value) if integer else value
+    if status_tracker is not None:
+        lifts_store, shuttles_stores = status_stores(
+            {"lifts": len(board["lifts_free"]), "levels": len(board["lots_free"])}
+        )
+        lifts_store.items = [
+            lift for lift, free in zip(lifts_store.items, board["lifts_free"]) if free
+        ]
+        for store, free in zip(shuttles_stores, board["shuttles_free"]):
+            store.items = [SimpleNamespace(num=num + 1) for num in np.flatnonzero(free)]
+        status_tracker.s_lifts = lifts_store
+        status_tracker.s_shuttles = shuttles_stores
+        status_tracker.parking_lots = board["lots_free"].tolist()
+
+
+def apply(snapshot, callbacks, vehicles, make_vehicle):
+    """
+    Puts the renderer's sprites and boards where ``snapshot`` has them
+
+    :param vehicles: ``{car id: Vehicle}`` on screen, updated in place
+    :param make_vehicle: ``function(record)`` creating the ``Vehicle`` of a new car
+    """
+    lifts, shuttles, stats_box, status_tracker = layout_sprites(callbacks)
+    for sprite, occupied in zip(lifts, snapshot["lift_floors"]):
+        if sprite.is_Occupied != occupied:
+            sprite.toggle_Occupancy()
+    for sprite, (x, y) in zip(shuttles, snapshot["shuttle_floors"]):
+        sprite.pos = Vector2(float(x), float(y))
+        sprite.rect.topleft = (int(x), int(y))
+
+    apply_board(snapshot["board"], stats_box, status_tracker)
+
+    records = snapshot["vehicles"][: snapshot["vehicle_count"]]
+    on_screen = set(records["id"].tolist())
+    for car_id in list(vehicles):
+        if car_id not in on_screen:
+            vehicles.pop(car_id).kill()
+    for record in records:
+        car_id = int(record["id"])
+        vehicle = vehicles.get(car_id)
+        if vehicle is None:
+            vehicle = vehicles[car_id] = make_vehicle(record)
+        vehicle.pos = Vector2(float(record["x"]), float(record["y"]))
+        vehicle.rect.topleft = (int(record["x"]), int(record["y"]))
+        vehicle.orientation = float(record["orientation"])
+        vehicle.direction = DIRECTIONS[record["direction"]]
+        vehicle.alpha = float(record["alpha"])
+        for key, field in (("parked time", "parked"), ("exiting time", "exiting")):
+            value = None if np.isnan(record[field]) else float(record[field])
+            if vehicle.popup.car_info[key] != value:
+                vehicle.popup.set_text(key, value)
@@ -1,22 +1,38 @@
 import pygame
 from constants import *
+from animation.fonts import get_font, render_text
 import os
-import pickle
 from os.path import join
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.ticker as mtick
 from matplotlib.gridspec import GridSpec
 import seaborn as sns
+from simulation.results_store import ResultsStore
+from simulation.running_stats import StreamingStats
+
+# HUD entries coloured by how long drivers wait
+WAIT_KEYS = (
+    "Avg. Parking Waiting Time",
+    "Avg. Retrieval Waiting Time",
+    "P95 Parking Wait",
+    "P95 Retrieval Wait",
+)
 
 
 class StatsBox:
-    def __init__(self, logger):
-        self.utilization_stats = {"floors": [[] for _ in range(NUM_OF_LEVELS)]}
+    def __init__(self, logger, headless=False):
+        # Occupancy of each level, collect_floor adds a list per level of the carpark
+        self.utilization_stats = {"floors": []}
         # Track the time after driver drove in to parking spot,
         # Track the time from parking spot to before driver drive vehicle out
         self.service_stats = {"parking": {}}
         self.waiting_stats = {"parking": {}, "retrieval": {}}
+        # Mean, variance and quantiles of the same times, updated as each car comes in
+        self.summaries = {
+            kind: StreamingStats()
+            for kind in ("parking", "retrieval", "service_parking")
+        }
 
         self.stats = {
             "Total Car Served": 0,
@@ -27,8 +43,13 @@ class StatsBox:
             "Actual Time": 0.0,
             "Avg. Parking Waiting Time": 0,
             "Avg. Retrieval Waiting Time": 0,
+            "P95 Parking Wait": 0,
+            "P95 Retrieval Wait": 0,
         }
-        self.background = self.get_background()
+        # Nothing is drawn when headless, so skip loading the board texture
+        self.background = None if headless else self.get_background()
+        # Area of the window the board covers, once it has been drawn
+        self.rect = None
         self.logger = logger
 
     def get_background(self):
@@ -58,12 +79,23 @@ class StatsBox:
 
         return background_surface
 
+    def record_time(self, kind, car_id, value):
+        """``kind`` of time of a car, "parking" or "retrieval" waiting, or "service_parking" """
+        times = (
+            self.service_stats["parking"]
+            if kind == "service_parking"
+            else self.waiting_stats[kind]
+        )
+        times[car_id] = value
+        self.summaries[kind].add(value)
+
     def calculate_waiting_time(self):
-        if self.waiting_stats["parking"]:
-            parking = list(self.waiting_stats["parking"].values())
-            retrieval_list = list(self.waiting_stats["retrieval"].values())
-            self.stats["Avg. Parking Waiting Time"] = round(np.mean(parking), 3)
-            self.stats["Avg. Retrieval Waiting Time"] = round(np.mean(retrieval_list), 3)
+        parking, retrieval = self.summaries["parking"], self.summaries["retrieval"]
+        if parking.count:
+            self.stats["Avg. Parking Waiting Time"] = round(parking.mean, 3)
+            self.stats["Avg. Retrieval Waiting Time"] = round(retrieval.mean, 3)
+            self.stats["P95 Parking Wait"] = round(parking.quantile(0.95), 3)
+            self.stats["P95 Retrieval Wait"] = round(retrieval.quantile(0.95), 3)
 
     def calculate_actual_time(self):
         # Calculate hours
@@ -82,7 +114,7 @@ class StatsBox:
         default_color = (255, 255, 255)
         red = (255, 46, 46)
         amber = (255, 191, 0)
-        if key == "Avg. Parking Waiting Time" or key == "Avg. Retrieval Waiting Time":
+        if key in WAIT_KEYS:
             if value >= 5.0:
                 default_color = red
             elif value >= 2.0:
@@ -102,9 +134,9 @@ class StatsBox:
         # Calculate the actual time
         self.calculate_actual_time()
 
-        font = pygame.font.Font(pygame.font.match_font("arial"), 18)
+        font = get_font("arial", 18)
         board_y = win.get_height() - STATS_HEIGHT
-        win.blit(self.background, (0, board_y))
+        self.rect = win.blit(self.background, (0, board_y))
 
         x, y = 10, board_y + 6
         for label, value in self.stats.items():
@@ -113,7 +145,7 @@ class StatsBox:
                 x = 10
                 y += STATS_HEIGHT / 2
             text = f"{label}: {value}"
-            text_surface = font.render(text, True, color)
+            text_surface = render_text(font, text, color)
             win.blit(text_surface, (x, y))
             x += text_surface.get_width() + 20
 
@@ -125,25 +157,40 @@ class StatsBox:
             stats_box.stats["Tick"] = round(env.now, 2)
             yield env.timeout(0.1)
 
-    def show_stats(self, carpark, instance_type):
+    def get_results(self):
+        return {
+            "parking": self.waiting_stats["parking"],
+            "retrieval": self.waiting_stats["retrieval"],
+            "service_parking": self.service_stats["parking"],
+            "floors_occupancy": self.utilization_stats["floors"],
+        }
+
+    def get_summary(self):
+        return {kind: stats.summary() for kind, stats in self.summaries.items()}
+
+    def show_stats(self, carpark, instance_type, seed=None, config=None, store=True):
+        """
+        Logs and plots the run's statistics
+
+        :param store: append the run to the results store, off for runs cut short
+        """
         self.logger.info("=============STATISTICS=============")
+        for kind, summary in self.get_summary().items():
+            self.logger.info(
+                f"{kind}: {summary['count']} cars, mean {summary['mean']:.2f}, std {summary['std']:.2f}, "
+                f"p50 {summary['p50']:.2f}, p95 {summary['p95']:.2f}, p99 {summary['p99']:.2f}"
+            )
         parking_dict = self.waiting_stats["parking"]
         retrieval_dict = self.waiting_stats["retrieval"]
         service_parking_dict = self.service_stats["parking"]
         floors_occupancy = self.utilization_stats["floors"]
 
-        period = os.environ["PERIOD"]
-        period = period.replace(".csv", "")
-        file_name = f"{instance_type}-{period}.pkl"
-        file_path = join("output", file_name)
-        with open(file_path, "wb") as file:
-            data_to_dump = {
-                "parking": parking_dict,
-                "retrieval": retrieval_dict,
-                "service_parking": service_parking_dict,
-                "floors_occupancy": floors_occupancy,
-            }
-            pickle.dump(data_to_dump, file)
+        if store:
+            # Kept next to every other run, see simulation/results_store.py
+            run_id = ResultsStore().append(
+                self.get_results(), instance_type, os.environ["PERIOD"], seed, config
+            )
+            self.logger.info(f"Results stored as run {run_id}")
 
         sns.set(style="whitegrid")
         fig = plt.figure(figsize=(16, 8))
@@ -1,14 +1,20 @@
-import pygame
 from constants import *
+from animation.fonts import get_font, render_text
 
 
 class Status_Tracker:
     def __init__(self, lifts_store, shuttles_stores):
-        self.font = pygame.font.Font(pygame.font.match_font("arial"), 12)
+        self.font = get_font("arial", 12)
         self.default_lifts = self.get_lifts(lifts_store)
         self.s_lifts = None
         self.s_shuttles = None
         self.parking_lots = None
+        # Area of the window covered by the last drawn text
+        self.rect = None
+
+    def blit_text(self, win, text, text_rect):
+        drawn = win.blit(text, text_rect)
+        self.rect = drawn if self.rect is None else self.rect.union(drawn)
 
     def get_lifts(self, lifts_store):
         lifts_num = []
@@ -37,11 +43,11 @@ class Status_Tracker:
             else:
                 word += "Unavailable"
                 color = (255, 46, 46)
-            text = self.font.render(word, True, color)
+            text = render_text(self.font, word, color)
             text_rect = text.get_rect()
             text_rect.x = 5
             text_rect.y = y
-            win.blit(text, text_rect)
+            self.blit_text(win, text, text_rect)
             y += self.font.get_height()
 
         return y
@@ -59,11 +65,11 @@ class Status_Tracker:
             else:
                 word += "None"
                 color = (255, 46, 46)
-            text = self.font.render(word, True, color)
+            text = render_text(self.font, word, color)
             text_rect = text.get_rect()
             text_rect.x = 5
             text_rect.y = y
-            win.blit(text, text_rect)
+            self.blit_text(win, text, text_rect)
             y += self.font.get_height()
 
         return y
@@ -72,14 +78,15 @@ class Status_Tracker:
         y = start
         for lvl, parking_level in enumerate(self.parking_lots):
             word = f"Level {lvl + 1}: {parking_level} lots"
-            text = self.font.render(word, True, (0, 0, 0))
+            text = render_text(self.font, word, (0, 0, 0))
             text_rect = text.get_rect()
             text_rect.x = 5
             text_rect.y = y
-            win.blit(text, text_rect)
+            self.blit_text(win, text, text_rect)
             y += self.font.get_height()
 
     def __call__(self, win):
+        self.rect = None
         bottom = self.lifts_availability(win)
         bottom = self.shuttles_availability(win, start=bottom + 10)
         self.parking_lots_availability(win, start=bottom + 10)
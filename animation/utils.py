@@ -5,12 +5,15 @@ from os import listdir
 from constants import *
 
 from animation.init import Lift_Floor, Shuttle_Floor, Parking_Floor, Lobby_Floor
+from animation.motion import Motion
 from classes.lift import Lift
 from classes.shuttle import Shuttle
 from classes.lobby import Lobby
 from pygame.math import Vector2
+from simulation import events
 
-FRAME_RATE = FPS * FACTOR
+# Sprite sheets loaded by get_sprite_sheets, shared by the whole process
+_sprite_sheets = {}
 
 
 def get_background(name):
@@ -62,6 +65,18 @@ def load_sprite_sheets(dir1, direction=False):
     return all_sprites
 
 
+def get_sprite_sheets(dir1, direction=False):
+    """
+    Same as load_sprite_sheets, but each sheet is only loaded once per process.
+    The surfaces are shared, callers must not draw on them.
+    """
+    key = (dir1, direction)
+    if key not in _sprite_sheets:
+        _sprite_sheets[key] = load_sprite_sheets(dir1, direction)
+
+    return _sprite_sheets[key]
+
+
 def findCoord(level_layout, destObj):
     for sprite in level_layout.sprites():
         if (
@@ -109,16 +124,14 @@ def moveIntoGroundLift(vehicle, dest_coord, time_duration):
     vehicle.pos = Vector2(
         destination[0], destination[1] + LIFT_IN_OUT_PX
     )  # Spawn and put below
-    velo = Vector2(0, (dest_y - vehicle.pos[1]) / (time_duration * FRAME_RATE))
-    moveVehicle(vehicle, velo, destination)
+    moveVehicle(vehicle, destination, time_duration)
 
 
 def moveOutOfLift(vehicle, dest_coord, time_duration):
     dest_x, dest_y = (dest_coord[0], dest_coord[1] + LIFT_IN_OUT_PX)  # move out of lift
     destination = Vector2(dest_x + vehicle.rect.width / 2, dest_y)
-    velo = Vector2(0, (dest_y - vehicle.pos[1]) / (time_duration * FRAME_RATE))
-    moveVehicle(vehicle, velo, destination)
-    vehicle.fade = True
+    moveVehicle(vehicle, destination, time_duration)
+    vehicle.fade_start = vehicle.env.now
 
 
 def moveShuttle(shuttle_sprite, time_duration, coord, lift=False):
@@ -129,55 +142,63 @@ def moveShuttle(shuttle_sprite, time_duration, coord, lift=False):
     if lift:
         dest_x += GRID_WIDTH
 
-    sprite_x, sprite_y = shuttle_sprite.rect.x, shuttle_sprite.rect.y
-    shuttle_sprite.destination = (dest_x, sprite_y)
-    # logger.info("shuttle: ", sprite.pos, sprite.destination)
-    x = (dest_x - sprite_x) / (time_duration * FRAME_RATE)
-    shuttle_sprite.velo = Vector2(x, 0)
+    now = shuttle_sprite.env.now
+    shuttle_sprite.move(now)  # Wherever its last move has got it to
+    start = Vector2(shuttle_sprite.pos)
+    shuttle_sprite.motion = Motion(
+        start, Vector2(dest_x, start[1]), now, now + time_duration
+    )
 
 
-def moveVehicle(vehicle, velo, dest, direction="up"):
-    dest_x, dest_y = dest
-    vehicle.destination = Vector2(dest_x, dest_y)
+def moveVehicle(vehicle, dest, time_duration, direction="up"):
+    now = vehicle.env.now
+    vehicle.step(now)  # Wherever its last move has got it to
+    vehicle.motion = Motion(
+        Vector2(vehicle.pos), Vector2(dest), now, now + time_duration
+    )
     vehicle.direction = direction
-    vehicle.velo = Vector2(velo)
 
 
 def moveLiftToPallet(vehicle, time_duration, coord):
     dest_x, dest_y = coord
-    y = (dest_y - vehicle.pos[1]) / (time_duration * FRAME_RATE)
-    moveVehicle(vehicle, (0, y), (vehicle.pos[0], dest_y))
+    vehicle.step(vehicle.env.now)
+    moveVehicle(vehicle, (vehicle.pos[0], dest_y), time_duration)
 
 
 def moveOriginToLot(vehicle, shuttle_sprite, time_duration, coord):
     moveShuttle(shuttle_sprite, time_duration, coord)
-    velo_x = shuttle_sprite.velo[0]  # To maintain same speed as shuttle
+    # Same start and end times as the shuttle, so it keeps the same speed
     x_offset = (vehicle.rect.width - GRID_WIDTH) / 2
-    moveVehicle(vehicle, (velo_x, 0), (coord[0] - x_offset, vehicle.pos[1]))
+    vehicle.step(vehicle.env.now)
+    moveVehicle(vehicle, (coord[0] - x_offset, vehicle.pos[1]), time_duration)
 
 
 def rotateVehicle(vehicle, time_duration, coord):
     if time_duration == 0:
         return
-    rotation_speed = 180 / (time_duration * FRAME_RATE)
-    vehicle.rotation_speed = rotation_speed
-    vehicle.final_ori = 180
+    now = vehicle.env.now
+    vehicle.step(now)
+    vehicle.turn = Motion(vehicle.orientation, 180, now, now + time_duration)
 
 
 def movePalletToLot(vehicle, time_duration, coord):
     dest_x, dest_y = coord
-    y = (dest_y - vehicle.pos[1]) / (time_duration * FRAME_RATE)
     x_offset = (vehicle.rect.width - GRID_WIDTH) / 2
-    moveVehicle(vehicle, (0, y), (dest_x - x_offset, dest_y))
+    moveVehicle(vehicle, (dest_x - x_offset, dest_y), time_duration)
+
+
+def carryVehicle(env, vehicle, y):
+    """Puts ``vehicle`` on a lift floor at height ``y``, the lift moves it from here"""
+    vehicle.step(env.now)
+    vehicle.motion = None
+    vehicle.pos[1] = y
 
 
 def moveLift(
-    env, layout, lift, dest, time_duration, vehicle=None, logger=None, fromWhere=None
+    env, layout, lift, dest, time_duration, vehicle=None, recorder=None, fromWhere=None
 ):
     try:
-        logger.info(
-            "[%s] Lift %d: Dest %d, pos: %d" % (fromWhere, lift.num, dest, lift.pos)
-        )
+        recorder.record(events.LIFT_CALLED, fromWhere, lift.num, dest, lift.pos)
         # -ve = going down; +ve = going up; 0 = no change
         no_of_levels = dest - lift.pos
         lifts_dict = findAllLifts(layout, lift)
@@ -202,20 +223,19 @@ def moveLift(
 
             if vehicle:
                 tp_x, tp_y = lifts_dict[lift.pos + 1].rect.topleft
-                vehicle.pos[1] = tp_y
+                carryVehicle(env, vehicle, tp_y)
 
             yield env.timeout(each_level_time)
-            logger.info(
-                "Lift %d has moved from %d to %d at %.2f (%d)"
-                % (lift.num, old_pos, lift.pos + 1, env.now, no_of_levels)
+            recorder.record(
+                events.LIFT_MOVED, lift.num, old_pos, lift.pos + 1, no_of_levels
             )
     except simpy.Interrupt:
-        logger.warning("Lift Operation interrupted")
+        recorder.record(events.LIFT_INTERRUPTED, lift.num)
         lifts_dict[old_pos].toggle_Occupancy()
         lifts_dict[lift.pos + 1].toggle_Occupancy()
         if vehicle:
             tp_x, tp_y = lifts_dict[old_pos].rect.topleft
-            vehicle.pos[1] = tp_y
+            carryVehicle(env, vehicle, tp_y)
 
 
 def findGroundLiftCoord(layout, lift):
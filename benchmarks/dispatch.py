@@ -0,0 +1,57 @@
+"""
+Mean and p95 waits of every lift dispatcher, per policy, over all the period
+slices (and seeds) run headless.
+
+    python -m benchmarks.dispatch [seeds] [dispatcher ...]
+"""
+
+import os
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import sys
+import numpy as np
+
+from classes.dispatcher import DISPATCHERS
+from constants import RANDOM_SEEDS
+from simulation.headless import headless_simulation
+from simulation.sweep import apply_constants, PERIODS, POLICIES
+
+
+def measure(policy, dispatcher, seeds):
+    waits = {"parking": [], "retrieval": []}
+    previous = apply_constants({"LIFT_DISPATCHER": dispatcher})
+    try:
+        for period in PERIODS:
+            for seed in range(RANDOM_SEEDS, RANDOM_SEEDS + seeds):
+                results = headless_simulation(policy, period, seed=seed).get_results()
+                for kind, values in waits.items():
+                    values.extend(results[kind].values())
+    finally:
+        apply_constants(previous)
+
+    return {
+        kind: (np.mean(values), np.percentile(values, 95))
+        for kind, values in waits.items()
+    }
+
+
+def main(seeds, dispatchers):
+    print(
+        "%-14s %-8s %10s %10s %12s %12s"
+        % ("policy", "lifts", "park mean", "park p95", "retr mean", "retr p95")
+    )
+    for policy in POLICIES:
+        for dispatcher in dispatchers:
+            m = measure(policy, dispatcher, seeds)
+            print(
+                "%-14s %-8s %10.3f %10.3f %12.3f %12.3f"
+                % (policy, dispatcher, *m["parking"], *m["retrieval"])
+            )
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 1,
+        sys.argv[2:] or list(DISPATCHERS),
+    )
@@ -0,0 +1,108 @@
+"""
+Counts the simpy events processed by a headless run of every policy, with
+processes woken up by state changes and with the old 1/60 min polling, over a
+few seeds. Polling every 1/120 min shows how far the mean waits of a run move
+with the polling interval alone. The mean waits with state changes must stay
+within that of the ones with 1/60 min polling.
+
+On the 14-20 slice, Balanced and Cache retrievals are about 0.1 min quicker
+with state changes and fail the check. Cars waiting to be moved down to the
+ground level are woken first come first, polling gives a freed shuttle to
+whichever polls first, and waking them in a random order brings the waits
+back to those of polling.
+
+    python -m benchmarks.event_count ["6-14 Hours.csv"] [seeds]
+"""
+
+import os
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import sys
+import time
+import numpy as np
+import simpy
+
+from constants import RANDOM_SEEDS
+from simulation.headless import headless_simulation
+from simulation.sweep import apply_constants, POLICIES
+
+MODES = [("poll", 1 / 60), ("poll/2", 1 / 120), ("event", None)]
+
+
+class CountingEnvironment(simpy.Environment):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.events_processed = 0
+
+    def step(self):
+        self.events_processed += 1
+        super().step()
+
+
+def measure(policy, period, poll_interval, seed):
+    previous = apply_constants({"STATE_POLL_INTERVAL": poll_interval})
+    try:
+        env = CountingEnvironment()
+        started = time.perf_counter()
+        results = headless_simulation(policy, period, env=env, seed=seed).get_results()
+        wall_time = time.perf_counter() - started
+    finally:
+        apply_constants(previous)
+
+    return {
+        "events": env.events_processed,
+        "wall_time": wall_time,
+        "parking": np.mean(list(results["parking"].values())),
+        "retrieval": np.mean(list(results["retrieval"].values())),
+    }
+
+
+def check(policy, runs):
+    """
+    The mean waits with state changes are off those with 1/60 min polling by
+    no more than a run's are between polling every 1/60 and every 1/120 min
+    """
+    for kind in ["parking", "retrieval"]:
+        poll, half, event = [[m[kind] for m in runs[mode]] for mode, _ in MODES]
+        spread = max(abs(a - b) for a, b in zip(poll, half))
+        off = abs(np.mean(event) - np.mean(poll))
+        assert off <= spread, "%s %s wait is %.3f min off polling, spread %.3f" % (
+            policy,
+            kind,
+            off,
+            spread,
+        )
+
+
+def main(period, seeds):
+    print(
+        "%-14s %-8s %10s %8s %12s %14s"
+        % ("policy", "wakeup", "events", "wall(s)", "park wait", "retrieve wait")
+    )
+    for policy in POLICIES:
+        runs = {}
+        for mode, poll_interval in MODES:
+            runs[mode] = [
+                measure(policy, period, poll_interval, seed)
+                for seed in range(RANDOM_SEEDS, RANDOM_SEEDS + seeds)
+            ]
+            print(
+                "%-14s %-8s %10d %8.2f %12.3f %14.3f"
+                % (
+                    policy,
+                    mode,
+                    *[
+                        np.mean([m[key] for m in runs[mode]])
+                        for key in ["events", "wall_time", "parking", "retrieval"]
+                    ],
+                )
+            )
+        check(policy, runs)
+
+
+if __name__ == "__main__":
+    main(
+        sys.argv[1] if len(sys.argv) > 1 else "6-14 Hours.csv",
+        int(sys.argv[2]) if len(sys.argv) > 2 else 5,
+    )
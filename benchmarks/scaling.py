@@ -0,0 +1,100 @@
+"""
+Set up time, headless run time and mean waits of carparks from the default
+5 x 39 lots up to 50 levels of 200 lots, generated by ``Geometry.generate``.
+The arrivals of the period slice are scaled with the number of lots, so every
+size is about as busy as the default carpark. Generated layouts get tracks
+and lifts with their lots and levels, each track with a shuttle of its own,
+so every size keeps up: with Nearest-First over 6-14 Hours the mean waits
+stay within 2.5 - 3.2 mins to park and 1.4 - 2.6 mins to retrieve, and
+50 x 200 runs in about 16 minutes.
+
+    python -m benchmarks.scaling ["6-14 Hours.csv"] [policy]
+"""
+
+import os
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import sys
+import time
+import numpy as np
+import simpy
+
+from classes.geometry import Geometry
+from simulation.headless import headless_simulation
+from simulation.init import sim_init
+from simulation.utils import process_car_arrival_csv
+
+SIZES = [(5, 39), (5, 200), (10, 100), (20, 200), (50, 200)]
+
+
+def scale_arrivals(car_arrival_list, scale):
+    """Cars arriving in each minute times ``scale``, rounded without drift"""
+    total = np.round(np.cumsum(car_arrival_list) * scale).astype(int)
+    return np.diff(total, prepend=0).tolist()
+
+
+def measure(geometry, policy, car_arrival_list):
+    started = time.perf_counter()
+    sim_init(simpy.Environment(), {}, None, None, policy=policy, geometry=geometry)
+    setup_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    results = headless_simulation(
+        policy, geometry=geometry, car_arrival_list=car_arrival_list
+    ).get_results()
+    wall_time = time.perf_counter() - started
+
+    return {
+        "setup": setup_time,
+        "wall_time": wall_time,
+        "cars": len(results["parking"]),
+        "parking": np.mean(list(results["parking"].values())),
+        "retrieval": np.mean(list(results["retrieval"].values())),
+    }
+
+
+def main(period, policy):
+    print(
+        "%-10s %8s %6s %8s %8s %9s %8s %12s %14s"
+        % (
+            "layout",
+            "lots",
+            "lifts",
+            "shuttles",
+            "cars",
+            "setup(s)",
+            "wall(s)",
+            "park wait",
+            "retrieve wait",
+        )
+    )
+    default = Geometry.load()
+    car_arrival_list = process_car_arrival_csv(period)
+    layouts = [default] + [
+        Geometry.generate(levels, lots) for levels, lots in SIZES[1:]
+    ]
+    for geometry in layouts:
+        scale = geometry.total_lots() / default.total_lots()
+        m = measure(geometry, policy, scale_arrivals(car_arrival_list, scale))
+        print(
+            "%-10s %8d %6d %8d %8d %9.3f %8.2f %12.3f %14.3f"
+            % (
+                geometry.name,
+                geometry.total_lots(),
+                len(geometry.lifts),
+                geometry.shuttles_per_level,
+                m["cars"],
+                m["setup"],
+                m["wall_time"],
+                m["parking"],
+                m["retrieval"],
+            )
+        )
+
+
+if __name__ == "__main__":
+    main(
+        sys.argv[1] if len(sys.argv) > 1 else "6-14 Hours.csv",
+        sys.argv[2] if len(sys.argv) > 2 else "Nearest-First",
+    )
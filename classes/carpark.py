@@ -1,21 +1,21 @@
-import random
 import simpy
-from classes.lift import Lift
 from classes.lobby import Lobby
 from constants import *
-from animation.utils import (
-    findCoord,
-    findShuttle,
-    moveIntoGroundLift,
-    moveShuttle,
-    moveLiftToPallet,
-    moveOriginToLot,
-    rotateVehicle,
-    movePalletToLot,
-    moveOutOfLift,
-    moveLift,
-    findGroundLiftCoord,
+import animation.headless
+from classes.state_change import (
+    StateChange,
+    Deadline,
+    any_change,
+    take_turn,
+    ObservableList,
+    ObservableCounts,
 )
+from classes.free_lots import FreeLotIndex
+from classes.travel_times import TravelTimes
+from classes.policies import get_policy
+from classes.dispatcher import get_dispatcher
+from simulation import events
+from simulation.recorder import EventRecorder
 
 """
 Algorithm:
@@ -39,7 +39,11 @@ class Carpark:
         stats_box,
         logger,
         lobby=None,
+        travel_times=None,
         isCache=False,
+        animator=None,
+        recorder=None,
+        policy=None,
     ):
         self.env = env
         # To keep track the total amount of carpark lots available
@@ -49,22 +53,54 @@ class Carpark:
         self.lifts_store = lifts
         self.shuttles_stores = shuttles
         self.lobby_store = lobby
+        self.travel_times = travel_times if travel_times is not None else TravelTimes()
+        # Levels, lots, lifts and lobby of the carpark, see classes/geometry.py
+        self.geometry = self.travel_times.geometry
         self.time_taken = {}
-        self.parking_queue = []
+        # Wake up the processes waiting on the free lifts, the free shuttles
+        # of a level, the lot count of a level or the parking queue
+        self.lifts_changed = StateChange(env)
+        lifts.on_change = self.lifts_changed.notify
+        levels = range(self.geometry.levels)
+        self.shuttles_changed = [StateChange(env) for _ in levels]
+        for store, changed in zip(shuttles, self.shuttles_changed):
+            store.on_change = changed.notify
+        self.lots_changed = [StateChange(env) for _ in levels]
+        self.queue_changed = StateChange(env)
+        # Wakes up lifts held back for a dual command, see return_lift
+        self.lift_wanted = StateChange(env)
+        lifts.on_wait = self.lift_wanted.notify
+        self.parking_queue = ObservableList(on_change=self.queue_changed.notify)
+        # Retrievals waiting on a lift, [(level, car id, handoff, request), ...]
+        self.retrievals_changed = StateChange(env)
+        self.pending_retrievals = ObservableList(
+            on_change=self.retrievals_changed.notify
+        )
         self.layout = layout
         self.stats_box = stats_box
-        self.policy = "Cache" if isCache else 0
+        # Name of the placement policy, see classes/policies.py
+        self.policy = policy or ("Cache" if isCache else "Nearest-First")
         self.logger = logger
+        # Trace of the run, keeps nothing unless given a file
+        self.recorder = recorder if recorder is not None else EventRecorder(env)
         self.status_tracker = None
-        self.available_parking_lots_per_level = self.init_parking_lots_per_level()
-
-    def init_parking_lots_per_level(self):
-        if self.policy == "Cache":
-            init_parking = [NUM_OF_PARKING_LOBBY] + [NUM_OF_PARKING_PER_LEVEL] * 4
-        else:
-            init_parking = [NUM_OF_PARKING_PER_LEVEL] * NUM_OF_LEVELS
-
-        return init_parking
+        # Module providing the find*/move* helpers, animation.utils when there is a display
+        self.animator = animator if animator is not None else animation.headless
+        self.available_parking_lots_per_level = self.init_parking_lots_per_level(
+            isCache
+        )
+        # Free lots of each level, ordered by travel time from every lift
+        self.free_lots = self.init_free_lots(isCache)
+        # Cars on their way to a lot of each track of each level, not reserved yet
+        self.track_claims = [[0] * len(self.geometry.tracks) for _ in levels]
+        # Picks the lift handed out for each request, see LIFT_DISPATCHER
+        self.dispatcher = get_dispatcher(self)
+        # Where cars are parked, and what happens to them while parked
+        self.placement = get_policy(self.policy)(self)
+
+    def init_parking_lots_per_level(self, isCache):
+        init_parking = self.geometry.lots_per_level(isCache)
+        return ObservableCounts(init_parking, self.lots_changed)
 
     def update_status(self):
         while True:
@@ -74,39 +110,83 @@ class Carpark:
 
             yield self.env.timeout(5 / 60)  # Every 5s
 
-    def update_lifts(self):
-        available_lifts = [lift.num for lift in self.lifts_store.items]
-        sorted_lifts = sorted(available_lifts)
-        self.logger.info(
-            "Lifts: %s at %.2f" % (", ".join(map(str, sorted_lifts)), self.env.now)
+    def idle(self):
+        """Whether every lift and shuttle is free, so none of them is moving"""
+        return (
+            len(self.lifts_store.items) == self.lifts_store.capacity
+            and not any(lift.descending() for lift in self.lifts_store.items)
+            and all(
+                len(store.items) == store.capacity for store in self.shuttles_stores
+            )
         )
 
+    def update_lifts(self):
+        if self.recorder.enabled(events.LIFTS_FREE):
+            sorted_lifts = sorted(lift.num for lift in self.lifts_store.items)
+            self.recorder.record(events.LIFTS_FREE, ", ".join(map(str, sorted_lifts)))
+
+    def init_free_lots(self, isCache):
+        sources = list(self.lifts_store.items)
+        lots = [self.geometry.level_lots()] * self.geometry.levels
+        if isCache:
+            # Cache level only has the lots the lobby can reach
+            sources += self.lobby_store.items
+            lots[0] = self.travel_times.source_lots[self.travel_times.lobby_source]
+
+        return FreeLotIndex(lots, sources, self.travel_times)
+
+    def reserve_lot(self, level, lot):
+        self.parking_lots_sets[level].add(lot)
+        self.free_lots.take(level, lot)
+
+    def release_lot(self, level, lot):
+        self.parking_lots_sets[level].remove(lot)
+        self.free_lots.release(level, lot)
+
     def get_shortest_avail_travel_lot(self, lift, level):
-        if self.policy == "Cache" and isinstance(lift, Lift) and level == 0:
-            available_lots = [
-                lot
-                for lot in lift.travel_times_lobby
-                if lot not in self.parking_lots_sets[level]
-            ]
-        else:
-            available_lots = [
-                lot
-                for lot in lift.travel_times
-                if lot not in self.parking_lots_sets[level]
-            ]
-        self.logger.info(f"Level {level+1} Available lots: {available_lots}")
-        shortest_time_lot = min(
-            available_lots, key=lambda lot: lift.travel_times[lot]["total"]
-        )
-        # self.logger.info(shortest_time_lot)
-        return shortest_time_lot
+        return self.free_lots.nearest(level, lift)
 
     def random_parking_lot(self, lift, level):
-        available_lots = [
-            lot for lot in lift.travel_times if lot not in self.parking_lots_sets[level]
-        ]
-        random_parking = random.choice(available_lots)
-        return random_parking
+        return self.free_lots.random(level, lift.track)
+
+    def get_shuttle(self, level, track):
+        """Get event for the shuttle of ``track`` on ``level``"""
+        return self.shuttles_stores[level].get(lambda shuttle: shuttle.track == track)
+
+    def unclaimed_lots(self, level, track):
+        """Free lots of a track of ``level`` no car is on its way to yet"""
+        return self.free_lots.free_count(level, track) - self.track_claims[level][track]
+
+    def shuttle_track(self, level):
+        """
+        Track of ``level`` whose shuttle is free and which has a lot to spare,
+        the one with the most of them, or None
+        """
+        tracks = [shuttle.track for shuttle in self.shuttles_stores[level].items]
+        tracks = [track for track in tracks if self.unclaimed_lots(level, track) > 0]
+        return max(
+            tracks, key=lambda track: self.unclaimed_lots(level, track), default=None
+        )
+
+    def claim_track(self, level):
+        """
+        Track of ``level`` a car is parked on: one with a free shuttle if there
+        is one, the one with the most lots to spare otherwise. The claim holds
+        one of its lots until the car's lot is reserved, see ``park``
+        """
+        track = self.shuttle_track(level)
+        if track is None:
+            tracks = range(len(self.geometry.tracks))
+            track = max(tracks, key=lambda track: self.unclaimed_lots(level, track))
+        self.track_claims[level][track] += 1
+        return track
+
+    def get_shortest_avail_lift_lot(self, level, lifts=None):
+        """(lift, lot) pair with the shortest trip among free lifts, or None"""
+        lifts = self.lifts_store.items if lifts is None else lifts
+        if not lifts:
+            return None
+        return self.free_lots.best(level, lifts)
 
     def get_remaining_parking_lots(self):
         return (
@@ -120,52 +200,39 @@ class Carpark:
     def get_shortest_to_lot_avail_lift(self, parking_info):
         _, parking_num = parking_info
 
-        while True:
+        num = self.get_shortest_to_lot_lift(parking_num)
+        turn = take_turn()
+        while num is None:
+            yield self.lifts_changed.wait(turn)
             num = self.get_shortest_to_lot_lift(parking_num)
 
-            if num is not None:
-                break  # Exit the loop if num is not None
-            yield self.env.timeout(1 / 60)
-
         return num
 
     def get_shortest_to_lot_lift(self, parking_lot_num):
-        min_total = float("inf")
-        min_lift = None
-
-        # Iterate through the list of dictionaries
-        for lift in self.lifts_store.items:
-            travel_times = lift.travel_times
-            total_time = travel_times[parking_lot_num]["total"]
+        track = self.geometry.lot_track(parking_lot_num)
+        lifts = [lift for lift in self.lifts_store.items if lift.track == track]
+        if not lifts:
+            return None
 
-            if travel_times[parking_lot_num]["turning"] > 0:
-                total_time -= travel_times[parking_lot_num]["turning"]
-
-            if total_time < min_total:
-                min_total = total_time
-                min_lift = lift.num
-
-        return min_lift
+        source = self.travel_times.best_source(
+            parking_lot_num, [lift.source for lift in lifts]
+        )
+        return source + 1
 
     def check_lift_usage(self, car_id):
         if len(self.lifts_store.items) == 0:
-            self.logger.info(
-                "Car %d - Lifts are currently all occupied at %.2f"
-                % (car_id, self.env.now)
-            )
-        else:
-            available_lifts = [lift.num for lift in self.lifts_store.items]
-            sorted_lifts = sorted(available_lifts)
-            self.logger.info(
-                "Lifts %s are available at %.2f"
-                % (", ".join(map(str, sorted_lifts)), self.env.now)
+            self.recorder.record(events.LIFTS_ALL_BUSY, car_id)
+        elif self.recorder.enabled(events.LIFTS_AVAILABLE):
+            sorted_lifts = sorted(lift.num for lift in self.lifts_store.items)
+            self.recorder.record(
+                events.LIFTS_AVAILABLE, ", ".join(map(str, sorted_lifts))
             )
 
     def check_shuttle_availability(self):
-        for idx, shuttle_store in enumerate(self.shuttles_stores):
+        for idx in range(self.geometry.levels):
             if (
-                len(shuttle_store.items) > 0
-                and self.available_parking_lots_per_level[idx] > 0
+                self.available_parking_lots_per_level[idx] > 0
+                and self.shuttle_track(idx) is not None
             ):
                 self.available_parking_lots_per_level[idx] -= 1
                 return idx
@@ -174,113 +241,195 @@ class Carpark:
         # check if which level shuttle is free
         # Possible deadlock when car wants to come out but lift is full
 
-        floor_level = None
-        while floor_level == None:
+        floor_level = self.check_shuttle_availability()
+        turn = take_turn()
+        while floor_level is None:
+            yield any_change(*self.shuttles_changed, *self.lots_changed, turn=turn)
             floor_level = self.check_shuttle_availability()
-            yield self.env.timeout(1 / 60)
-
-            if floor_level is not None:
-                break
 
         # Request for shuttle
         # self.check_shuttle_usage(avail_shuttle_level)
         return floor_level
 
+    def get_cache_level(self):
+        # Ground level first, otherwise the subsequent floor with a lot and a shuttle
+        for level in range(self.geometry.levels):
+            if (
+                self.available_parking_lots_per_level[level] > 0
+                and self.shuttle_track(level) is not None
+            ):
+                return level
+
     def check_shuttle_usage(self, level):
         cur_shuttle = self.shuttles_stores[level].items
         if level == 1 and len(cur_shuttle) > 0:
-            self.logger.warning("shuttle pos %d" % cur_shuttle[0].cur_pos)
+            self.recorder.record(events.SHUTTLE_POS, cur_shuttle[0].cur_pos)
         if len(cur_shuttle) == 0:
-            self.logger.info(
-                "Level %d's Shuttle is currently all occupied at %.2f"
-                % (level + 1, self.env.now)
-            )
+            self.recorder.record(events.SHUTTLES_BUSY, level + 1)
 
     def move_lift_ground_level(self, lift, vehicle=None, release=False, fromWhere=None):
         lift_time_taken_to_ground = lift.time_taken_from_origin_to_dest(dest=0)
         yield self.env.process(
-            moveLift(
+            self.animator.moveLift(
                 self.env,
                 self.layout,
                 lift,
                 0,
                 lift_time_taken_to_ground,
                 vehicle=vehicle,
-                logger=self.logger,
+                recorder=self.recorder,
                 fromWhere=fromWhere,
             )
         )
         if release:
             self.update_lifts()
             yield self.lifts_store.put(lift)
-            self.logger.warning("Lift %d back into store" % (lift.num))
+            self.recorder.record(events.LIFT_RETURNED, fromWhere, lift.num)
 
         self.update_lifts()
 
-    def park(self, vehicle, time_start):
-        # To which level? Check based on shuttle and available level
+    def request_lift(self, level, lot, car_id):
+        """
+        Lift for a retrieval from ``lot`` of ``level``: a free one, or one handed
+        over by a lift on its way down from parking a car (dual command)
+        """
+        request = self.dispatcher.request(level, lot)
+        if not DUAL_COMMAND or request.triggered:
+            lift = yield request
+            yield from self.stop_lift(lift)
+            return lift
+
+        handoff = self.env.event()
+        pending = (level, car_id, handoff, request)
+        self.pending_retrievals.append(pending)
+        yield request | handoff
+
+        if handoff.triggered:
+            # Taken off pending_retrievals by the lift handing itself over
+            if request.triggered:
+                self.put_back_lift(request.value)
+            else:
+                request.cancel()
+            return handoff.value
 
-        # Track time of service - START
-        service_time_start = self.env.now
+        self.pending_retrievals.remove(pending)
+        yield from self.stop_lift(request.value)
+        return request.value
 
-        if self.policy == "Nearest-First":
-            avail_shuttle_level = yield self.env.process(
-                self.get_shuttle_level_availability()
-            )  # index 0
-
-        elif self.policy == "Randomised":
-            avail_shuttle_level = random.randint(0, NUM_OF_LEVELS - 1)
-            while self.available_parking_lots_per_level[avail_shuttle_level] <= 0:
-                avail_shuttle_level = random.randint(0, NUM_OF_LEVELS - 1)
-                yield self.env.timeout(1 / 60)
-            self.available_parking_lots_per_level[avail_shuttle_level] -= 1
-
-        elif self.policy == "Balanced":
-            # Lowest level first
-            min_length = float("inf")
-            avail_shuttle_level = 0
-            for idx, s in enumerate(self.parking_lots_sets):
-                if (
-                    self.available_parking_lots_per_level[idx] > 0
-                    and len(s) < min_length
-                ):
-                    avail_shuttle_level = idx
-                    min_length = len(s)
-
-            self.available_parking_lots_per_level[avail_shuttle_level] -= 1
-
-        elif self.policy == "Cache":
-            # Ground Level - Cache
-            # TODO: For the retrieval process, the temporary parking lots can help
-            # if a car can be prefetched before the driver arrives to pick up
-            avail_shuttle_level = 0
-            self.logger.info(
-                f"[CACHE] Level {avail_shuttle_level+1} Available lots: {self.available_parking_lots_per_level[avail_shuttle_level]}"
-            )
+    def lift_requests(self, track):
+        """Requests waiting for a lift of ``track``, first come first"""
+        return [
+            request for request in self.lifts_store.get_queue if request.track == track
+        ]
 
+    def pending_retrieval_below(self, lift):
+        # Only the retrieval next in line for a lift of its track, so no
+        # parking car that asked for one earlier is overtaken
+        requests = self.lift_requests(lift.track)
+        if not requests:
+            return None
+        for pending in self.pending_retrievals:
+            if pending[3] is requests[0] and pending[0] <= lift.pos:
+                return pending
+
+    def return_lift(self, lift, fromWhere=None):
+        """
+        Sends a lift that has just dropped a car off back to the ground level,
+        picking up a waiting retrieval on the way when dual command is on. It
+        only waits for one while no other request waits for a lift. With
+        ``FREE_RETURNING_LIFTS`` it is free again right away, for the dispatcher
+        to hand out on its way down
+        """
+        if DUAL_COMMAND:
+            window_end = Deadline(self.env, self.env.now + DUAL_COMMAND_WINDOW)
+            pending = self.pending_retrieval_below(lift)
+            turn = take_turn()
             while (
-                self.available_parking_lots_per_level[avail_shuttle_level] <= 0
-                or len(self.shuttles_stores[avail_shuttle_level].items) == 0
+                pending is None
+                and not self.lift_requests(lift.track)
+                and not window_end.passed()
             ):
-                # Get the subsequent floor instead
-                avail_shuttle_level = (avail_shuttle_level + 1) % NUM_OF_LEVELS
-                yield self.env.timeout(1 / 60)
+                yield any_change(
+                    self.retrievals_changed,
+                    self.lifts_changed,
+                    self.lift_wanted,
+                    window_end,
+                    turn=turn,
+                )
+                pending = self.pending_retrieval_below(lift)
+
+            if pending is not None:
+                level, car_id, handoff, _ = pending
+                self.pending_retrievals.remove(pending)
+                lift.call_at(level, 0)
+                self.recorder.record(
+                    events.LIFT_DUAL_COMMAND, lift.num, lift.pos + 1, car_id, level + 1
+                )
+                handoff.succeed(lift)
+                return
 
-            self.available_parking_lots_per_level[avail_shuttle_level] -= 1
+        if FREE_RETURNING_LIFTS:
+            self.put_back_lift(lift, fromWhere)
+            self.update_lifts()
+            self.recorder.record(events.LIFT_RETURNED, fromWhere, lift.num)
+            return
 
-        else:
-            raise Exception("No policy specified...")
+        yield self.env.process(
+            self.move_lift_ground_level(lift, release=True, fromWhere=fromWhere)
+        )
+
+    def descend_free_lift(self, lift, fromWhere=None):
+        # A level at a time, until the lift is at the ground level or handed out
+        while lift.pos > 0 and lift in self.lifts_store.items:
+            yield self.env.process(
+                self.animator.moveLift(
+                    self.env,
+                    self.layout,
+                    lift,
+                    lift.pos - 1,
+                    lift.time_taken_from_origin_to_dest(dest=lift.pos - 1),
+                    recorder=self.recorder,
+                    fromWhere=fromWhere,
+                )
+            )
+
+    def put_back_lift(self, lift, fromWhere=None):
+        """Frees a lift where it is, it goes on down to the ground level while free"""
+        self.lifts_store.put(lift)
+        # Started at once, so a request the put has just served waits for it
+        if lift.pos > 0 and not lift.descending():
+            lift.returning = self.env.process(self.descend_free_lift(lift, fromWhere))
+
+    def stop_lift(self, lift):
+        """
+        Waits for a lift handed out on its way down to reach the level it is
+        passing, from where it can be sent anywhere
+        """
+        if lift.descending():
+            yield lift.returning
+
+    def park(self, vehicle, time_start):
+        # Track time of service - START
+        service_time_start = self.env.now
+
+        # To which level? Up to the policy, based on shuttles and available lots
+        avail_shuttle_level = yield from self.placement.choose_level()
+        # Along which of the level's tracks, whose shuttle and lifts it takes
+        track = self.claim_track(avail_shuttle_level)
 
         # Request for shuttle
         self.check_shuttle_usage(avail_shuttle_level)
-        shuttle = yield self.shuttles_stores[avail_shuttle_level].get()
+        shuttle = yield self.get_shuttle(avail_shuttle_level, track)
 
         # Wait for available lift
-        if self.policy == "Cache" and avail_shuttle_level == 0:
+        if self.placement.cache_level and avail_shuttle_level == 0:
             lift_lobby = yield self.lobby_store.get()
         else:
             self.check_lift_usage(vehicle.id)
-            lift_lobby = yield self.lifts_store.get()
+            lift_lobby = yield self.dispatcher.request(
+                avail_shuttle_level, pickup=0, track=track
+            )
+            yield from self.stop_lift(lift_lobby)
 
         # Move Lift to ground level
         yield self.env.process(
@@ -290,130 +439,125 @@ class Carpark:
         self.stats_box.stats["Cars Waiting"] -= 1
 
         # Driver Driving into the lift delay
-        ground_lift_coord = findCoord(self.layout[1], lift_lobby)
+        ground_lift_coord = self.animator.findCoord(self.layout[1], lift_lobby)
 
         # Log waiting time - END
         time_end = self.env.now
-        self.stats_box.waiting_stats["parking"][vehicle.id] = round(
-            time_end - time_start, 2
+        self.stats_box.record_time(
+            "parking", vehicle.id, round(time_end - time_start, 2)
         )
 
         # Driver drive into the loading bay
-        drive_time_taken = random.uniform(*DRIVE_IN_OUT)
-        moveIntoGroundLift(vehicle, ground_lift_coord, drive_time_taken)
+        drive_time_taken = vehicle.drive_in_time
+        self.animator.moveIntoGroundLift(vehicle, ground_lift_coord, drive_time_taken)
         yield self.env.timeout(drive_time_taken)
 
-        self.logger.info(
-            "[Parking] Car %d entered in lift bay and took lift %d at %.2f"
-            % (vehicle.id, lift_lobby.num, self.env.now)
-        )
+        self.recorder.record(events.PARKING_ENTERED_LIFT, vehicle.id, lift_lobby.num)
 
-        # Lift Travel Time to that level
-        # TODO: Retrieving shuttle time while lift going up?
+        # Lift Travel Time to that level, the shuttle sets off to meet it once
+        # it is there
         # self.logger.info("LEVEL AVAILABLE: ", avail_shuttle_level)
         cur_level_layout = self.layout[avail_shuttle_level + 1]
-        lift_coord = findCoord(cur_level_layout, lift_lobby)
+        lift_coord = self.animator.findCoord(cur_level_layout, lift_lobby)
 
         lift_time_taken = lift_lobby.time_taken_from_origin_to_dest(
             dest=avail_shuttle_level
         )
         yield self.env.process(
-            moveLift(
+            self.animator.moveLift(
                 self.env,
                 self.layout,
                 lift_lobby,
                 avail_shuttle_level,
                 lift_time_taken,
                 vehicle=vehicle,
-                logger=self.logger,
+                recorder=self.recorder,
                 fromWhere="Parking",
             )
         )
 
-        self.logger.info(
-            "[Parking] Car %d took lift %d and at level %d at %.2f"
-            % (vehicle.id, lift_lobby.num, avail_shuttle_level + 1, self.env.now)
+        self.recorder.record(
+            events.PARKING_AT_LEVEL, vehicle.id, lift_lobby.num, avail_shuttle_level + 1
         )
 
         # Shuttle from somewhere moves to lift position
         shuttle_time_taken, destination = shuttle.time_taken_to_destination(
-            lift_lobby.num, lift=True
+            lift_lobby, lift=True
         )
         # Animate shuttle from current to next position
-        shuttle_sprite = findShuttle(cur_level_layout, shuttle)
-        moveShuttle(shuttle_sprite, shuttle_time_taken, lift_coord, lift=True)
+        shuttle_sprite = self.animator.findShuttle(cur_level_layout, shuttle)
+        self.animator.moveShuttle(
+            shuttle_sprite, shuttle_time_taken, lift_coord, lift=True
+        )
         yield self.env.timeout(shuttle_time_taken)
         shuttle.set_pos(destination)
 
-        self.logger.info(
-            "[Parking] Level %d's shuttle %d is ready for loading at %.2f"
-            % (avail_shuttle_level + 1, shuttle.num, self.env.now)
+        self.recorder.record(
+            events.PARKING_SHUTTLE_READY, avail_shuttle_level + 1, shuttle.num
         )
 
         # Policy Default: Finding the shortest available travel lot
         # Policy Randomised: Finding the random spot based on floor
-        if self.policy == "Randomised":
-            parking_lot_num = self.random_parking_lot(lift_lobby, avail_shuttle_level)
-        else:
-            parking_lot_num = self.get_shortest_avail_travel_lot(
-                lift_lobby, avail_shuttle_level
-            )
+        # (see PlacementPolicy.choose_lot)
+        parking_lot_num = self.placement.choose_lot(lift_lobby, avail_shuttle_level)
 
         # Parking is reserved for this car
-        self.parking_lots_sets[avail_shuttle_level].add(parking_lot_num)
+        self.track_claims[avail_shuttle_level][track] -= 1
+        self.reserve_lot(avail_shuttle_level, parking_lot_num)
 
         # Travelling time from front of the lift to parking lot
-        time_taken_to_parking = lift_lobby.travel_times.get(parking_lot_num)
+        time_taken_to_parking = lift_lobby.lot_times(parking_lot_num)
 
-        moveLiftToPallet(
-            vehicle, time_taken_to_parking["lift_pallet"], shuttle_sprite.pos
+        self.animator.moveLiftToPallet(
+            vehicle, time_taken_to_parking.lift_pallet, shuttle_sprite.pos
         )
-        yield self.env.timeout(time_taken_to_parking["lift_pallet"])
+        yield self.env.timeout(time_taken_to_parking.lift_pallet)
 
-        if self.policy == "Cache" and isinstance(lift_lobby, Lobby):
+        if isinstance(lift_lobby, Lobby):
             # Put lobby back into store
             yield self.lobby_store.put(lift_lobby)
         else:
-            # Put lift back into store - send lift back to ground level
-            self.env.process(
-                self.move_lift_ground_level(
-                    lift_lobby, release=True, fromWhere="Parking"
-                )
-            )
+            # Put lift back into store - send lift back to ground level, or hand
+            # it to a retrieval on the way
+            self.env.process(self.return_lift(lift_lobby, fromWhere="Parking"))
 
-        parking_coord = findCoord(cur_level_layout, parking_lot_num)
+        parking_coord = self.animator.findCoord(cur_level_layout, parking_lot_num)
         # self.logger.info("Parking: ", parking_coord)
-        moveOriginToLot(
+        self.animator.moveOriginToLot(
             vehicle,
             shuttle_sprite,
-            time_taken_to_parking["origin_lot"],
+            time_taken_to_parking.origin_lot,
             parking_coord,
         )
-        yield self.env.timeout(time_taken_to_parking["origin_lot"])
+        yield self.env.timeout(time_taken_to_parking.origin_lot)
 
-        rotateVehicle(vehicle, time_taken_to_parking["turning"], parking_coord)
-        yield self.env.timeout(time_taken_to_parking["turning"])
-
-        movePalletToLot(vehicle, time_taken_to_parking["pallet_lot"], parking_coord)
-        yield self.env.timeout(time_taken_to_parking["pallet_lot"])
+        self.animator.rotateVehicle(
+            vehicle, time_taken_to_parking.turning, parking_coord
+        )
+        yield self.env.timeout(time_taken_to_parking.turning)
 
-        vehicle.popup.set_text("parked time", round(self.env.now, 2))
-        self.logger.info(
-            "[Parking] Car %d parked at parking lot %d at %.2f"
-            % (vehicle.id, parking_lot_num, self.env.now)
+        self.animator.movePalletToLot(
+            vehicle, time_taken_to_parking.pallet_lot, parking_coord
         )
+        yield self.env.timeout(time_taken_to_parking.pallet_lot)
+
+        if vehicle.popup is not None:
+            vehicle.popup.set_text("parked time", round(self.env.now, 2))
+        self.recorder.record(events.PARKED, vehicle.id, parking_lot_num)
 
         # Track time of service - END
         service_time_end = self.env.now
-        self.stats_box.service_stats["parking"][vehicle.id] = round(
-            service_time_end - service_time_start, 2
+        self.stats_box.record_time(
+            "service_parking",
+            vehicle.id,
+            round(service_time_end - service_time_start, 2),
         )
 
         vehicle.parking_lot = (avail_shuttle_level, parking_lot_num)
         self.stats_box.stats["Cars Parked"] += 1
 
-        # Move shuttle back to default position and move back shuttle to default pos
-        # TODO: Might have issues when waiting for shuttle to return to default pos
+        # Move shuttle back to default position, the next car on the level waits
+        # until it is there
         self.env.process(
             self.moving_shuttle_back_to_default(
                 shuttle, shuttle_sprite, avail_shuttle_level
@@ -426,9 +570,8 @@ class Carpark:
         car is unable to exit, resulting in a dead lock.
         Solution: Reserve a lift first and then shuttle?
         """
-        self.logger.info(
-            "[Exiting] Car %d is at level %d leaving the parking lot"
-            % (vehicle.id, vehicle.parking_lot[0] + 1)
+        self.recorder.record(
+            events.EXIT_LEAVING_LOT, vehicle.id, vehicle.parking_lot[0] + 1
         )
         # Log waiting time - START
         time_start = self.env.now
@@ -438,51 +581,46 @@ class Carpark:
         if not lift and not shuttle:
             # Wait for available lift
             self.check_lift_usage(vehicle.id)
-            # Get the closest lift
-            # num = yield self.env.process(
-            #     self.get_shortest_to_lot_avail_lift(vehicle.parking_lot)
-            # )
-            # shuttle = yield self.shuttles_stores[vehicle.parking_lot[0]].get()
-            # lift = yield self.lifts_store.get(lambda lift: lift.num == num)
-
-            shuttle = yield self.shuttles_stores[vehicle.parking_lot[0]].get()
-            if self.policy == "Cache" and vehicle.parking_lot[0] == 0:
+            shuttle = yield self.get_shuttle(
+                vehicle.parking_lot[0], self.geometry.lot_track(vehicle.parking_lot[1])
+            )
+            if self.placement.cache_level and vehicle.parking_lot[0] == 0:
                 lift = yield self.lobby_store.get()
             else:
-                lift = yield self.lifts_store.get()
-            self.logger.info(
-                "[Exiting] Car %d reserving lift %d and level %d shuttle"
-                % (vehicle.id, lift.num, vehicle.parking_lot[0] + 1)
+                lift = yield self.env.process(
+                    self.request_lift(*vehicle.parking_lot, vehicle.id)
+                )
+            self.recorder.record(
+                events.EXIT_RESERVING, vehicle.id, lift.num, vehicle.parking_lot[0] + 1
             )
         else:
-            self.logger.info(
-                "[Exiting] Car %d is at level %d reserved lift %d and level %d shuttle"
-                % (
-                    vehicle.id,
-                    vehicle.parking_lot[0] + 1,
-                    lift.num,
-                    vehicle.parking_lot[0],
-                )
+            self.recorder.record(
+                events.EXIT_RESERVED,
+                vehicle.id,
+                vehicle.parking_lot[0] + 1,
+                lift.num,
+                vehicle.parking_lot[0],
             )
 
-        shuttle_sprite = findShuttle(cur_level_layout, shuttle)
-        parking_coord = findCoord(cur_level_layout, vehicle.parking_lot[1])
+        shuttle_sprite = self.animator.findShuttle(cur_level_layout, shuttle)
+        parking_coord = self.animator.findCoord(
+            cur_level_layout, vehicle.parking_lot[1]
+        )
 
         if state < 6 or state == 9:
             # Shuttle from somewhere moves to parking_lot
             shuttle_time_taken, destination = shuttle.time_taken_to_destination(
                 vehicle.parking_lot[1]
             )
-            self.logger.info(
-                "[Exiting] Car %d is at level %d using the shuttle"
-                % (vehicle.id, vehicle.parking_lot[0] + 1)
+            self.recorder.record(
+                events.EXIT_USING_SHUTTLE, vehicle.id, vehicle.parking_lot[0] + 1
             )
             # Animate shuttle from current to next position
-            moveShuttle(shuttle_sprite, shuttle_time_taken, parking_coord)
+            self.animator.moveShuttle(shuttle_sprite, shuttle_time_taken, parking_coord)
             yield self.env.timeout(shuttle_time_taken)
             shuttle.set_pos(destination)
 
-        lift_coord = findCoord(cur_level_layout, lift)
+        lift_coord = self.animator.findCoord(cur_level_layout, lift)
         lift_coord_center = (lift_coord[0] + GRID_WIDTH, lift_coord[1])
 
         if state < 6 or state >= 8:
@@ -491,61 +629,53 @@ class Carpark:
                 dest=vehicle.parking_lot[0]
             )
             yield self.env.process(
-                moveLift(
+                self.animator.moveLift(
                     self.env,
                     self.layout,
                     lift,
                     vehicle.parking_lot[0],
                     lift_time_taken,
-                    logger=self.logger,
+                    recorder=self.recorder,
                     fromWhere="Exiting-6|8",
                 )
             )
 
         # Travelling time from parking lot to lift - concurrent for lift travel time?
-        time_taken_to_lift = lift.travel_times.get(vehicle.parking_lot[1])
+        time_taken_to_lift = lift.lot_times(vehicle.parking_lot[1])
 
         if state < 4 or state >= 8:
-            movePalletToLot(
-                vehicle, time_taken_to_lift["pallet_lot"], shuttle_sprite.pos
+            self.animator.movePalletToLot(
+                vehicle, time_taken_to_lift.pallet_lot, shuttle_sprite.pos
             )
-            yield self.env.timeout(time_taken_to_lift["pallet_lot"])
+            yield self.env.timeout(time_taken_to_lift.pallet_lot)
         if state < 6 or state >= 8:
-            moveOriginToLot(
+            self.animator.moveOriginToLot(
                 vehicle,
                 shuttle_sprite,
-                time_taken_to_lift["pallet_lot"],
+                time_taken_to_lift.pallet_lot,
                 lift_coord_center,
             )
-            yield self.env.timeout(time_taken_to_lift["pallet_lot"])
+            yield self.env.timeout(time_taken_to_lift.pallet_lot)
 
-            moveLiftToPallet(
-                vehicle, time_taken_to_lift["lift_pallet"], lift_coord_center
+            self.animator.moveLiftToPallet(
+                vehicle, time_taken_to_lift.lift_pallet, lift_coord_center
             )
-            yield self.env.timeout(time_taken_to_lift["lift_pallet"])
+            yield self.env.timeout(time_taken_to_lift.lift_pallet)
 
-            self.logger.info(
-                "[Exiting] Car %d entered in lift bay and took lift %d at %.2f"
-                % (vehicle.id, lift.num, self.env.now)
-            )
+            self.recorder.record(events.EXIT_ENTERED_LIFT, vehicle.id, lift.num)
 
         # Lift travel time to reach ground level
         yield self.env.process(
             self.move_lift_ground_level(lift, vehicle, fromWhere="Exiting")
         )
-        self.logger.info(
-            "[Exiting] Lift %d move to level %d at %.2f"
-            % (lift.num, lift.pos + 1, self.env.now)
-        )
+        self.recorder.record(events.EXIT_LIFT_MOVED, lift.num, lift.pos + 1)
 
         # Release parking spot
         self.available_parking_lots_per_level[vehicle.parking_lot[0]] += 1
         self.total_parking_lot_resources.release(parking_lot_request)
-        self.parking_lots_sets[vehicle.parking_lot[0]].remove(vehicle.parking_lot[1])
+        self.release_lot(vehicle.parking_lot[0], vehicle.parking_lot[1])
 
-        self.logger.info(
-            "[Exiting] Car %d exited the carpark at %.2f" % (vehicle.id, self.env.now)
-        )
+        self.recorder.record(events.EXITED, vehicle.id)
 
         # Move shuttle back to default position and move back shuttle to default pos
         lift_movement = self.env.process(
@@ -558,20 +688,17 @@ class Carpark:
         self.stats_box.stats["Cars Exited"] += 1
 
         # Drove into the lift bay and driver drives out
-        drive_time_taken = random.uniform(*DRIVE_IN_OUT)
-        ground_floor_coord = findGroundLiftCoord(self.layout, lift)
-        moveOutOfLift(vehicle, ground_floor_coord, drive_time_taken)
+        drive_time_taken = vehicle.drive_out_time
+        ground_floor_coord = self.animator.findGroundLiftCoord(self.layout, lift)
+        self.animator.moveOutOfLift(vehicle, ground_floor_coord, drive_time_taken)
         yield self.env.timeout(drive_time_taken)
 
-        self.logger.info(
-            "[Exiting] Car %d exits out of the carpark at %.2f"
-            % (vehicle.id, self.env.now)
-        )
+        self.recorder.record(events.DROVE_OUT, vehicle.id)
 
         # Log waiting time - END
         time_end = self.env.now
-        self.stats_box.waiting_stats["retrieval"][vehicle.id] = round(
-            time_end - time_start, 2
+        self.stats_box.record_time(
+            "retrieval", vehicle.id, round(time_end - time_start, 2)
         )
 
         vehicle.parking_lot = (None, None)
@@ -579,259 +706,268 @@ class Carpark:
         # Put lift back into store
         yield lift_movement
 
-        if self.policy == "Cache" and isinstance(lift, Lobby):
+        if isinstance(lift, Lobby):
             # Put lobby back into store
             self.lobby_store.put(lift)
-            self.logger.warning("[Exiting] Lobby %d back into store" % (lift.num))
+            self.recorder.record(events.LOBBY_RETURNED, "Exiting", lift.num)
         else:
             yield self.lifts_store.put(lift)
-        self.logger.warning("[Exiting] Lift %d back into store" % (lift.num))
+            self.recorder.record(events.LIFT_RETURNED, "Exiting", lift.num)
 
-    def move_vehicle_on_idle_shuttle(self, vehicle, parking_lot_request):
+    def get_cache_move_level(self):
+        """
+        Lowest higher level a car on the ground level can be moved up to right
+        now, or None while a lift or one of the shuttles is busy
+        """
+        if not self.shuttles_stores[0].items or not self.lifts_store.items:
+            return None
+
+        for level in range(1, self.geometry.levels):
+            if (
+                self.available_parking_lots_per_level[level] > 0
+                and self.shuttles_stores[level].items
+            ):
+                return level
+
+    def move_vehicle_on_idle_shuttle(self, vehicle, parking_lot_request, f_level):
+        # Issued by the CacheRebalancer, which already counted a lot of f_level
+        # as taken when get_cache_move_level() found it
         state = 0
         shuttle, lift = None, None
-        f_level, f_parking_lot_num, f_shuttle, f_shuttle_sprite = None, None, None, None
-        lift_p = None
+        f_parking_lot_num, f_shuttle, f_shuttle_sprite = None, None, None
+        lift_p, lift_ground = None, None
+        requests = []
         time_taken_to_parking = None
+        # Shuttles of the car's track on both levels
+        track = self.geometry.lot_track(vehicle.parking_lot[1])
         try:
-            while True:
-                # self.logger.warning(self.available_parking_lots_per_level)
-                # self.logger.warning("Car %d waiting to move to higher level" % (vehicle.id))
-
-                for f_level, level_avail_lots in enumerate(
-                    self.available_parking_lots_per_level
-                ):
-                    if f_level == 0:
-                        continue
-                    if (
-                        level_avail_lots > 0
-                        and self.parking_lots_sets[0]
-                        and self.shuttles_stores[0].items
-                        and self.lifts_store.items
-                        and self.shuttles_stores[f_level].items
-                    ):
-                        # ----------GROUND FLOOR----------
-                        # Interrupt in case the vehicle wants to exit during shuffling?
-                        ground_layout = self.layout[1]
-                        # Get the closest lift and floor shuttle
-
-                        self.logger.info(
-                            "[Cache] Car %d is reserving shuttle" % (vehicle.id)
-                        )
-                        self.check_shuttle_usage(f_level)
-                        f_shuttle = yield self.shuttles_stores[f_level].get()
-                        # num = yield self.env.process(
-                        #     self.get_shortest_to_lot_avail_lift(vehicle.parking_lot)
-                        # )
-                        shuttle = yield self.shuttles_stores[
-                            vehicle.parking_lot[0]
-                        ].get()
-                        # lift = yield self.lifts_store.get(lambda lift: lift.num == num)
-                        lift = yield self.lifts_store.get()
-                        self.logger.info(
-                            "[Cache] Car %d reserving Lift %d and levels %d, %d shuttle at %.2f"
-                            % (vehicle.id, lift.num, 1, f_level + 1, self.env.now)
-                        )
-
-                        # Need to find a parking spot in higher level and reserve it
-                        f_parking_lot_num = self.get_shortest_avail_travel_lot(
-                            lift, f_level
-                        )
-
-                        self.available_parking_lots_per_level[f_level] -= 1
-                        self.parking_lots_sets[f_level].add(f_parking_lot_num)
-
-                        # Move Lift to ground level
-                        yield self.env.process(
-                            self.move_lift_ground_level(lift, fromWhere="Cache")
-                        )
-                        state = 1
-
-                        shuttle_sprite = findShuttle(ground_layout, shuttle)
-                        parking_coord = findCoord(ground_layout, vehicle.parking_lot[1])
-
-                        # Shuttle from somewhere moves to parking_lot
-                        (
-                            shuttle_time_taken,
-                            destination,
-                        ) = shuttle.time_taken_to_destination(vehicle.parking_lot[1])
-                        self.logger.info(
-                            "[Cache] Car %d is at level %d using the shuttle"
-                            % (vehicle.id, 1)
-                        )
-                        # Animate shuttle from current to next position
-                        moveShuttle(shuttle_sprite, shuttle_time_taken, parking_coord)
-                        yield self.env.timeout(shuttle_time_taken)
-                        shuttle.set_pos(destination)
-                        state = 2
-
-                        lift_coord = findCoord(ground_layout, lift)
-                        lift_coord_center = (lift_coord[0] + GRID_WIDTH, lift_coord[1])
-
-                        time_taken_to_lift = lift.travel_times.get(
-                            vehicle.parking_lot[1]
-                        )
-
-                        movePalletToLot(
-                            vehicle,
-                            time_taken_to_lift["pallet_lot"],
-                            shuttle_sprite.pos,
-                        )
-                        yield self.env.timeout(time_taken_to_lift["pallet_lot"])
-                        state = 3
-
-                        moveOriginToLot(
-                            vehicle,
-                            shuttle_sprite,
-                            time_taken_to_lift["pallet_lot"],
-                            lift_coord_center,
-                        )
-                        yield self.env.timeout(time_taken_to_lift["pallet_lot"])
-                        state = 4
-
-                        moveLiftToPallet(
-                            vehicle,
-                            time_taken_to_lift["lift_pallet"],
-                            lift_coord_center,
-                        )
-                        yield self.env.timeout(time_taken_to_lift["lift_pallet"])
-
-                        self.logger.info(
-                            "[Cache] Car %d entered in lift bay and took lift %d at %.2f"
-                            % (vehicle.id, lift.num, self.env.now)
-                        )
-                        state = 5
-
-                        self.env.process(
-                            self.moving_shuttle_back_to_default(
-                                shuttle, shuttle_sprite, 0
-                            )
-                        )
-
-                        # ----------GROUND FLOOR END----------
-
-                        # Going up the lift to be parked
-                        lift_time_taken_to_higher_level = (
-                            lift.time_taken_from_origin_to_dest(dest=f_level)
-                        )
-                        lift_p = self.env.process(
-                            moveLift(
-                                self.env,
-                                self.layout,
-                                lift,
-                                f_level,
-                                lift_time_taken_to_higher_level,
-                                vehicle=vehicle,
-                                logger=self.logger,
-                                fromWhere="Cache",
-                            )
-                        )
-                        yield lift_p
-
-                        self.logger.info(
-                            "[Cache] Car %d took lift %d and at level %d at %.2f"
-                            % (
-                                vehicle.id,
-                                lift.num,
-                                f_level + 1,
-                                self.env.now,
-                            )
-                        )
-                        state = 6
-                        # ----------HIGHER FLOOR----------
-                        f_layout = self.layout[f_level + 1]
-
-                        # Shuttle from somewhere moves to lift position
-                        (
-                            shuttle_time_taken,
-                            destination,
-                        ) = f_shuttle.time_taken_to_destination(lift.num, lift=True)
-                        # Animate shuttle from current to next position
-                        f_shuttle_sprite = findShuttle(f_layout, f_shuttle)
-                        moveShuttle(
-                            f_shuttle_sprite, shuttle_time_taken, lift_coord, lift=True
-                        )
-                        yield self.env.timeout(shuttle_time_taken)
-                        f_shuttle.set_pos(destination)
-                        state = 7
-
-                        # Travelling time from front of the lift to parking lot
-                        time_taken_to_parking = lift.travel_times.get(f_parking_lot_num)
-
-                        moveLiftToPallet(
-                            vehicle,
-                            time_taken_to_parking["lift_pallet"],
-                            f_shuttle_sprite.pos,
-                        )
-                        yield self.env.timeout(time_taken_to_parking["lift_pallet"])
-                        state = 8
-
-                        # Put lift back into store - send lift back to ground level
-                        lift_movement = self.env.process(
-                            self.move_lift_ground_level(lift, fromWhere="Cache")
-                        )
-
-                        parking_coord = findCoord(f_layout, f_parking_lot_num)
-                        moveOriginToLot(
-                            vehicle,
-                            f_shuttle_sprite,
-                            time_taken_to_parking["origin_lot"],
-                            parking_coord,
-                        )
-                        yield self.env.timeout(time_taken_to_parking["origin_lot"])
-                        state = 9
-
-                        movePalletToLot(
-                            vehicle, time_taken_to_parking["pallet_lot"], parking_coord
-                        )
-                        yield self.env.timeout(time_taken_to_parking["pallet_lot"])
-
-                        # vehicle.popup.set_text("parked time", round(self.env.now, 2))
-                        self.logger.info(
-                            "[Cache] Car %d parked at level %d parking lot %d at %.2f"
-                            % (vehicle.id, f_level + 1, f_parking_lot_num, self.env.now)
-                        )
-                        self.env.process(
-                            self.moving_shuttle_back_to_default(
-                                f_shuttle, f_shuttle_sprite, f_level
-                            )
-                        )
-
-                        # ----------HIGHER FLOOR END----------
-
-                        # Release parking spot from ground level
-                        self.available_parking_lots_per_level[0] += 1
-                        self.parking_lots_sets[0].remove(vehicle.parking_lot[1])
-
-                        vehicle.parking_lot = (f_level, f_parking_lot_num)
-
-                        # Put lift back into store
-                        yield lift_movement
-                        if self.policy == "Cache" and isinstance(lift, Lobby):
-                            # Put lobby back into store
-                            self.lobby_store.put(lift)
-                            self.logger.warning(
-                                "[Cache] Lobby %d back into store" % (lift.num)
-                            )
-                        else:
-                            yield self.lifts_store.put(lift)
-                            self.logger.warning(
-                                "[Cache] Lift %d back into store" % (lift.num)
-                            )
-                        return
-
-                yield self.env.timeout(3 / 60)
-        except simpy.Interrupt:
-            self.logger.info(
-                "[Cache] Car %d is not going to be shifted, stopped at state %d"
-                % (vehicle.id, state)
+            # ----------GROUND FLOOR----------
+            # Interrupt in case the vehicle wants to exit during shuffling?
+            ground_layout = self.layout[1]
+            # Get the closest lift and floor shuttle
+
+            self.recorder.record(events.CACHE_RESERVING_SHUTTLE, vehicle.id)
+            self.check_shuttle_usage(f_level)
+            # Take both shuttles and the lift in the same instant, so the
+            # driver's call can never catch the car holding only some of them
+            ground_shuttles_store = self.shuttles_stores[vehicle.parking_lot[0]]
+            requests = [
+                (self.shuttles_stores[f_level], self.get_shuttle(f_level, track)),
+                (
+                    ground_shuttles_store,
+                    self.get_shuttle(vehicle.parking_lot[0], track),
+                ),
+                (self.lifts_store, self.dispatcher.request(0, vehicle.parking_lot[1])),
+            ]
+            yield self.env.all_of([request for _, request in requests])
+            f_shuttle, shuttle, lift = [request.value for _, request in requests]
+            yield from self.stop_lift(lift)
+            self.recorder.record(
+                events.CACHE_RESERVED,
+                "Cache",
+                vehicle.id,
+                lift.num,
+                1,
+                f_level + 1,
+            )
+
+            # Need to find a parking spot in higher level and reserve it
+            f_parking_lot_num = self.get_shortest_avail_travel_lot(lift, f_level)
+            self.reserve_lot(f_level, f_parking_lot_num)
+
+            state = 1
+            # Move Lift to ground level
+            lift_ground = self.env.process(
+                self.move_lift_ground_level(lift, fromWhere="Cache")
+            )
+            yield lift_ground
+
+            shuttle_sprite = self.animator.findShuttle(ground_layout, shuttle)
+            parking_coord = self.animator.findCoord(
+                ground_layout, vehicle.parking_lot[1]
+            )
+
+            # Shuttle from somewhere moves to parking_lot
+            (
+                shuttle_time_taken,
+                destination,
+            ) = shuttle.time_taken_to_destination(vehicle.parking_lot[1])
+            self.recorder.record(events.CACHE_USING_SHUTTLE, "Cache", vehicle.id, 1)
+            # Animate shuttle from current to next position
+            self.animator.moveShuttle(shuttle_sprite, shuttle_time_taken, parking_coord)
+            yield self.env.timeout(shuttle_time_taken)
+            shuttle.set_pos(destination)
+            state = 2
+
+            lift_coord = self.animator.findCoord(ground_layout, lift)
+            lift_coord_center = (lift_coord[0] + GRID_WIDTH, lift_coord[1])
+
+            time_taken_to_lift = lift.lot_times(vehicle.parking_lot[1])
+
+            self.animator.movePalletToLot(
+                vehicle,
+                time_taken_to_lift.pallet_lot,
+                shuttle_sprite.pos,
+            )
+            yield self.env.timeout(time_taken_to_lift.pallet_lot)
+            state = 3
+
+            self.animator.moveOriginToLot(
+                vehicle,
+                shuttle_sprite,
+                time_taken_to_lift.pallet_lot,
+                lift_coord_center,
+            )
+            yield self.env.timeout(time_taken_to_lift.pallet_lot)
+            state = 4
+
+            self.animator.moveLiftToPallet(
+                vehicle,
+                time_taken_to_lift.lift_pallet,
+                lift_coord_center,
+            )
+            yield self.env.timeout(time_taken_to_lift.lift_pallet)
+
+            self.recorder.record(events.CACHE_ENTERED_LIFT, vehicle.id, lift.num)
+            state = 5
+
+            self.env.process(
+                self.moving_shuttle_back_to_default(shuttle, shuttle_sprite, 0)
+            )
+
+            # ----------GROUND FLOOR END----------
+
+            # Going up the lift to be parked
+            lift_time_taken_to_higher_level = lift.time_taken_from_origin_to_dest(
+                dest=f_level
+            )
+            lift_p = self.env.process(
+                self.animator.moveLift(
+                    self.env,
+                    self.layout,
+                    lift,
+                    f_level,
+                    lift_time_taken_to_higher_level,
+                    vehicle=vehicle,
+                    recorder=self.recorder,
+                    fromWhere="Cache",
+                )
+            )
+            yield lift_p
+
+            self.recorder.record(
+                events.CACHE_AT_LEVEL,
+                "Cache",
+                vehicle.id,
+                lift.num,
+                f_level + 1,
+            )
+            state = 6
+            # ----------HIGHER FLOOR----------
+            f_layout = self.layout[f_level + 1]
+
+            # Shuttle from somewhere moves to lift position
+            (
+                shuttle_time_taken,
+                destination,
+            ) = f_shuttle.time_taken_to_destination(lift, lift=True)
+            # Animate shuttle from current to next position
+            f_shuttle_sprite = self.animator.findShuttle(f_layout, f_shuttle)
+            self.animator.moveShuttle(
+                f_shuttle_sprite, shuttle_time_taken, lift_coord, lift=True
+            )
+            yield self.env.timeout(shuttle_time_taken)
+            f_shuttle.set_pos(destination)
+            state = 7
+
+            # Travelling time from front of the lift to parking lot
+            time_taken_to_parking = lift.lot_times(f_parking_lot_num)
+
+            self.animator.moveLiftToPallet(
+                vehicle,
+                time_taken_to_parking.lift_pallet,
+                f_shuttle_sprite.pos,
+            )
+            yield self.env.timeout(time_taken_to_parking.lift_pallet)
+            state = 8
+
+            # Put lift back into store - send lift back to ground level
+            lift_movement = self.env.process(
+                self.move_lift_ground_level(lift, fromWhere="Cache")
+            )
+
+            parking_coord = self.animator.findCoord(f_layout, f_parking_lot_num)
+            self.animator.moveOriginToLot(
+                vehicle,
+                f_shuttle_sprite,
+                time_taken_to_parking.origin_lot,
+                parking_coord,
             )
+            yield self.env.timeout(time_taken_to_parking.origin_lot)
+            state = 9
 
-        parking_coord = findCoord(self.layout[f_level + 1], f_parking_lot_num)
+            self.animator.movePalletToLot(
+                vehicle, time_taken_to_parking.pallet_lot, parking_coord
+            )
+            yield self.env.timeout(time_taken_to_parking.pallet_lot)
+
+            # vehicle.popup.set_text("parked time", round(self.env.now, 2))
+            self.recorder.record(
+                events.CACHE_PARKED,
+                vehicle.id,
+                f_level + 1,
+                f_parking_lot_num,
+            )
+            self.env.process(
+                self.moving_shuttle_back_to_default(
+                    f_shuttle, f_shuttle_sprite, f_level
+                )
+            )
+
+            # ----------HIGHER FLOOR END----------
+
+            # Release parking spot from ground level
+            self.available_parking_lots_per_level[0] += 1
+            self.release_lot(0, vehicle.parking_lot[1])
+
+            vehicle.parking_lot = (f_level, f_parking_lot_num)
+
+            # Put lift back into store
+            yield lift_movement
+            if isinstance(lift, Lobby):
+                # Put lobby back into store
+                self.lobby_store.put(lift)
+                self.recorder.record(events.LOBBY_RETURNED, "Cache", lift.num)
+            else:
+                yield self.lifts_store.put(lift)
+                self.recorder.record(events.LIFT_RETURNED, "Cache", lift.num)
+            return
+        except simpy.Interrupt:
+            self.recorder.record(events.CACHE_STOPPED, vehicle.id, state)
+
+        parking_coord = self.animator.findCoord(
+            self.layout[f_level + 1], f_parking_lot_num
+        )
+
+        if state == 0:
+            # Hand back whatever was already taken, and stop waiting for the rest
+            for store, request in requests:
+                if not request.triggered:
+                    request.cancel()
+                elif store is self.lifts_store:
+                    self.put_back_lift(request.value)
+                else:
+                    store.put(request.value)
+            shuttle, lift = None, None
+            self.available_parking_lots_per_level[f_level] += 1
+
+        if lift_ground is not None and lift_ground.is_alive:
+            # Let the lift finish coming down before the car is taken out with it
+            yield lift_ground
 
         if state >= 1 and state <= 7:
             self.available_parking_lots_per_level[f_level] += 1
-            self.parking_lots_sets[f_level].remove(f_parking_lot_num)
+            self.release_lot(f_level, f_parking_lot_num)
             self.shuttles_stores[f_level].put(f_shuttle)
 
         if state == 5:
@@ -839,9 +975,13 @@ class Carpark:
 
         elif state == 6:
             if f_shuttle == None:
-                f_shuttle = yield self.shuttles_stores[f_level].get()
-            f_shuttle_sprite = findShuttle(self.layout[f_level + 1], f_shuttle)
-            moveShuttle(f_shuttle_sprite, shuttle_time_taken, lift_coord, lift=True)
+                f_shuttle = yield self.get_shuttle(f_level, track)
+            f_shuttle_sprite = self.animator.findShuttle(
+                self.layout[f_level + 1], f_shuttle
+            )
+            self.animator.moveShuttle(
+                f_shuttle_sprite, shuttle_time_taken, lift_coord, lift=True
+            )
             yield self.env.timeout(shuttle_time_taken)
             f_shuttle.set_pos(destination)
             yield self.env.process(
@@ -851,59 +991,58 @@ class Carpark:
             )
 
         elif state == 7:
-            moveLiftToPallet(
+            self.animator.moveLiftToPallet(
                 vehicle,
-                time_taken_to_parking["lift_pallet"],
+                time_taken_to_parking.lift_pallet,
                 f_shuttle_sprite.pos,
             )
-            yield self.env.timeout(time_taken_to_parking["lift_pallet"])
+            yield self.env.timeout(time_taken_to_parking.lift_pallet)
 
             lift_time_taken_to_higher_level = lift.time_taken_from_origin_to_dest(
                 dest=f_level
             )
             yield self.env.process(
-                moveLift(
+                self.animator.moveLift(
                     self.env,
                     self.layout,
                     lift,
                     f_level,
                     lift_time_taken_to_higher_level,
-                    logger=self.logger,
+                    recorder=self.recorder,
                     fromWhere="Cache-7",
                 )
             )
 
-            lift_coord = findCoord(self.layout[f_level + 1], lift)
+            lift_coord = self.animator.findCoord(self.layout[f_level + 1], lift)
             lift_coord_center = (lift_coord[0] + GRID_WIDTH, lift_coord[1])
 
-            moveLiftToPallet(
-                vehicle, time_taken_to_lift["lift_pallet"], lift_coord_center
+            self.animator.moveLiftToPallet(
+                vehicle, time_taken_to_lift.lift_pallet, lift_coord_center
             )
-            yield self.env.timeout(time_taken_to_lift["lift_pallet"])
+            yield self.env.timeout(time_taken_to_lift.lift_pallet)
 
-            self.logger.info(
-                "[Exiting] Car %d entered in lift bay and took lift %d at %.2f"
-                % (vehicle.id, lift.num, self.env.now)
-            )
+            self.recorder.record(events.EXIT_ENTERED_LIFT, vehicle.id, lift.num)
 
         elif state == 8:
-            moveOriginToLot(
+            self.animator.moveOriginToLot(
                 vehicle,
                 f_shuttle_sprite,
-                time_taken_to_parking["origin_lot"],
+                time_taken_to_parking.origin_lot,
                 parking_coord,
             )
-            yield self.env.timeout(time_taken_to_parking["origin_lot"])
+            yield self.env.timeout(time_taken_to_parking.origin_lot)
 
         elif state == 9:
-            movePalletToLot(vehicle, time_taken_to_parking["pallet_lot"], parking_coord)
-            yield self.env.timeout(time_taken_to_parking["pallet_lot"])
+            self.animator.movePalletToLot(
+                vehicle, time_taken_to_parking.pallet_lot, parking_coord
+            )
+            yield self.env.timeout(time_taken_to_parking.pallet_lot)
 
         if state >= 8:
             self.available_parking_lots_per_level[0] += 1
-            self.parking_lots_sets[0].remove(vehicle.parking_lot[1])
+            self.release_lot(0, vehicle.parking_lot[1])
 
-            self.parking_lots_sets[f_level].add(f_parking_lot_num)
+            self.reserve_lot(f_level, f_parking_lot_num)
             vehicle.parking_lot = (f_level, f_parking_lot_num)
 
             shuttle = f_shuttle  # so the correct level shuttle is selected
@@ -916,41 +1055,57 @@ class Carpark:
         g_level, g_parking_lot_num, g_shuttle, g_shuttle_sprite = 0, None, None, None
         time_taken_to_parking = None
 
+        # The car stays on the track of its lift
+        track = self.geometry.lot_track(vehicle.parking_lot[1])
+        deadline = Deadline(self.env, time_remain_end)
+        turn = take_turn()
         while (
             self.available_parking_lots_per_level[0] <= 0
-            or len(self.shuttles_stores[g_level].items) <= 0
+            or not any(
+                shuttle.track == track
+                for shuttle in self.shuttles_stores[g_level].items
+            )
+            or self.unclaimed_lots(g_level, track) <= 0
             or len(self.parking_queue) > 0
         ):
-            if self.env.now >= time_remain_end:
-                print("Cancel moving to ground level")
+            if deadline.passed():
+                self.recorder.record(events.CACHE_MOVE_CANCELLED, vehicle.id)
                 return
-            self.logger.info(f"Parking Q: {len(self.parking_queue)}")
-            yield self.env.timeout(1 / 60)
+            self.recorder.record(events.PARKING_QUEUE, len(self.parking_queue))
+            yield any_change(
+                self.lots_changed[g_level],
+                self.shuttles_changed[g_level],
+                self.queue_changed,
+                deadline,
+                turn=turn,
+            )
+
+        # Hold on to the ground lot right away, the shuttles and lift may take a while
+        self.available_parking_lots_per_level[g_level] -= 1
+        self.track_claims[g_level][track] += 1
 
         # ----------HIGHER FLOOR----------
         # Interrupt in case the vehicle wants to exit during shuffling?
         higher_layout = self.layout[vehicle.parking_lot[0] + 1]
 
         # Get the closest lift and floor shuttle
-        self.logger.info("[Cache] Car %d is reserving shuttle" % (vehicle.id))
+        self.recorder.record(events.CACHE_RESERVING_SHUTTLE, vehicle.id)
         self.check_shuttle_usage(g_level)
-        g_shuttle = yield self.shuttles_stores[g_level].get()
-        # num = yield self.env.process(
-        #     self.get_shortest_to_lot_avail_lift(vehicle.parking_lot)
-        # )
-        shuttle = yield self.shuttles_stores[vehicle.parking_lot[0]].get()
-        # lift = yield self.lifts_store.get(lambda lift: lift.num == num)
-        lift = yield self.lifts_store.get()
-        self.logger.info(
-            "[Cache-MTG] Car %d reserving Lift %d and levels %d, %d shuttle at %.2f"
-            % (vehicle.id, lift.num, 1, g_level + 1, self.env.now)
+        g_shuttle = yield self.get_shuttle(g_level, track)
+        shuttle = yield self.get_shuttle(vehicle.parking_lot[0], track)
+        # Moving the car down is a retrieval too, a lift may pick it up on its
+        # way down from parking a car
+        lift = yield self.env.process(
+            self.request_lift(*vehicle.parking_lot, vehicle.id)
+        )
+        self.recorder.record(
+            events.CACHE_RESERVED, "Cache-MTG", vehicle.id, lift.num, 1, g_level + 1
         )
 
         # Need to find a parking spot in ground level and reserve it
         g_parking_lot_num = self.get_shortest_avail_travel_lot(lift, g_level)
-
-        self.available_parking_lots_per_level[g_level] -= 1
-        self.parking_lots_sets[g_level].add(g_parking_lot_num)
+        self.track_claims[g_level][track] -= 1
+        self.reserve_lot(g_level, g_parking_lot_num)
 
         # Move Lift to higher level
         # Lift travel time to reach that level
@@ -958,64 +1113,59 @@ class Carpark:
             dest=vehicle.parking_lot[0]
         )
         yield self.env.process(
-            moveLift(
+            self.animator.moveLift(
                 self.env,
                 self.layout,
                 lift,
                 vehicle.parking_lot[0],
                 lift_time_taken,
-                logger=self.logger,
+                recorder=self.recorder,
                 fromWhere="Cache-MTG",
             )
         )
 
-        shuttle_sprite = findShuttle(higher_layout, shuttle)
-        parking_coord = findCoord(higher_layout, vehicle.parking_lot[1])
+        shuttle_sprite = self.animator.findShuttle(higher_layout, shuttle)
+        parking_coord = self.animator.findCoord(higher_layout, vehicle.parking_lot[1])
 
         # Shuttle from somewhere moves to parking_lot
         (
             shuttle_time_taken,
             destination,
         ) = shuttle.time_taken_to_destination(vehicle.parking_lot[1])
-        self.logger.info(
-            "[Cache-MTG] Car %d is at level %d using the shuttle" % (vehicle.id, 1)
-        )
+        self.recorder.record(events.CACHE_USING_SHUTTLE, "Cache-MTG", vehicle.id, 1)
         # Animate shuttle from current to next position
-        moveShuttle(shuttle_sprite, shuttle_time_taken, parking_coord)
+        self.animator.moveShuttle(shuttle_sprite, shuttle_time_taken, parking_coord)
         yield self.env.timeout(shuttle_time_taken)
         shuttle.set_pos(destination)
 
-        lift_coord = findCoord(higher_layout, lift)
+        lift_coord = self.animator.findCoord(higher_layout, lift)
         lift_coord_center = (lift_coord[0] + GRID_WIDTH, lift_coord[1])
 
-        time_taken_to_lift = lift.travel_times.get(vehicle.parking_lot[1])
+        time_taken_to_lift = lift.lot_times(vehicle.parking_lot[1])
 
-        movePalletToLot(
+        self.animator.movePalletToLot(
             vehicle,
-            time_taken_to_lift["pallet_lot"],
+            time_taken_to_lift.pallet_lot,
             shuttle_sprite.pos,
         )
-        yield self.env.timeout(time_taken_to_lift["pallet_lot"])
+        yield self.env.timeout(time_taken_to_lift.pallet_lot)
 
-        moveOriginToLot(
+        self.animator.moveOriginToLot(
             vehicle,
             shuttle_sprite,
-            time_taken_to_lift["pallet_lot"],
+            time_taken_to_lift.pallet_lot,
             lift_coord_center,
         )
-        yield self.env.timeout(time_taken_to_lift["pallet_lot"])
+        yield self.env.timeout(time_taken_to_lift.pallet_lot)
 
-        moveLiftToPallet(
+        self.animator.moveLiftToPallet(
             vehicle,
-            time_taken_to_lift["lift_pallet"],
+            time_taken_to_lift.lift_pallet,
             lift_coord_center,
         )
-        yield self.env.timeout(time_taken_to_lift["lift_pallet"])
+        yield self.env.timeout(time_taken_to_lift.lift_pallet)
 
-        self.logger.info(
-            "[Cache] Car %d entered in lift bay and took lift %d at %.2f"
-            % (vehicle.id, lift.num, self.env.now)
-        )
+        self.recorder.record(events.CACHE_ENTERED_LIFT, vehicle.id, lift.num)
 
         self.env.process(
             self.moving_shuttle_back_to_default(
@@ -1030,14 +1180,8 @@ class Carpark:
             self.move_lift_ground_level(lift, vehicle, fromWhere="Cache-MTG")
         )
 
-        self.logger.info(
-            "[Cache-MTG] Car %d took lift %d and at level %d at %.2f"
-            % (
-                vehicle.id,
-                lift.num,
-                g_level + 1,
-                self.env.now,
-            )
+        self.recorder.record(
+            events.CACHE_AT_LEVEL, "Cache-MTG", vehicle.id, lift.num, g_level + 1
         )
         # ----------GROUND FLOOR----------
         g_layout = self.layout[g_level + 1]
@@ -1046,42 +1190,45 @@ class Carpark:
         (
             shuttle_time_taken,
             destination,
-        ) = g_shuttle.time_taken_to_destination(lift.num, lift=True)
+        ) = g_shuttle.time_taken_to_destination(lift, lift=True)
         # Animate shuttle from current to next position
-        g_shuttle_sprite = findShuttle(g_layout, g_shuttle)
-        moveShuttle(g_shuttle_sprite, shuttle_time_taken, lift_coord, lift=True)
+        g_shuttle_sprite = self.animator.findShuttle(g_layout, g_shuttle)
+        self.animator.moveShuttle(
+            g_shuttle_sprite, shuttle_time_taken, lift_coord, lift=True
+        )
         yield self.env.timeout(shuttle_time_taken)
         g_shuttle.set_pos(destination)
 
         # Travelling time from front of the lift to parking lot
-        time_taken_to_parking = lift.travel_times.get(g_parking_lot_num)
+        time_taken_to_parking = lift.lot_times(g_parking_lot_num)
 
-        moveLiftToPallet(
+        self.animator.moveLiftToPallet(
             vehicle,
-            time_taken_to_parking["lift_pallet"],
+            time_taken_to_parking.lift_pallet,
             g_shuttle_sprite.pos,
         )
-        yield self.env.timeout(time_taken_to_parking["lift_pallet"])
+        yield self.env.timeout(time_taken_to_parking.lift_pallet)
 
         # Put lift back into store
         yield self.lifts_store.put(lift)
 
-        parking_coord = findCoord(g_layout, g_parking_lot_num)
-        moveOriginToLot(
+        parking_coord = self.animator.findCoord(g_layout, g_parking_lot_num)
+        self.animator.moveOriginToLot(
             vehicle,
             g_shuttle_sprite,
-            time_taken_to_parking["origin_lot"],
+            time_taken_to_parking.origin_lot,
             parking_coord,
         )
-        yield self.env.timeout(time_taken_to_parking["origin_lot"])
+        yield self.env.timeout(time_taken_to_parking.origin_lot)
 
-        movePalletToLot(vehicle, time_taken_to_parking["pallet_lot"], parking_coord)
-        yield self.env.timeout(time_taken_to_parking["pallet_lot"])
+        self.animator.movePalletToLot(
+            vehicle, time_taken_to_parking.pallet_lot, parking_coord
+        )
+        yield self.env.timeout(time_taken_to_parking.pallet_lot)
 
         # vehicle.popup.set_text("parked time", round(self.env.now, 2))
-        self.logger.info(
-            "[Cache] Car %d parked at level %d parking lot %d at %.2f"
-            % (vehicle.id, g_level + 1, g_parking_lot_num, self.env.now)
+        self.recorder.record(
+            events.CACHE_PARKED, vehicle.id, g_level + 1, g_parking_lot_num
         )
         self.env.process(
             self.moving_shuttle_back_to_default(g_shuttle, g_shuttle_sprite, g_level)
@@ -1091,20 +1238,19 @@ class Carpark:
 
         # Release parking spot from higher level
         self.available_parking_lots_per_level[vehicle.parking_lot[0]] += 1
-        self.parking_lots_sets[vehicle.parking_lot[0]].remove(vehicle.parking_lot[1])
+        self.release_lot(vehicle.parking_lot[0], vehicle.parking_lot[1])
 
         vehicle.parking_lot = (g_level, g_parking_lot_num)
 
     def moving_shuttle_back_to_default(self, shuttle, shuttle_sprite, level):
         # Move shuttle back to default position
         time_taken, destination = shuttle.move_to_default_pos()
-        moveShuttle(shuttle_sprite, time_taken, shuttle_sprite.default_pos)
+        self.animator.moveShuttle(
+            shuttle_sprite, time_taken, shuttle_sprite.default_pos
+        )
         yield self.env.timeout(time_taken)
         shuttle.set_pos(destination)
 
-        self.logger.info(
-            "Level %d's Shuttle back to default position at %.2f"
-            % (level + 1, self.env.now)
-        )
+        self.recorder.record(events.SHUTTLE_HOME, level + 1)
         # Put shuttle back into store
         self.shuttles_stores[level].put(shuttle)
@@ -0,0 +1,198 @@
+"""
+Picks which free lift serves which request waiting for one, instead of the
+first free lift in ``lifts_store`` for the request that asked first. The
+strategy is set by ``LIFT_DISPATCHER``:
+
+- ``first``   requests first come first, the first free lift, the original behaviour
+- ``nearest`` request whose pick up is the fewest levels away from a free lift
+- ``eta``     request and lift that get a car to or from its lot soonest
+- ``zoning``  lift whose stretch of the shuttle track the lot lies in
+- ``look``    request a lift reaches next going on in its direction, it turns
+              round once there is none ahead of it
+
+Each strategy costs every pair of a free lift and a request waiting for one of
+its track, the cheapest pairs are served first. So while more cars wait than
+lifts are free, the strategy decides the order they are served in too: at the
+ground level, where free lifts wait, ``nearest`` serves the cars being parked
+first, ``look`` sweeps up and down the levels from where each lift's last trip
+ended. With ``FREE_RETURNING_LIFTS`` a lift is free as soon as it has dropped a
+car off, and on its way down until it is handed out.
+"""
+
+import numpy as np
+from constants import *
+from classes.travel_times import TOTAL
+
+
+class Dispatcher:
+    """
+    Hands out lifts first come first, the first free one. Other strategies
+    override ``cost``, a request is described by where the car is going to or
+    coming from:
+
+    :param level: level of the car's lot
+    :param lot: the car's lot, None for a car still to be parked
+    :param pickup: level the lift has to reach first, ``level`` by default
+    """
+
+    def __init__(self, carpark):
+        self.carpark = carpark
+        self.travel_times = carpark.travel_times
+        # track -> (what the pairs were made from, {call: lift})
+        self.pairs = {}
+
+    def cost(self, lift, level, lot, pickup):
+        return 0
+
+    def inputs(self, lifts, levels):
+        """What ``cost`` reads besides the calls, the pairs are kept while it stays the same"""
+        # A free lift on its way down changes its level without leaving the store
+        return tuple(
+            (lift.pos, lift.descending(), lift.direction, tuple(lift.stops))
+            for lift in lifts
+        )
+
+    def pair(self, lifts, calls):
+        """
+        {call: lift} of the cheapest pairs of ``lifts`` and ``calls``, the
+        first call and then the first lift among equals
+        """
+        costs = sorted(
+            (self.cost(lift, call.level, call.lot, call.pickup), i, j)
+            for i, call in enumerate(calls)
+            for j, lift in enumerate(lifts)
+        )
+        pairs, taken = {}, set()
+        for _, i, j in costs:
+            if calls[i] not in pairs and j not in taken:
+                pairs[calls[i]] = lifts[j]
+                taken.add(j)
+        return pairs
+
+    def paired(self, track):
+        """{call: lift} for the calls waiting on a lift of ``track``"""
+        store = self.carpark.lifts_store
+        queue = tuple(store.get_queue)
+        lifts = [lift for lift in store.items if lift.track == track]
+        calls = [request.filter for request in queue if request.filter.track == track]
+        levels = sorted({call.level for call in calls})
+        key = (store.version, queue, self.inputs(lifts, levels))
+        if self.pairs.get(track, (None,))[0] != key:
+            self.pairs[track] = (key, self.pair(lifts, calls))
+        return self.pairs[track][1]
+
+    def request(self, level, lot=None, pickup=None, track=None):
+        """
+        ``lifts_store`` get event for the lift the request is paired with, once
+        one of ``track`` is free, the lot's track by default. The event keeps
+        its ``track``, the lift handed out the stops of its trip
+        """
+        store = self.carpark.lifts_store
+        if track is None:
+            track = self.carpark.geometry.lot_track(lot)
+        call = LiftCall(self, level, lot, level if pickup is None else pickup, track)
+        request = store.get(call)
+        request.track = track
+        request.callbacks.append(lambda event: event.value.call_at(*call.stops()))
+        return request
+
+    def approach_time(self, lift, pickup):
+        return self.travel_times.lift_time(lift.pos, pickup)
+
+
+class LiftCall:
+    """
+    Filter of a ``lifts_store`` get, takes the free lift the dispatcher pairs
+    the call with. Made before the store first tries it, so it can be paired
+    right away
+    """
+
+    def __init__(self, dispatcher, level, lot, pickup, track):
+        self.dispatcher = dispatcher
+        self.level = level
+        self.lot = lot
+        self.pickup = pickup
+        self.track = track
+
+    def __call__(self, lift):
+        if lift.track != self.track:
+            return False
+        return self.dispatcher.paired(self.track).get(self) is lift
+
+    def stops(self):
+        # A car being parked is taken up to its level, any other down to the ground
+        return self.pickup, (self.level if self.pickup != self.level else 0)
+
+
+class Nearest(Dispatcher):
+    def cost(self, lift, level, lot, pickup):
+        return abs(lift.pos - pickup)
+
+
+class EstimatedArrival(Dispatcher):
+    def inputs(self, lifts, levels):
+        versions = self.carpark.free_lots.versions
+        return super().inputs(lifts, levels), tuple(versions[l] for l in levels)
+
+    def cost(self, lift, level, lot, pickup):
+        if lot is None:
+            # Lot the car would be parked at with this lift
+            lot = self.carpark.free_lots.nearest(level, lift)
+            if lot is None:
+                return self.approach_time(lift, pickup)
+        return self.approach_time(lift, pickup) + lift.lot_times(lot).total
+
+
+class Zoning(Dispatcher):
+    def __init__(self, carpark):
+        super().__init__(carpark)
+        # Each lot belongs to the lift closest to it along the shuttle track
+        lifts = self.travel_times.lobby_source
+        times = np.where(
+            self.travel_times.reachable[:lifts],
+            self.travel_times.lots[:lifts, :, TOTAL],
+            np.inf,
+        )
+        self.zone_of = np.argmin(times, axis=0).tolist()
+        self.zones = [np.asarray(self.zone_of) == source for source in range(lifts)]
+
+    def inputs(self, lifts, levels):
+        versions = self.carpark.free_lots.versions
+        return super().inputs(lifts, levels), tuple(versions[l] for l in levels)
+
+    def cost(self, lift, level, lot, pickup):
+        if lot is None:
+            # Lift with the most free lots in its zone on that level
+            free = self.carpark.free_lots.free_mask[level]
+            in_zone = -int(np.count_nonzero(free & self.zones[lift.source]))
+        else:
+            in_zone = 0 if self.zone_of[lot] == lift.source else 1
+        return in_zone, abs(lift.pos - pickup)
+
+
+class Look(Dispatcher):
+    def cost(self, lift, level, lot, pickup):
+        # A lift sent back down empty goes on from its last stop, one on its
+        # way down while free from where it is
+        if lift.descending():
+            at, direction = lift.pos, -1
+        else:
+            at, direction = lift.last_stop(), lift.direction
+        behind = (pickup - at) * direction < 0
+        return int(behind), abs(pickup - at)
+
+
+DISPATCHERS = {
+    "first": Dispatcher,
+    "nearest": Nearest,
+    "eta": EstimatedArrival,
+    "zoning": Zoning,
+    "look": Look,
+}
+
+
+def get_dispatcher(carpark, name=None):
+    name = LIFT_DISPATCHER if name is None else name
+    if name not in DISPATCHERS:
+        raise KeyError(f"Unknown lift dispatcher {name}, one of {list(DISPATCHERS)}")
+    return DISPATCHERS[name](carpark)
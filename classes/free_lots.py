@@ -0,0 +1,144 @@
+"""
+Free parking lots of every level, kept ordered by travel time from each lift
+(and the lobby) so the nearest free lot is found without scanning the level.
+"""
+
+import heapq
+import random
+import numpy as np
+
+
+class FreeLotIndex:
+    """
+    :param levels_lots: per level, the lot numbers that exist on that level
+    :param sources: lifts/lobbies, each with its ``source`` row in ``travel_times``
+    :param travel_times: ``TravelTimes`` of the carpark
+    """
+
+    def __init__(self, levels_lots, sources, travel_times):
+        self.travel_times = travel_times
+        geometry = travel_times.geometry
+        self.free = []
+        # Free lots of each track of each level
+        self.track_free = []
+        # Number of lots on each level, free or not
+        self.sizes = []
+        # Same free lots as a (level, lot) mask, for vectorized queries
+        self.free_mask = np.zeros(
+            (len(levels_lots), travel_times.reachable.shape[1]), dtype=bool
+        )
+        # Free lots of each track in a list as well, so a random one is picked in O(1)
+        self.free_list = []
+        self.free_pos = []
+        # level -> source -> heap of (travel time, lot), stale entries removed lazily
+        self.heaps = []
+        self.heap_members = []
+        # Bumped on every take or release of a lot of the level
+        self.versions = [0] * len(levels_lots)
+
+        for level, lots in enumerate(levels_lots):
+            lots = list(lots)
+            self.free.append(set(lots))
+            self.sizes.append(len(lots))
+            self.free_mask[level, lots] = True
+            tracks = [[] for _ in geometry.tracks]
+            for lot in lots:
+                tracks[geometry.lot_track(lot)].append(lot)
+            self.track_free.append([set(track) for track in tracks])
+            self.free_list.append(tracks)
+            self.free_pos.append(
+                {lot: idx for track in tracks for idx, lot in enumerate(track)}
+            )
+
+            heaps, members = {}, {}
+            for source in sources:
+                heap = [
+                    (self.total(source, lot), lot)
+                    for lot in lots
+                    if self.total(source, lot) is not None
+                ]
+                heapq.heapify(heap)
+                heaps[source] = heap
+                members[source] = {lot for _, lot in heap}
+            self.heaps.append(heaps)
+            self.heap_members.append(members)
+
+    def total(self, source, lot):
+        lot_times = self.travel_times.lot_times(source.source, lot)
+        return lot_times.total if lot_times is not None else None
+
+    def free_count(self, level, track=None):
+        if track is not None:
+            return len(self.track_free[level][track])
+        return len(self.free[level])
+
+    def taken_count(self, level):
+        return self.sizes[level] - len(self.free[level])
+
+    def is_free(self, level, lot):
+        return lot in self.free[level]
+
+    def nearest(self, level, source):
+        """Free lot with the shortest travel time from ``source``, or None"""
+        heap = self.heaps[level][source]
+        members = self.heap_members[level][source]
+        free = self.free[level]
+        while heap and heap[0][1] not in free:
+            _, lot = heapq.heappop(heap)
+            members.discard(lot)
+
+        return heap[0][1] if heap else None
+
+    def best(self, level, sources):
+        """
+        (source, lot) with the shortest travel time over all ``sources``,
+        or None when the level is full
+        """
+        rows = [source.source for source in sources]
+        best = self.travel_times.best_lot(self.free_mask[level], rows)
+        if best is None:
+            return None
+        row, lot = best
+        return sources[rows.index(row)], lot
+
+    def random(self, level, track):
+        """Any free lot of ``track``, or None"""
+        free_list = self.free_list[level][track]
+        return random.choice(free_list) if free_list else None
+
+    def take(self, level, lot):
+        if lot not in self.free[level]:
+            return
+        self.free[level].remove(lot)
+        self.versions[level] += 1
+        self.free_mask[level, lot] = False
+        track = self.travel_times.geometry.lot_track(lot)
+        self.track_free[level][track].remove(lot)
+
+        # Swap with the last lot so the removal stays O(1)
+        free_list, free_pos = self.free_list[level][track], self.free_pos[level]
+        idx = free_pos.pop(lot)
+        last = free_list.pop()
+        if last != lot:
+            free_list[idx] = last
+            free_pos[last] = idx
+
+    def release(self, level, lot):
+        if lot in self.free[level]:
+            return
+        self.free[level].add(lot)
+        self.versions[level] += 1
+        self.free_mask[level, lot] = True
+        track = self.travel_times.geometry.lot_track(lot)
+        self.track_free[level][track].add(lot)
+        self.free_pos[level][lot] = len(self.free_list[level][track])
+        self.free_list[level][track].append(lot)
+
+        for source, heap in self.heaps[level].items():
+            members = self.heap_members[level][source]
+            # Still in the heap if it was taken after the last cleanup
+            total = self.total(source, lot)
+            if lot in members or total is None:
+                continue
+            heapq.heappush(heap, (total, lot))
+            members.add(lot)
@@ -0,0 +1,261 @@
+"""
+Shape of the carpark: levels, where each lot, lift and lobby sits along the
+shuttle track, and the shuttles of each level. Loaded from a layout file in
+layouts/, picked by ``LAYOUT``:
+
+    levels = 5
+    lifts = [9, 12, 15, 18]          # track positions
+    lift_sides = ["south"] * 4       # side of each lift's bay, south by default
+    lobby = [6]                      # cache lobby, used by the Cache policy
+    lobby_lots = [31, 32, 33]        # lots the lobby takes up on the ground level
+    shuttle_home = 13
+
+    [[rows]]                         # lots first .. first + count - 1, side by
+    side = "north"                   # side from track position ``track``
+    first = 1
+    count = 26
+    track = 1
+
+    [[tracks]]                       # positions first .. last, one shuttle
+    first = 1                        # waiting at shuttle_home. One track of
+    last = 26                        # every position by default
+    shuttle_home = 13
+
+Positions and lots are counted from 1, every level has the same lots. The
+tracks of a level are laid end to end, each with the one shuttle, the lifts
+and the lots along it, so shuttles never meet. A lobby needs a single track.
+"""
+
+import math
+from os.path import join, exists
+from constants import *
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    import tomli as tomllib
+
+LAYOUTS_DIR = "layouts"
+SIDES = ("north", "south")
+# Generated layouts: lots per lift up to GENERATED_LEVELS levels. Lift trips
+# get longer with the levels, taller layouts get more lifts with the levels to
+# the power of LIFT_GROWTH, lifts in proportion to the levels fall behind at 50
+# levels. Tracks are added to keep each about TRACK_LENGTH positions long, as
+# a shuttle's trips get longer with its track. With arrivals scaled to the
+# lots every size keeps up with its cars, see benchmarks/scaling.py
+LOTS_PER_LIFT = 5
+GENERATED_LEVELS = 5
+LIFT_GROWTH = 1.3
+TRACK_LENGTH = 28
+
+
+class Geometry:
+    """
+    :param levels: number of levels, level 0 is the ground level
+    :param rows: ``[{"side": ..., "first": ..., "count": ..., "track": ...}]``
+    :param lifts: track position of each lift, lift ``n`` is ``lifts[n - 1]``
+    :param lobby: track position of each cache lobby
+    :param lobby_lots: lots the lobby takes up on the cache level
+    :param shuttle_home: track position the shuttle waits at, without ``tracks``
+    :param tracks: ``[{"first": ..., "last": ..., "shuttle_home": ...}]``
+    :param lift_sides: side of the track each lift's bay is on
+    """
+
+    def __init__(
+        self,
+        levels,
+        rows,
+        lifts,
+        lobby=(),
+        lobby_lots=(),
+        shuttle_home=1,
+        tracks=None,
+        lift_sides=None,
+        name=None,
+    ):
+        self.name = name
+        self.levels = levels
+        self.rows = [dict(row) for row in rows]
+        self.lifts = list(lifts)
+        self.lift_sides = (
+            list(lift_sides) if lift_sides is not None else ["south"] * len(self.lifts)
+        )
+        self.lobby = list(lobby)
+        self.lobby_lots = list(lobby_lots)
+        if len(self.lift_sides) != len(self.lifts) or any(
+            side not in SIDES for side in self.lift_sides
+        ):
+            raise ValueError(f"One lift side per lift, each one of {SIDES}")
+
+        self.track_pos = {}
+        self.side = {}
+        for row in self.rows:
+            if row["side"] not in SIDES:
+                raise ValueError(f"Row side {row['side']!r}, one of {SIDES}")
+            for i in range(row["count"]):
+                lot = row["first"] + i
+                if lot in self.track_pos:
+                    raise ValueError(f"Lot {lot} is in more than one row")
+                self.track_pos[lot] = row["track"] + i
+                self.side[lot] = row["side"]
+
+        self.lots = sorted(self.track_pos)
+        self.max_lot = self.lots[-1]
+        if any(lot not in self.track_pos for lot in self.lobby_lots):
+            raise ValueError("Lobby lots have to be lots of a row")
+        # Furthest position a shuttle travels to, lift bays are 3 lots wide
+        self.track_length = max(
+            [*self.track_pos.values(), *[pos + 1 for pos in self.lifts + self.lobby]]
+        )
+
+        if tracks is None:
+            tracks = [
+                {"first": 1, "last": self.track_length, "shuttle_home": shuttle_home}
+            ]
+        self.tracks = [dict(track) for track in tracks]
+        # One shuttle per track
+        self.shuttles_per_level = len(self.tracks)
+        self.shuttle_homes = [track["shuttle_home"] for track in self.tracks]
+        # Track of each position, None between tracks
+        self.pos_track = [None] * (
+            max(self.track_length, *[track["last"] for track in self.tracks]) + 1
+        )
+        for idx, track in enumerate(self.tracks):
+            if not track["first"] <= track["shuttle_home"] <= track["last"]:
+                raise ValueError(f"Shuttle home of track {idx + 1} is off the track")
+            for pos in range(track["first"], track["last"] + 1):
+                if self.pos_track[pos] is not None:
+                    raise ValueError(f"Position {pos} is on more than one track")
+                self.pos_track[pos] = idx
+        if any(
+            self.pos_track[pos] is None
+            for pos in [*self.track_pos.values(), *self.lifts, *self.lobby]
+        ):
+            raise ValueError("Every lot, lift and lobby has to be on a track")
+        if self.lobby and len(self.tracks) > 1:
+            raise ValueError("A lobby needs a layout of a single track")
+
+    @classmethod
+    def load(cls, name=None):
+        """Layout ``name`` from layouts/, or the layout file at path ``name``"""
+        name = LAYOUT if name is None else name
+        path = name if exists(name) else join(LAYOUTS_DIR, f"{name}.toml")
+        with open(path, "rb") as file:
+            layout = tomllib.load(file)
+        return cls(name=name, **layout)
+
+    @classmethod
+    def generate(cls, levels, lots_per_level, lifts=None, tracks=None):
+        """
+        Layout of any size: ``tracks`` tracks laid end to end, sharing the lots
+        and lifts evenly. A track has lots on either side, and its lifts side
+        by side in bays along the middle, taking turns between the south and
+        north side. There is no lobby. Lifts are added with the lots and levels
+        and tracks with the positions they take, see ``LOTS_PER_LIFT``,
+        ``LIFT_GROWTH`` and ``TRACK_LENGTH``, unless given
+        """
+        if lifts is None:
+            growth = max(1, levels / GENERATED_LEVELS) ** LIFT_GROWTH
+            lifts = max(1, round(lots_per_level * growth / LOTS_PER_LIFT))
+        if tracks is None:
+            # Each bay takes 3 positions from one side
+            tracks = max(1, round((lots_per_level + 3 * lifts) / 2 / TRACK_LENGTH))
+        track_lots = [
+            lots_per_level // tracks + (idx < lots_per_level % tracks)
+            for idx in range(tracks)
+        ]
+        track_lifts = [
+            lifts // tracks + (idx < lifts % tracks) for idx in range(tracks)
+        ]
+
+        rows, lifts_pos, lift_sides, layout_tracks = [], [], [], []
+        first_pos, lot = 1, 1
+        for lots, count in zip(track_lots, track_lifts):
+            length = math.ceil((lots + 3 * count) / 2)
+            home = first_pos + length // 2
+            # Bays of either side, centred on the shuttle home
+            bays = set()
+            for side, side_count in (
+                ("south", (count + 1) // 2),
+                ("north", count // 2),
+            ):
+                start = max(first_pos + 1, home - 3 * (side_count - 1) // 2)
+                for idx in range(side_count):
+                    lifts_pos.append(start + 3 * idx)
+                    lift_sides.append(side)
+                    bays.update(
+                        {(side, start + 3 * idx + offset) for offset in (-1, 0, 1)}
+                    )
+
+            left = lots
+            for side in SIDES:
+                for pos in range(first_pos, first_pos + length):
+                    if left == 0 or (side, pos) in bays:
+                        continue
+                    last = rows[-1] if rows else None
+                    if (
+                        last
+                        and last["side"] == side
+                        and last["track"] + last["count"] == pos
+                    ):
+                        last["count"] += 1
+                    else:
+                        rows.append(
+                            {"side": side, "first": lot, "count": 1, "track": pos}
+                        )
+                    lot += 1
+                    left -= 1
+
+            layout_tracks.append(
+                {
+                    "first": first_pos,
+                    "last": first_pos + length - 1,
+                    "shuttle_home": home,
+                }
+            )
+            first_pos += length
+
+        return cls(
+            levels,
+            rows,
+            lifts_pos,
+            tracks=layout_tracks,
+            lift_sides=lift_sides,
+            name=f"{levels}x{lots_per_level}",
+        )
+
+    def to_dict(self):
+        """Fields of the layout file, what the geometry is made from"""
+        return {
+            "levels": self.levels,
+            "rows": self.rows,
+            "lifts": self.lifts,
+            "lobby": self.lobby,
+            "lobby_lots": self.lobby_lots,
+            "tracks": self.tracks,
+            "lift_sides": self.lift_sides,
+        }
+
+    def lot_track_pos(self, lot):
+        """Position along the shuttle track in front of the lot"""
+        return self.track_pos[lot]
+
+    def track_of(self, pos):
+        """Track of a position, the index of its shuttle on every level"""
+        return self.pos_track[pos]
+
+    def lot_track(self, lot):
+        return self.pos_track[self.track_pos[lot]]
+
+    def level_lots(self, cache=False):
+        """Lots of a level, the cache level loses those the lobby takes up"""
+        if cache:
+            return [lot for lot in self.lots if lot not in self.lobby_lots]
+        return list(self.lots)
+
+    def lots_per_level(self, cache=False):
+        """Number of lots on each level, from the ground level up"""
+        return [len(self.level_lots(cache))] + [len(self.lots)] * (self.levels - 1)
+
+    def total_lots(self, cache=False):
+        return sum(self.lots_per_level(cache))
@@ -2,19 +2,42 @@
 This is to get all the distances stored into each Lift classes,
 as well as the availability of parking spaces for each lot
 """
-from constants import *
-import simpy
 
 
 class Lift:
-    def __init__(self, env, num, travel_times, default_level, lobby_times):
+    def __init__(self, env, num, travel_times, default_level):
         self.env = env
         self.num = num
+        # TravelTimes of the whole carpark, this lift is source num - 1
         self.travel_times = travel_times
+        self.source = num - 1
+        self.track_pos = travel_times.sources_pos[self.source]
+        # Track of the shuttles and lots the lift serves on every level
+        self.track = travel_times.geometry.track_of(self.track_pos)
         self.pos = default_level
-        self.travel_times_lobby = lobby_times
+        # Levels the lift calls at on its current or last trip, and whether it
+        # goes up (1) or down (-1) between the last two
+        self.stops = []
+        self.direction = 1
+        # Process bringing the lift back down while it is free, see Carpark.return_lift
+        self.returning = None
 
-    def time_taken_from_origin_to_dest(self, dest):
-        time_taken = (abs(self.pos - dest)) * (HEIGHT_PER_LEVEL / LIFT_SPEED)
+    def call_at(self, *stops):
+        """Sets the stops of the trip the lift is handed out for"""
+        self.stops = list(stops)
+        for origin, dest in zip((self.pos,) + stops, stops):
+            if dest != origin:
+                self.direction = 1 if dest > origin else -1
+
+    def last_stop(self):
+        return self.stops[-1] if self.stops else self.pos
+
+    def lot_times(self, lot):
+        return self.travel_times.lot_times(self.source, lot)
 
-        return time_taken
+    def descending(self):
+        """Whether the lift is free and on its way back down to the ground level"""
+        return self.returning is not None and self.returning.is_alive
+
+    def time_taken_from_origin_to_dest(self, dest):
+        return self.travel_times.lift_time(self.pos, dest)
@@ -1,15 +1,16 @@
-from constants import *
-import simpy
-
-
 class Lobby:
     def __init__(self, env, num, travel_times):
         self.env = env
         self.num = num
+        # TravelTimes of the whole carpark, the lobby comes after the lifts
         self.travel_times = travel_times
+        self.source = travel_times.lobby_source + num - 1
+        self.track_pos = travel_times.sources_pos[self.source]
+        self.track = travel_times.geometry.track_of(self.track_pos)
         self.pos = 0
 
-    def time_taken_from_origin_to_dest(self, dest):
-        time_taken = (abs(self.pos - dest)) * (HEIGHT_PER_LEVEL / LIFT_SPEED)
+    def lot_times(self, lot):
+        return self.travel_times.lot_times(self.source, lot)
 
-        return time_taken
+    def time_taken_from_origin_to_dest(self, dest):
+        return self.travel_times.lift_time(self.pos, dest)
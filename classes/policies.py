@@ -0,0 +1,207 @@
+"""
+Placement policies, deciding where each car is parked and what happens to it
+between being parked and its driver coming back.
+
+A policy is registered under the name it is run by (``main.py <name>`` or
+the sweep runner) and gets these hooks, called by ``Carpark`` and
+``simulation.utils.run``:
+
+- ``choose_level()`` level a car just arrived is parked on
+- ``choose_lot(lift, level)`` lot on that level, once the car is there
+- ``parked(vehicle, parking_lot_request, call_time)`` car parked, for idle
+  time rebalancing until its driver calls
+- ``called(vehicle)`` driver calls, a move still underway to interrupt
+- ``prefetchable(vehicle)`` car may be moved down ahead of its driver's call,
+  see ``PREFETCH``
+- ``prestage(vehicle, time_remain_end)`` bring the car closer to the exit
+  before its driver arrives
+"""
+
+import random
+from constants import *
+from classes.prefetcher import Prefetcher
+from classes.rebalancer import CacheRebalancer
+from classes.state_change import any_change, take_turn
+from simulation import events
+
+PLACEMENT_POLICIES = {}
+
+
+def register(name):
+    def decorator(cls):
+        cls.name = name
+        PLACEMENT_POLICIES[name] = cls
+        return cls
+
+    return decorator
+
+
+def get_policy(name):
+    if name not in PLACEMENT_POLICIES:
+        raise KeyError(f"Unknown policy {name}, one of {list(PLACEMENT_POLICIES)}")
+    return PLACEMENT_POLICIES[name]
+
+
+class PlacementPolicy:
+    """
+    Levels and lots are read from ``carpark.available_parking_lots_per_level``
+    and ``carpark.free_lots`` (a ``FreeLotIndex``).
+
+    :param carpark: ``Carpark`` the policy places cars in
+    """
+
+    name = None
+    # Ground level is a cache served by the lobby, with fewer lots
+    cache_level = False
+
+    def __init__(self, carpark):
+        self.carpark = carpark
+        self.env = carpark.env
+        # Moves cars down ahead of their driver's call, see PREFETCH
+        self.prefetcher = Prefetcher(carpark) if PREFETCH else None
+        # car id -> move down still underway when its driver called
+        self.prefetching = {}
+
+    def choose_level(self):
+        """
+        Process returning the level, with one of its lots already counted as
+        taken in ``available_parking_lots_per_level``
+        """
+        raise NotImplementedError
+
+    def choose_lot(self, lift, level):
+        return self.carpark.free_lots.nearest(level, lift)
+
+    def wait_for_any_level(self):
+        lots = self.carpark.available_parking_lots_per_level
+        # A car moving down to the ground level holds a lot on both levels
+        turn = take_turn()
+        while max(lots) <= 0:
+            yield any_change(*self.carpark.lots_changed, turn=turn)
+
+    def parked(self, vehicle, parking_lot_request, call_time):
+        if self.prefetcher is not None:
+            self.prefetcher.add(vehicle, call_time)
+
+    def called(self, vehicle):
+        if self.prefetcher is not None:
+            move = self.prefetcher.remove(vehicle)
+            if move is not None:
+                # Left to finish, prestage waits for it
+                self.prefetching[vehicle.id] = move
+        return None
+
+    def prefetchable(self, vehicle):
+        return True
+
+    def prestage(self, vehicle, time_remain_end):
+        move = self.prefetching.pop(vehicle.id, None)
+        if move is not None:
+            yield move
+        # Cars above are moved down to the ground level while the driver walks over
+        if vehicle.parking_lot[0] > 0:
+            self.carpark.recorder.record(events.RETRIEVAL_CALLED, vehicle.id)
+            yield self.env.process(
+                self.carpark.move_to_ground_level(vehicle, time_remain_end)
+            )
+
+
+@register("Nearest-First")
+class NearestFirst(PlacementPolicy):
+    """Lowest level with a free lot and shuttle, nearest lot to the lift"""
+
+    def choose_level(self):
+        # Not a process of its own, the car takes the level's free shuttle in
+        # the same step, before another car can find it free too
+        level = yield from self.carpark.get_shuttle_level_availability()
+        return level
+
+
+@register("Randomised")
+class Randomised(PlacementPolicy):
+    """Random level with a free lot, random lot on it"""
+
+    def choose_level(self):
+        yield from self.wait_for_any_level()
+
+        lots = self.carpark.available_parking_lots_per_level
+        top = self.carpark.geometry.levels - 1
+        level = random.randint(0, top)
+        while lots[level] <= 0:
+            level = random.randint(0, top)
+        lots[level] -= 1
+        return level
+
+    def choose_lot(self, lift, level):
+        return self.carpark.free_lots.random(level, lift.track)
+
+
+@register("Balanced")
+class Balanced(PlacementPolicy):
+    """Level with the fewest cars, lowest level first"""
+
+    def choose_level(self):
+        yield from self.wait_for_any_level()
+
+        lots = self.carpark.available_parking_lots_per_level
+        free_lots = self.carpark.free_lots
+        min_length = float("inf")
+        level = 0
+        for idx in range(self.carpark.geometry.levels):
+            taken = free_lots.taken_count(idx)
+            if lots[idx] > 0 and taken < min_length:
+                level = idx
+                min_length = taken
+
+        lots[level] -= 1
+        return level
+
+
+@register("Cache")
+class Cache(PlacementPolicy):
+    """
+    Cars are dropped off on the ground level through the lobby, and moved up
+    to the higher levels while the lifts and shuttles are idle
+    """
+
+    cache_level = True
+
+    def __init__(self, carpark):
+        super().__init__(carpark)
+        # Moves cars off the cache level, one process for the whole carpark
+        self.rebalancer = CacheRebalancer(carpark)
+
+    def choose_level(self):
+        carpark = self.carpark
+        carpark.recorder.record(
+            events.CACHE_LEVEL_LOTS, carpark.available_parking_lots_per_level[0]
+        )
+
+        # Ground level first, otherwise the subsequent floor with a lot and a shuttle
+        level = carpark.get_cache_level()
+        turn = take_turn()
+        while level is None:
+            yield any_change(
+                *carpark.lots_changed, *carpark.shuttles_changed, turn=turn
+            )
+            level = carpark.get_cache_level()
+
+        carpark.available_parking_lots_per_level[level] -= 1
+        return level
+
+    def parked(self, vehicle, parking_lot_request, call_time):
+        # Cars moved up off the ground level may be prefetched back down
+        super().parked(vehicle, parking_lot_request, call_time)
+        if vehicle.parking_lot[0] == 0:
+            self.rebalancer.add(vehicle, parking_lot_request, call_time)
+
+    def called(self, vehicle):
+        super().called(vehicle)
+        return self.rebalancer.remove(vehicle)
+
+    def prefetchable(self, vehicle):
+        # Not while it waits to be moved up, or is being moved
+        move = self.rebalancer.moves.get(vehicle.id)
+        return vehicle.id not in self.rebalancer.waiting and not (
+            move is not None and move.is_alive
+        )
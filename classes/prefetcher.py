@@ -0,0 +1,137 @@
+"""
+Moves cars down to the ground level ahead of their driver's call, for every
+policy, while the lifts and shuttles would otherwise stand idle.
+
+One process keeps every parked car in a queue by the time its driver calls,
+known from the sampled duration of its stay, and issues the move of a car
+``PREFETCH_LEAD`` mins before the call, once it can be made without holding
+up a car being parked.
+"""
+
+import heapq
+import itertools
+from constants import *
+from classes.state_change import Deadline, StateChange, any_change, take_turn
+from simulation import events
+
+
+class Prefetcher:
+    """
+    Cars calling first go first. A move is only issued while no car waits to
+    be parked or for a lift, another lift of the car's track stays free, and
+    the ground level keeps ``reserve`` lots of the track for cars being parked.
+    The driver's call takes over a move that has not started by then.
+
+    :param carpark: ``Carpark`` the cars are moved in
+    :param lead: mins before the driver's call a move is issued,
+        ``PREFETCH_LEAD`` by default
+    :param reserve: ground lots of a track left for cars being parked,
+        ``PREFETCH_GROUND_RESERVE`` by default
+    """
+
+    def __init__(self, carpark, lead=None, reserve=None):
+        self.carpark = carpark
+        self.env = carpark.env
+        # The PREFETCH_* constants by default, read now so overrides apply
+        self.lead = PREFETCH_LEAD if lead is None else lead
+        self.reserve = PREFETCH_GROUND_RESERVE if reserve is None else reserve
+        # (driver's call time, order added, car id), cars taken off are dropped lazily
+        self.queue = []
+        self._order = itertools.count()
+        # car id -> (vehicle, driver's call time)
+        self.waiting = {}
+        # car id -> move process issued for it
+        self.moves = {}
+        # Wakes up the process once a car is queued
+        self.queued = StateChange(self.env)
+        self.process = self.env.process(self.run())
+
+    def add(self, vehicle, call_time):
+        """Queues a car just parked"""
+        heapq.heappush(self.queue, (call_time, next(self._order), vehicle.id))
+        self.waiting[vehicle.id] = (vehicle, call_time)
+        self.queued.notify()
+
+    def remove(self, vehicle):
+        """
+        Takes the car off the queue once its driver calls, returns its move
+        process if the car is being moved down right now
+        """
+        self.waiting.pop(vehicle.id, None)
+        move = self.moves.pop(vehicle.id, None)
+        if move is not None and move.is_alive:
+            return move
+
+    def due(self):
+        """Cars whose driver calls within ``lead`` mins, first call first"""
+        while self.queue and self.queue[0][2] not in self.waiting:
+            heapq.heappop(self.queue)
+        horizon = self.env.now + self.lead
+        return [
+            self.waiting[car_id][0]
+            for call_time, _, car_id in sorted(self.queue)
+            if call_time <= horizon and car_id in self.waiting
+        ]
+
+    def clear(self, vehicle):
+        """Whether moving the car down now keeps out of the way of every park"""
+        carpark = self.carpark
+        level, lot = vehicle.parking_lot
+        if level == 0 or not carpark.placement.prefetchable(vehicle):
+            return False
+        if carpark.parking_queue or carpark.lifts_store.get_queue:
+            return False
+
+        track = carpark.geometry.lot_track(lot)
+        free_lifts = [lift for lift in carpark.lifts_store.items if lift.track == track]
+        free_tracks = [
+            {shuttle.track for shuttle in carpark.shuttles_stores[l].items}
+            for l in (0, level)
+        ]
+        return (
+            len(free_lifts) > 1
+            and all(track in tracks for tracks in free_tracks)
+            and carpark.unclaimed_lots(0, track) > self.reserve
+            and carpark.available_parking_lots_per_level[0] > self.reserve
+        )
+
+    def run(self):
+        carpark = self.carpark
+        turn = take_turn()
+        while True:
+            if not self.waiting:
+                yield self.queued.wait(turn)
+                continue
+
+            vehicles = self.due()
+            vehicle = next((v for v in vehicles if self.clear(v)), None)
+            if vehicle is None:
+                changes = [
+                    self.queued,
+                    carpark.lifts_changed,
+                    carpark.queue_changed,
+                    *carpark.shuttles_changed,
+                    *carpark.lots_changed,
+                ]
+                horizon = self.env.now + self.lead
+                later = [
+                    call_time
+                    for call_time, _, car_id in self.queue
+                    if call_time > horizon and car_id in self.waiting
+                ]
+                if later:
+                    # Until the next car comes due
+                    changes.append(Deadline(self.env, min(later) - self.lead))
+                yield any_change(*changes, turn=turn)
+                continue
+
+            _, call_time = self.waiting.pop(vehicle.id)
+            carpark.recorder.record(
+                events.PREFETCH_ISSUED, vehicle.id, vehicle.parking_lot[0] + 1
+            )
+            # Given up at the driver's call, the car is then moved down as usual
+            self.moves[vehicle.id] = self.env.process(
+                carpark.move_to_ground_level(vehicle, call_time)
+            )
+            # Let the move take its shuttles and lift before looking again
+            yield self.env.timeout(0)
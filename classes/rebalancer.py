@@ -0,0 +1,118 @@
+"""
+Moves cars parked on the cache (ground) level up to the higher levels while
+the lifts and shuttles have nothing else to do, for the Cache policy.
+
+One process keeps every car waiting on the ground level in a priority queue
+and issues their moves one at a time, whenever a ground shuttle, a lift and a
+higher level shuttle are free together.
+"""
+
+import heapq
+import itertools
+from constants import *
+from classes.state_change import StateChange, any_change
+from simulation import events
+
+
+class CacheRebalancer:
+    """
+    Cars leaving last go up first, a car whose lot is further from the lifts
+    is held back by ``cost_weight`` mins per min of extra move time.
+
+    :param carpark: ``Carpark`` of the Cache policy
+    :param cost_weight: mins of departure time one min of move time is worth,
+        ``CACHE_MOVE_COST_WEIGHT`` by default
+    :param min_stay: cars whose driver calls within this many mins are not moved,
+        ``CACHE_MIN_STAY`` by default
+    """
+
+    def __init__(self, carpark, cost_weight=None, min_stay=None):
+        self.carpark = carpark
+        self.env = carpark.env
+        # The CACHE_* constants by default, read now so overrides apply
+        self.cost_weight = (
+            CACHE_MOVE_COST_WEIGHT if cost_weight is None else cost_weight
+        )
+        self.min_stay = CACHE_MIN_STAY if min_stay is None else min_stay
+        # (priority, order added, car id), cars taken off are dropped lazily
+        self.queue = []
+        self._order = itertools.count()
+        # car id -> (vehicle, parking lot request, driver's call time)
+        self.waiting = {}
+        # car id -> move process issued for it
+        self.moves = {}
+        # Wakes up the process once a car is queued
+        self.queued = StateChange(self.env)
+        self.process = self.env.process(self.run())
+
+    def move_cost(self, lot):
+        # Lift to the ground lot and back, the same for every higher level
+        travel_times = self.carpark.travel_times
+        return min(
+            travel_times.lot_times(source, lot).total
+            for source in range(travel_times.lobby_source)
+        )
+
+    def add(self, vehicle, parking_lot_request, call_time):
+        """Queues a car just parked on the ground level"""
+        priority = -call_time + self.cost_weight * self.move_cost(
+            vehicle.parking_lot[1]
+        )
+        heapq.heappush(self.queue, (priority, next(self._order), vehicle.id))
+        self.waiting[vehicle.id] = (vehicle, parking_lot_request, call_time)
+        self.queued.notify()
+
+    def remove(self, vehicle):
+        """
+        Takes the car off the queue once its driver calls, returns its move
+        process if the car is being moved up right now
+        """
+        self.waiting.pop(vehicle.id, None)
+        move = self.moves.pop(vehicle.id, None)
+        if move is not None and move.is_alive:
+            return move
+
+    def next_vehicle(self):
+        while self.queue:
+            _, _, car_id = heapq.heappop(self.queue)
+            if car_id not in self.waiting:
+                continue
+
+            vehicle, parking_lot_request, call_time = self.waiting.pop(car_id)
+            if call_time - self.env.now < self.min_stay:
+                # Stays on the ground level until its driver calls
+                continue
+            return vehicle, parking_lot_request
+
+    def run(self):
+        carpark = self.carpark
+        while True:
+            if not self.waiting:
+                yield self.queued.wait()
+                continue
+            level = carpark.get_cache_move_level()
+            if level is None:
+                yield any_change(
+                    carpark.lifts_changed,
+                    *carpark.shuttles_changed,
+                    *carpark.lots_changed,
+                )
+                continue
+
+            entry = self.next_vehicle()
+            if entry is None:
+                continue
+            vehicle, parking_lot_request = entry
+            # Counted now, before a car being parked can take the last lot
+            self.carpark.available_parking_lots_per_level[level] -= 1
+
+            self.carpark.recorder.record(
+                events.CACHE_MOVE_ISSUED, vehicle.id, len(self.waiting)
+            )
+            self.moves[vehicle.id] = self.env.process(
+                self.carpark.move_vehicle_on_idle_shuttle(
+                    vehicle, parking_lot_request, level
+                )
+            )
+            # Let the move take its shuttles and lift before looking again
+            yield self.env.timeout(0)
@@ -1,31 +1,29 @@
-import constants as c
-
-
 class Shuttle:
-    def __init__(self, env, shuttle_num):
+    def __init__(self, env, shuttle_num, travel_times):
         self.env = env
         self.num = shuttle_num
-        self.cur_pos = 13
+        self.travel_times = travel_times
+        self.geometry = travel_times.geometry
+        # Shuttle n of a level runs on track n - 1 only
+        self.track = shuttle_num - 1
+        self.home = self.geometry.shuttle_homes[self.track]
+        self.cur_pos = self.home
 
     def time_taken_to_destination(self, destination, lift=False):
         if lift:
-            destination = c.LIFTS[destination - 1]
+            # Lift or lobby the shuttle meets
+            destination = destination.track_pos
         else:
             # Using the north carpark slot as reference instead
-            if destination >= 27 and destination <= 33:
-                destination -= 26
-            elif destination >= 34 and destination <= 39:
-                destination -= 14
-
-        distance = c.WIDTH_PER_CAR * abs(self.cur_pos - destination)
-        time_taken = distance / c.SHUTTLE_SPEED
+            destination = self.geometry.lot_track_pos(destination)
 
-        # self.set_pos(destination)
+        time_taken = self.travel_times.shuttle_time(self.cur_pos, destination)
 
         return time_taken, destination  # min
 
     def move_to_default_pos(self):
-        return self.time_taken_to_destination(13)
+        destination = self.home
+        return self.travel_times.shuttle_time(self.cur_pos, destination), destination
 
     def set_pos(self, destination):
         self.cur_pos = destination
@@ -0,0 +1,215 @@
+"""
+Lets processes sleep until the carpark state they are waiting on changes,
+instead of polling it every simulated second.
+
+Each store, count or queue reports its changes to a ``StateChange`` of its own.
+A process that cannot proceed yields ``any_change(...)`` of the ones its
+condition reads and checks it again once it wakes up. Only the processes
+waiting on a change are woken by it.
+
+They are woken in the order they started waiting, kept across wakeups by the
+turn a process takes before its first ``any_change``. A process takes what it
+finds free in the step it wakes up in, or another one woken by the same change
+would find it free too. Polling hands a freed shuttle to whichever waiter polls
+first instead, so cars moving down for their drivers get theirs a little sooner
+than with polling when several wait. See benchmarks/event_count.py.
+"""
+
+import itertools
+import simpy
+from constants import *
+
+# Turns of the waiting processes, first come first
+_turns = itertools.count()
+
+
+def take_turn():
+    """Place in line of a process about to wait, for each of its ``any_change``"""
+    return next(_turns)
+
+
+class StateChange:
+    def __init__(self, env):
+        self.env = env
+        # Setting an interval brings back the old fixed-step polling, for comparisons
+        self.poll_interval = STATE_POLL_INTERVAL
+        # (turn, event) of the processes waiting on the next change
+        self._waiters = []
+
+    def wait(self, turn=None):
+        """Event that fires on the next change"""
+        return any_change(self, turn=turn)
+
+    def notify(self):
+        waiters, self._waiters = self._waiters, []
+        for _, event in sorted(waiters, key=lambda waiter: waiter[0]):
+            # Some were woken already by another change they waited on
+            if not event.triggered:
+                event.succeed()
+
+
+class Deadline(StateChange):
+    """
+    Changes once, at simulation time ``until``. Made by a process before it
+    starts waiting and passed to each ``any_change``, so it gives up at that
+    time with a single timeout
+    """
+
+    def __init__(self, env, until):
+        super().__init__(env)
+        self.until = until
+        self._passed = False
+        if self.poll_interval is None:
+            env.timeout(max(0, until - env.now)).callbacks.append(self._pass)
+
+    def _pass(self, _):
+        self._passed = True
+        self.notify()
+
+    def passed(self):
+        return self._passed or self.env.now >= self.until
+
+
+def any_change(*changes, turn=None):
+    """
+    Event that fires on the next change of any of ``changes``. Processes woken
+    by the same change go by ``turn``, see ``take_turn``, a new one by default
+    """
+    env = changes[0].env
+    poll_interval = changes[0].poll_interval
+    if poll_interval is not None:
+        deadlines = [change.until for change in changes if isinstance(change, Deadline)]
+        return env.timeout(min([poll_interval] + [t - env.now for t in deadlines]))
+
+    if turn is None:
+        turn = take_turn()
+    event = env.event()
+    for change in changes:
+        change._waiters.append((turn, event))
+    return event
+
+
+class ObservableStore(simpy.Store):
+    """
+    ``simpy.Store`` that calls ``on_change`` whenever its items change, and
+    ``on_wait`` whenever a get has to wait for one
+    """
+
+    def __init__(self, env, capacity=float("inf")):
+        super().__init__(env, capacity)
+        self.on_change = None
+        self.on_wait = None
+        # Counts the changes to the items, for filters to tell them apart
+        self.version = 0
+
+    def get(self, *args, **kwargs):
+        event = super().get(*args, **kwargs)
+        if self.on_wait is not None and not event.triggered:
+            self.on_wait()
+        return event
+
+    def _changed(self, before):
+        if len(self.items) != before:
+            self.version += 1
+            if self.on_change is not None:
+                self.on_change()
+
+    def _do_put(self, event):
+        before = len(self.items)
+        proceed = super()._do_put(event)
+        self._changed(before)
+        return proceed
+
+    def _do_get(self, event):
+        before = len(self.items)
+        proceed = super()._do_get(event)
+        self._changed(before)
+        return proceed
+
+
+class ObservableFilterStore(ObservableStore, simpy.FilterStore):
+    """``simpy.FilterStore`` that calls back as ``ObservableStore`` does"""
+
+
+class ObservableList(list):
+    """List that calls ``on_change`` after every in-place modification"""
+
+    def __init__(self, iterable=(), on_change=None):
+        super().__init__(iterable)
+        self.on_change = on_change
+
+    def _changed(self):
+        if self.on_change is not None:
+            self.on_change()
+
+    def __setitem__(self, index, value):
+        super().__setitem__(index, value)
+        self._changed()
+
+    def append(self, value):
+        super().append(value)
+        self._changed()
+
+    def insert(self, index, value):
+        super().insert(index, value)
+        self._changed()
+
+    def pop(self, index=-1):
+        value = super().pop(index)
+        self._changed()
+        return value
+
+    def remove(self, value):
+        super().remove(value)
+        self._changed()
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        self._changed()
+
+    def __iadd__(self, values):
+        super().__iadd__(values)
+        self._changed()
+        return self
+
+    def __imul__(self, times):
+        super().__imul__(times)
+        self._changed()
+        return self
+
+    def extend(self, values):
+        super().extend(values)
+        self._changed()
+
+    def clear(self):
+        super().clear()
+        self._changed()
+
+    def sort(self, *, key=None, reverse=False):
+        super().sort(key=key, reverse=reverse)
+        self._changed()
+
+    def reverse(self):
+        super().reverse()
+        self._changed()
+
+
+class ObservableCounts(list):
+    """Counts of which setting the one at ``index`` notifies ``changes[index]``"""
+
+    def __init__(self, counts, changes):
+        super().__init__(counts)
+        self.changes = changes
+
+    def _reshaped(self, *args, **kwargs):
+        # There is one count per level, a count can only be set
+        raise TypeError("Counts of the levels can only be set one at a time")
+
+    append = extend = insert = pop = remove = clear = sort = reverse = _reshaped
+    __delitem__ = __iadd__ = __imul__ = _reshaped
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            self._reshaped()
+        super().__setitem__(index, value)
+        self.changes[index].notify()
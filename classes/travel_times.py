@@ -0,0 +1,111 @@
+"""
+Every travel time of the carpark, worked out once per layout:
+
+- ``lots[source, lot, component]`` lift/lobby to parking lot, see ``COMPONENTS``
+- ``shuttle[from_pos, to_pos]`` shuttle between two positions along the track
+- ``lift[from_level, to_level]`` lift between two levels
+
+Sources are the lifts in order, followed by the lobby, placed as the carpark
+``Geometry`` has them. A source only reaches the lots of its own track.
+"""
+
+from collections import namedtuple
+import numpy as np
+from constants import *
+from classes.geometry import Geometry
+
+COMPONENTS = ("lift_pallet", "pallet_lot", "origin_lot", "turning", "total")
+LIFT_PALLET, PALLET_LOT, ORIGIN_LOT, TURNING, TOTAL = range(len(COMPONENTS))
+
+LotTimes = namedtuple("LotTimes", COMPONENTS)
+
+
+def lot_components(pos, lot_pos):
+    """Times taken from a lift/lobby at track position ``pos`` to a lot at ``lot_pos``"""
+    lift_pallet = round(WIDTH_PER_CAR / PALLET_SPEED, 2)
+    pallet_lot = round(WIDTH_PER_CAR / PALLET_SPEED, 2)
+    origin_lot = round((WIDTH_PER_CAR * (abs(pos - lot_pos))) / SHUTTLE_SPEED, 2)
+    turning = round(180 / (ROTARY * 360), 2)
+    total = round(lift_pallet + pallet_lot + origin_lot + turning, 2)
+
+    return lift_pallet, pallet_lot, origin_lot, turning, total
+
+
+class TravelTimes:
+    def __init__(self, geometry=None):
+        self.geometry = geometry if geometry is not None else Geometry.load()
+        lifts_pos, lobby_pos = self.geometry.lifts, self.geometry.lobby
+        sources = [(pos, False) for pos in lifts_pos] + [
+            (pos, True) for pos in lobby_pos
+        ]
+        num_of_lots = self.geometry.max_lot + 1  # Lots are numbered from 1
+
+        # NaN where the source cannot reach the lot
+        self.lots = np.full((len(sources), num_of_lots, len(COMPONENTS)), np.nan)
+        self.source_lots = []
+        for source, (pos, cache) in enumerate(sources):
+            # The cache lobby takes up some of the lots it serves
+            track = self.geometry.track_of(pos)
+            lots = [
+                lot
+                for lot in self.geometry.level_lots(cache)
+                if self.geometry.lot_track(lot) == track
+            ]
+            for lot in lots:
+                self.lots[source, lot] = lot_components(
+                    pos, self.geometry.lot_track_pos(lot)
+                )
+            self.source_lots.append(lots)
+        self.reachable = ~np.isnan(self.lots[:, :, TOTAL])
+        # Turning is not counted when comparing lifts for the same lot
+        self.lots_no_turning = self.lots[:, :, TOTAL] - self.lots[:, :, TURNING]
+
+        track = np.arange(self.geometry.track_length + 1)
+        self.shuttle = WIDTH_PER_CAR * np.abs(track[:, None] - track) / SHUTTLE_SPEED
+        levels = np.arange(self.geometry.levels)
+        self.lift = np.abs(levels[:, None] - levels) * (HEIGHT_PER_LEVEL / LIFT_SPEED)
+        # Track position of each source
+        self.sources_pos = [pos for pos, _ in sources]
+        self.lobby_source = len(lifts_pos)
+
+        # Plain Python copies for single lookups, which numpy is slow at
+        self._lot_times = [
+            [
+                LotTimes(*row) if reachable else None
+                for row, reachable in zip(source_lots, source_reachable)
+            ]
+            for source_lots, source_reachable in zip(
+                self.lots.tolist(), self.reachable.tolist()
+            )
+        ]
+        self._shuttle = self.shuttle.tolist()
+        self._lift = self.lift.tolist()
+
+    def lot_times(self, source, lot):
+        return self._lot_times[source][lot]
+
+    def shuttle_time(self, from_pos, to_pos):
+        return self._shuttle[from_pos][to_pos]
+
+    def lift_time(self, from_level, to_level):
+        return self._lift[from_level][to_level]
+
+    def best_source(self, lot, sources):
+        """Source among ``sources`` with the shortest trip to ``lot``, turning aside"""
+        times = self.lots_no_turning[sources, lot]
+        return sources[int(np.argmin(times))]
+
+    def best_lot(self, free_mask, sources):
+        """
+        Shortest (source, lot) trip among ``sources`` to any lot set in ``free_mask``,
+        or None when no free lot is reachable
+        """
+        totals = np.where(
+            free_mask & self.reachable[sources], self.lots[sources, :, TOTAL], np.inf
+        )
+        # Row-major argmin, so ties go to the earlier source then the lower lot
+        idx = int(np.argmin(totals))
+        source, lot = divmod(idx, totals.shape[1])
+        if totals[source, lot] == np.inf:
+            return None
+        return sources[source], lot
@@ -1,39 +1,38 @@
 import pygame
 from pygame.math import Vector2
 
-from animation.utils import load_sprite_sheets
+from animation.utils import get_sprite_sheets
 from constants import *
 
 DIRECTION_MAP = {"up": 0, "right": 90, "down": 180, "left": 270}
 
 
-def get_key_by_value(dict, value):
-    for key, val in dict.items():
-        if val == value:
-            return key
-
-
 class Vehicle(pygame.sprite.Sprite):
     def __init__(self, x, y, env, id, car_png, popup):
         super().__init__()
         self.car_png_name = car_png
-        self.velo = Vector2(0, 0)
-        self.SPRITES = load_sprite_sheets("Cars", True)
+        # Shared with every other car, fading uses self.alpha instead
+        self.SPRITES = get_sprite_sheets("Cars", True)
         self.direction = "up"
         self.pos = Vector2(x, y)
         self.sprite = self.SPRITES[self.car_png_name + "_" + self.direction][0]
         self.rect = self.sprite.get_rect(topleft=(x, y))
-        self.destination = Vector2(0, 0)
+        # Motion of self.pos, see animation.motion
+        self.motion = None
         self.orientation = 0
-        self.final_ori = 0
-        self.rotation_speed = 0
+        # Motion of self.orientation
+        self.turn = None
         self.alpha = 255
-        self.fade = False
+        # Simulated time the car started fading out at
+        self.fade_start = None
 
         self.env = env
         self.id = id
 
         self.parking_lot = [None, None]  # (level, lot)
+        # Set from the arrival schedule
+        self.drive_in_time = None
+        self.drive_out_time = None
 
         self.popup = popup
 
@@ -47,42 +46,45 @@ class Vehicle(pygame.sprite.Sprite):
 
     def __call__(self, win):
         self.update_sprite()
-        win.blit(self.sprite, (self.rect.x, self.rect.y))
-        self.move()
-        self.rotate()
-        self.fading()
-
-    def move(self):
-        # logger.info(f"{self.id}: Check => {self.pos}  {self.rect.topleft}  {self.destination}")
-        distance = self.destination - self.pos
-        if distance.length() < TOLERANCE and self.velo != 0:
-            self.velo = Vector2(0, 0)
-            self.pos = Vector2(self.destination)
-            self.rect.topleft = self.destination
-            return
-
-        self.pos += self.velo
+        sprite = self.sprite
+        if self.alpha < 255:
+            sprite = sprite.copy()
+            sprite.set_alpha(self.alpha)
+        win.blit(sprite, (self.rect.x, self.rect.y))
+
+    def step(self, now):
+        """Puts the car where it is at simulated time ``now``, without drawing it"""
+        self.move(now)
+        self.rotate(now)
+        self.fading(now)
+
+    def moving(self, now):
+        """Whether the car is still on its way, turning or fading out at ``now``"""
+        return (
+            (self.fade_start is not None and now < self.fade_start + FADE_TIME)
+            or (self.motion is not None and not self.motion.done(now))
+            or (self.turn is not None and not self.turn.done(now))
+        )
+
+    def move(self, now):
+        if self.motion is not None:
+            self.pos = self.motion.at(now)
+            if self.motion.done(now):
+                self.motion = None
         self.rect.topleft = (int(self.pos[0]), int(self.pos[1]))
 
-    def fading(self):
-        if self.fade:
-            self.alpha = max(0, self.alpha - 2.5)  # alpha should never be < 0.
-            self.sprite.fill(
-                (255, 255, 255, self.alpha), special_flags=pygame.BLEND_RGBA_MULT
-            )
+    def fading(self, now):
+        if self.fade_start is not None:
+            faded = (now - self.fade_start) / FADE_TIME
+            self.alpha = max(0, 255 * (1 - faded))  # alpha should never be < 0.
             if self.alpha <= 0:  # Kill the sprite when the alpha is <= 0.
                 self.kill()
 
-    def rotate(self):
-        if (
-            abs(self.final_ori - self.orientation) <= TOLERANCE
-            and self.rotation_speed != 0
-        ):
-            self.rotation_speed = 0
-            self.orientation = self.final_ori
-            self.direction = get_key_by_value(
-                DIRECTION_MAP, self.final_ori
-            )  # Make sure is facing correctly
+    def rotate(self, now):
+        if self.turn is not None:
+            self.orientation = self.turn.at(now)
+            if self.turn.done(now):
+                self.turn = None
 
         self.orientation %= 360
 
@@ -90,5 +92,3 @@ class Vehicle(pygame.sprite.Sprite):
             if abs(self.orientation - angle) < 90:
                 self.direction = direction
                 break
-
-        self.orientation += self.rotation_speed
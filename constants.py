@@ -3,12 +3,8 @@ WIDTH_PER_CAR = 2.4
 LENGTH_PER_CAR = 5.4
 HEIGHT_PER_CAR = 1.55
 HEIGHT_PER_LEVEL = 2.2 + 0.3  # Allowance of ceiling lights
-NUM_OF_LEVELS = 5
-TOTAL_NUM_OF_PARKING = 195
-NUM_OF_PARKING_PER_LEVEL = 39
-NUM_OF_PARKING_LOBBY = NUM_OF_PARKING_PER_LEVEL - 3
-NUM_OF_LIFTS = 4
-NUM_OF_SHUTTLE_PER_LEVEL = 1
+# Levels, lots, lifts and lobby, a file in layouts/ or a path, see classes/geometry.py
+LAYOUT = "default"
 # SHUTTLE_ACC no data
 SHUTTLE_SPEED = 90  # m/min
 PALLET_SPEED = 45  # m/min
@@ -32,15 +28,63 @@ DEFAULT_LIFT_STATE = 0  # index start from 0
 
 DATA_COLLECTION_INTERVAL = 5  # mins
 
-# coordinate
-LIFTS = [9, 12, 15, 18]
-LOBBY = [6]
-LOBBY_TAKEN_LOTS = [31, 32, 33]
+# None: processes wake up when a shuttle, lift or lot count changes
+# A number of mins brings back fixed-interval polling (e.g. 1 / 60)
+STATE_POLL_INTERVAL = None
+
+# Which free lift serves which request waiting for one: "first", "nearest",
+# "eta", "zoning" or "look", see classes/dispatcher.py. "first" by default, so
+# results stay comparable with the runs stored before the dispatcher, scenarios
+# opt in. Over all slices x 3 seeds "look" shortens the mean retrieval wait of
+# every policy by 0.01-0.05 min, see benchmarks/dispatch.py
+LIFT_DISPATCHER = "first"
+# A lift that has dropped a car off is free again at that level and goes down
+# one level at a time, so the dispatcher can hand it out on the way. Otherwise
+# it is only free once back at the ground level. Off by default: over all
+# slices x 3 seeds it shortens the Cache parking wait by 0.3 min with "first"
+# and moves the other mean waits by 0.1 min or less either way
+FREE_RETURNING_LIFTS = False
+
+# Dual command: a lift that has dropped a car off at a level takes a retrieval
+# from that level or one below on its way down, instead of going down empty.
+# Off by default: it saves lift trips, about 7% of the levels travelled with a
+# 2 min window, but the lifts are not what cars wait for. In the 6-14 peak at
+# most 3 of the 4 lifts are busy and under one request waits for a lift, while
+# the shuttles of each level are 70-98% busy. Over 5 seeds of 6-14 Hours, with
+# windows of 0 to 2 mins, only Cache waits less every time (4.67/1.20 mins
+# parking/retrieval off, 4.19/1.18 with 2 mins), the Nearest-First parking
+# wait grows (3.41 to 3.44-3.66) and Randomised and Balanced move within their
+# seed to seed spread, scenarios opt in
+DUAL_COMMAND = False
+# Mins such a lift waits at the level for a retrieval to pair with, only while
+# no other request waits for a lift
+DUAL_COMMAND_WINDOW = 0.0
+
+# Cache policy: ground level cars leaving last are moved up first, one min of
+# extra move time holds a car back as much as leaving this many mins sooner
+CACHE_MOVE_COST_WEIGHT = 1.0
+# Cars whose driver calls within this many mins stay on the ground level
+CACHE_MIN_STAY = 0.0
+
+# Prefetch: cars are moved down to the ground level PREFETCH_LEAD mins before
+# their driver calls, for every policy, only while no car waits to be parked
+# or for a lift, another lift of the track stays free and the ground level
+# keeps PREFETCH_GROUND_RESERVE lots of the track for parks. Off by default,
+# it does not shorten retrievals: the carpark is only idle enough when moving
+# the car down at the driver's call gets it there in time too, over 5 seeds of
+# 6-14 Hours it moves the mean retrieval wait by 0.07 min or less either way
+PREFETCH = False
+PREFETCH_LEAD = 10.0
+PREFETCH_GROUND_RESERVE = 2
+
+# Event trace, lowest level kept ("DEBUG", "INFO", "WARNING" or "OFF")
+EVENT_LOG_LEVEL = "INFO"
+# Per-category overrides, e.g. {"lift": "WARNING", "cache": "DEBUG"}
+EVENT_LOG_LEVELS = {}
 
 # animation
 WIDTH, HEIGHT = 1000, 900
 GRID_WIDTH, GRID_HEIGHT = 32, 48
-TOTAL_WIDTH = 26 * GRID_WIDTH + 4  # Border
 STATS_HEIGHT = 32 * 2
 LIFT_IN_OUT_PX = 50
 
@@ -51,6 +95,24 @@ FACTOR = 0.23  # ~ 256x fast forward
 # FACTOR = 3.75  # 16x fast forward
 # FACTOR = 7.5
 FPS = 60
-TOLERANCE = 60 // FACTOR * 1.3
+# Redraw and push only the parts of the window that change
+RENDER_DIRTY_RECTS = True
+# Draw the window from a process of its own, fed snapshots of the simulation,
+# so slow frames are dropped instead of slowing simulated time down
+RENDER_PROCESS = False
+# Snapshots in the ring shared with the render process
+SNAPSHOT_SLOTS = 4
+# Run through simulated time in which nothing moves without waiting on the
+# wall clock, see core.PyGameEnvironment
+IDLE_WARP = True
+# Record animated runs to logs/*.replay.npz, played back by animation.replay.
+# Off by default, as nothing cleans the recordings up, turned on by --record
+RECORD_REPLAY = False
+# Mins of simulated time between full keyframes of a recording
+REPLAY_KEYFRAME_INTERVAL = 1.0
+# Rendered labels kept around, see animation.fonts
+TEXT_CACHE_SIZE = 2048
+# Mins of simulated time a leaving car takes to fade out
+FADE_TIME = 7.4
 
 ACTUAL_START_TIME = 0.0
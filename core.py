@@ -1,4 +1,6 @@
+import time
 import pygame
+import simpy
 from simpy.rt import RealtimeEnvironment
 from classes.vehicle import Vehicle
 
@@ -8,6 +10,12 @@ class PyGameEnvironment(RealtimeEnvironment):
     Customized version of ``simpy.rt.RealtimeEnvironment`` that attempts to
     maintain a steady framerate.
 
+    While ``idle`` says nothing is moving, events are processed as soon as
+    they come instead of when the wall clock gets to them, and frames are only
+    drawn ``fps`` times a real second. Once something moves again the wall
+    clock is synced to the simulated time and the run slows back down. Up to
+    the ``start`` of :meth:`run` nothing is drawn and nothing waits.
+
     :param renderer: what we use to draw the simulation
     :type renderer: :class:`~simpygame.core.FrameRenderer`
     :param fps: intended frames per second
@@ -21,41 +29,134 @@ class PyGameEnvironment(RealtimeEnvironment):
         self._on_pygame_quit = self.event()
         self._renderer = renderer
         self._ticks_per_frame = 1.0 / (self.factor * fps)
+        self._frame_interval = 1.0 / fps
+        # Function telling whether nothing moves until the next event, never when None
+        self.idle = None
+        self.warping = False
+        self._frame_time = time.monotonic()
+        # Simulated time of the first frame, see run
+        self._start = 0
 
     def _render(self):
+        if self.now < self._start:
+            yield self.timeout(self._start - self.now)
         while True:
             if self._pygame_quit_requested():
                 self._on_pygame_quit.succeed()
 
-            self._renderer.render()
+            now = time.monotonic()
+            if not self.warping or now - self._frame_time >= self._frame_interval:
+                self._frame_time = now
+                self._renderer.render(self.now)
 
             yield self.timeout(self._ticks_per_frame)
 
     def _pygame_quit_requested(self):
         quit_events = (e for e in pygame.event.get() if e.type == pygame.QUIT)
-        return any(quit_events)
+        return any(quit_events) or self._renderer.closed
+
+    def step(self):
+        """
+        Processes the next event, straight away while idle, otherwise once
+        the wall clock gets to it
+        """
+        if self.now < self._start or (self.idle is not None and self.idle()):
+            self.warping = True
+            return simpy.Environment.step(self)
+        if self.warping:
+            # Something moves again, in step with the wall clock from here,
+            # sync() alone would keep counting from the start of the run
+            self.warping = False
+            self.env_start = self.now
+            self.sync()
+        return super().step()
 
-    def run(self):
+    def run(self, start=0):
         """
         Runs the simulation until a ``pygame.QUIT`` event is received
+
+        :param start: simulated time of the first frame, the run gets there as
+            fast as the events can be processed
         """
+        self._start = start
         self.process(self._render())
         super().run(until=self._on_pygame_quit)
 
 
+class FrameEnvironment(simpy.Environment):
+    """
+    Draws the same frames as :class:`PyGameEnvironment`, one every
+    ``1 / (factor * fps)`` of simulated time, but as fast as they can be drawn
+    instead of in step with the wall clock. Used to export a run as a video.
+
+    :param renderer: what we use to draw the simulation
+    :param fps: frames per second the window would have
+    :param factor: simulated time per real second, as for ``RealtimeEnvironment``
+    """
+
+    def __init__(self, renderer, fps=30, factor=1.0, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.factor = factor
+        self._renderer = renderer
+        self._ticks_per_frame = 1.0 / (self.factor * fps)
+
+    def _render(self, start=0):
+        if self.now < start:
+            yield self.timeout(start - self.now)
+        while True:
+            self._renderer.render(self.now)
+
+            yield self.timeout(self._ticks_per_frame)
+
+    def run(self, until=None, start=0):
+        """
+        Runs the simulation until ``until``, a time or an event
+
+        :param start: simulated time of the first frame
+        """
+        self.process(self._render(start))
+        return super().run(until=until)
+
+
 class FrameRenderer(object):
     """
     Renders the state of the simulation to a ``pygame`` display.
 
     :param screen: a ``pygame`` display that gets passed to every draw function added via :meth:`add`
+    :param dirty_rects: only redraw and push the parts of the screen that change, see :meth:`render_dirty`
+    :param snapshots: a :class:`~animation.render_process.RenderProcess` drawing the frames instead
+    :param frames: a :class:`~animation.export.FrameWriter` every drawn frame is handed to
     """
 
-    def __init__(self, screen, background, bg_image):
+    def __init__(
+        self,
+        screen,
+        background,
+        bg_image,
+        dirty_rects=False,
+        snapshots=None,
+        frames=None,
+    ):
         self._screen = screen
         self._callbacks = []
         self._background = background
         self._bg_image = bg_image
         self.vehicle_group = pygame.sprite.Group()
+        self.dirty_rects = dirty_rects
+        self.snapshots = snapshots
+        self.frames = frames
+        # ReplayRecorder told about every frame, see animation.replay
+        self.replay = None
+        # Background and floors that do not move, composited by _build_static
+        self._static = None
+        # Sprites of the layout that move, like the shuttles
+        self._moving_sprites = None
+        self._static_sprites = []
+        self._static_set = set()
+        self._changing = []
+        # Screen areas drawn over last frame, put back from _static this frame
+        self._drawn = []
 
     def check_mouse(self):
         mouse_x, mouse_y = pygame.mouse.get_pos()
@@ -71,12 +172,38 @@ class FrameRenderer(object):
                 # If the vehicle doesn't collide with the mouse cursor
                 vehicle.popup.hide()
 
-    def render(self):
+    def render(self, now=None):
+        """
+        Draws a frame, see :meth:`render_full` and :meth:`render_dirty`, or
+        hands it to the render process or the frame writer.
+
+        :param now: simulated time of the frame, the sprites are put where they
+            are at that time first, see :meth:`step`. Left where they are when None
+        """
+        if self.replay is not None:
+            self.replay.frame(now)
+        if self.frames is not None and not self.frames.take_frame():
+            # Nothing to keep up to date, the next frame works it out afresh
+            return
+        if now is not None:
+            self.step(now)
+        if self.snapshots is not None:
+            self.publish()
+            return
+
+        if self.dirty_rects:
+            self.render_dirty()
+        else:
+            self.render_full()
+
+        if self.frames is not None:
+            self.frames.write(self._screen)
+
+    def render_full(self):
         """
         Fills the screen with *fill_color*, then calls all draw functions, then
         updates the screen with ``pygame.display.flip``.
         """
-
         for tile in self._background:
             self._screen.blit(self._bg_image, tile)
 
@@ -98,6 +225,130 @@ class FrameRenderer(object):
 
         pygame.display.flip()
 
+    def _composite(self, surface, area=None):
+        # Background, then every static sprite in drawing order, inside area
+        surface.set_clip(area)
+        for tile in self._background:
+            surface.blit(self._bg_image, tile)
+        for sprite in self._static_sprites:
+            if area is None or sprite.rect.colliderect(area):
+                sprite(win=surface)
+        surface.set_clip(None)
+
+    def _build_static(self):
+        # Sprites that move themselves are drawn every frame, the rest only once
+        self._static_sprites = [
+            sprite
+            for draw in self._callbacks
+            if isinstance(draw, pygame.sprite.Group)
+            for sprite in draw.sprites()
+            if not hasattr(sprite, "move")
+        ]
+        self._static_set = set(self._static_sprites)
+        # Static sprites that flag a change of look, like the lift occupancy
+        self._changing = [
+            sprite for sprite in self._static_sprites if hasattr(sprite, "dirty")
+        ]
+        for sprite in self._changing:
+            sprite.dirty = False
+
+        self._static = self._screen.copy()
+        self._composite(self._static)
+        self._drawn = []
+
+    def render_dirty(self):
+        """
+        Same picture as :meth:`render`, but the background and floors are composited
+        once. Each frame only the areas drawn over last frame are put back, the
+        moving sprites, boards and popups are drawn again, and just those areas are
+        pushed with ``pygame.display.update``.
+        """
+        full = self._static is None
+        if full:
+            self._build_static()
+            self._screen.blit(self._static, (0, 0))
+
+        restore = self._drawn
+        for sprite in self._changing:
+            if sprite.dirty:
+                sprite.dirty = False
+                self._composite(self._static, sprite.rect)
+                restore.append(sprite.rect.copy())
+        for rect in restore:
+            self._screen.blit(self._static, rect, rect)
+
+        drawn = []
+        for draw in self._callbacks:
+            if isinstance(draw, pygame.sprite.Group):
+                for sprite in draw.sprites():
+                    if sprite not in self._static_set:
+                        drawn.append(sprite.rect.copy())
+                        sprite(win=self._screen)
+            else:
+                draw(win=self._screen)
+                rect = getattr(draw, "rect", None)
+                if rect is None:
+                    # No idea what it covers, so push the whole frame
+                    full = True
+                else:
+                    drawn.append(rect.copy())
+
+        for vehicle in self.vehicle_group:
+            drawn.append(vehicle.rect.copy())
+            vehicle(win=self._screen)
+
+        for vehicle in self.vehicle_group:
+            if vehicle.popup.render(self._screen):
+                drawn.append(vehicle.popup.rect.copy())
+
+        self.check_mouse()
+
+        if full:
+            pygame.display.flip()
+        else:
+            pygame.display.update(restore + drawn)
+        self._drawn = drawn
+
+    def moving_sprites(self):
+        """Sprites of the layout that move themselves"""
+        if self._moving_sprites is None:
+            self._moving_sprites = [
+                sprite
+                for draw in self._callbacks
+                if isinstance(draw, pygame.sprite.Group)
+                for sprite in draw.sprites()
+                if hasattr(sprite, "move")
+            ]
+        return self._moving_sprites
+
+    def step(self, now):
+        """Puts the moving sprites where they are at simulated time ``now``"""
+        for sprite in self.moving_sprites():
+            sprite.move(now)
+
+        for vehicle in self.vehicle_group:
+            vehicle.step(now)
+
+    def moving(self, now):
+        """Whether any sprite is still on its way at simulated time ``now``"""
+        return any(sprite.moving(now) for sprite in self.moving_sprites()) or any(
+            vehicle.moving(now) for vehicle in self.vehicle_group
+        )
+
+    def publish(self):
+        """Hands the state of the sprites to the render process"""
+        self.snapshots.publish(self._callbacks, self.vehicle_group)
+
+    @property
+    def callbacks(self):
+        """Draw functions, in the order they are called"""
+        return self._callbacks
+
+    @property
+    def closed(self):
+        """Whether the window of the render process has been closed"""
+        return self.snapshots is not None and self.snapshots.closed
+
     def add(self, drawable):
         """
         add a draw function to be called on every frame
@@ -107,3 +358,6 @@ class FrameRenderer(object):
             self.vehicle_group.add(drawable)
         else:
             self._callbacks.append(drawable)
+            # Composite again with the new drawable on the next frame
+            self._static = None
+            self._moving_sprites = None
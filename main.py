@@ -1,98 +1,345 @@
 import pygame
+import random
 
 from constants import *
 from animation.utils import get_background
-from animation.init import FloorLayout
+from animation.init import create_carpark_layout
 
 from simulation.init import sim_init
+from classes.geometry import Geometry
+from classes.policies import PLACEMENT_POLICIES, get_policy
 from simulation.utils import vehicle_arrival, collect_floor, logging_setup
+from simulation.utils import process_car_arrival_csv
+from simulation.schedule import ArrivalSchedule
+import animation.utils
 import numpy as np
 
-from core import PyGameEnvironment, FrameRenderer
+from core import PyGameEnvironment, FrameEnvironment, FrameRenderer
+from animation.export import FrameWriter, parse_resolution
+from animation.render_process import RenderProcess
 from animation.stats import StatsBox
 from animation.status_tracker import Status_Tracker
 
-import multiprocessing
+import os
+import argparse
+import ast
+import itertools
+from os.path import join
+from simulation.sweep import build_runs, sweep, apply_constants, PERIODS, CACHE_DIR
+from simulation.scenario import load_scenario, make_scenario
+from simulation.scenario import scenario_geometry, scenario_hash
+from simulation.recorder import EventRecorder
+from animation.replay import ReplayRecorder, parse_time
+import datetime
 
 
-def simulation(instance_type):
-    np.random.seed(seed=RANDOM_SEEDS)
+def simulation(
+    instance_type,
+    seed=None,
+    geometry=None,
+    config=None,
+    render_process=None,
+    export=None,
+    until=None,
+    warp=None,
+    start=0,
+    record=None,
+):
+    """
+    Animated run of ``instance_type``, in a window until it is closed
+
+    :param export: ``{"path": ..., "frame_skip": ..., "resolution": ...}`` to
+        write the frames to a video or images instead, see animation.export
+    :param until: simulated time an export stops at, once every car has left by default
+    :param render_process: draw the window from a separate process,
+        ``RENDER_PROCESS`` by default
+    :param warp: skip ahead through simulated time in which nothing moves,
+        ``IDLE_WARP`` by default
+    :param start: simulated time the animation starts at, the run gets there
+        without drawing, the cars, lifts and shuttles are where it left them
+    :param record: record the run to logs/ for animation.replay,
+        ``RECORD_REPLAY`` by default
+    """
+    # Read now rather than as defaults, so the constants of a scenario apply
+    seed = RANDOM_SEEDS if seed is None else seed
+    render_process = RENDER_PROCESS if render_process is None else render_process
+    warp = IDLE_WARP if warp is None else warp
+    record = RECORD_REPLAY if record is None else record
+    np.random.seed(seed=seed)
+    random.seed(seed)
     logger = logging_setup(instance_type)
 
+    title = f"Mechanised Carpark Simulation - {instance_type}"
+    video_driver = os.environ.get("SDL_VIDEODRIVER")
+    if render_process or export is not None:
+        # The window belongs to the render process, or there is none at all,
+        # sprites still need a display
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
     pygame.init()
-    pygame.display.set_caption(f"Mechanised Carpark Simulation - {instance_type}")
+    pygame.display.set_caption(title)
     window = pygame.display.set_mode((WIDTH, HEIGHT))
+    # Load the car sprites once, before the first arrival needs them
+    animation.utils.get_sprite_sheets("Cars", True)
 
     # Is it cache?
-    isCache = True if instance_type == "Cache" else False
+    isCache = get_policy(instance_type).cache_level
 
     # Background for the animation
     background, bg_img = get_background("Blue.png")
 
-    renderer = FrameRenderer(window, background, bg_img)
-    env = PyGameEnvironment(renderer, factor=FACTOR, fps=FPS, strict=False)
+    if geometry is None:
+        geometry = Geometry.load()
+    snapshots = None
+    if render_process and export is None:
+        snapshots = RenderProcess(geometry, isCache, title, video_driver)
+    frames = None
+    if export is not None:
+        frames = FrameWriter(logger=logger, **export)
+
+    renderer = FrameRenderer(
+        window,
+        background,
+        bg_img,
+        dirty_rects=RENDER_DIRTY_RECTS,
+        snapshots=snapshots,
+        frames=frames,
+    )
+    if frames is not None:
+        env = FrameEnvironment(renderer, factor=FACTOR, fps=FPS)
+    else:
+        env = PyGameEnvironment(renderer, factor=FACTOR, fps=FPS, strict=False)
 
     # Setup carpark layout
-    floor_no = NUM_OF_LEVELS
-    carpark_layout = {}
-    for i in range(0, NUM_OF_LEVELS):
-        floor_group = FloorLayout(level_number=floor_no, y_offset=i * 150 + 12)
-        if i == NUM_OF_LEVELS - 1 and isCache:
-            floor_group.create_floors_group(isCache)
-        else:
-            floor_group.create_floors_group()
-        renderer.add(floor_group.floors_group)
-        carpark_layout[floor_no] = floor_group.floors_group
-        floor_no -= 1
+    carpark_layout = create_carpark_layout(geometry, isCache, env=env)
+    for floors_group in carpark_layout.values():
+        renderer.add(floors_group)
 
     # Stat Board
     stats_box = StatsBox(logger)
     renderer.add(stats_box)
 
+    # Event trace, render it with: python -m simulation.recorder <file>
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    recorder = EventRecorder(
+        env,
+        join("logs", f"{instance_type}_{timestamp}.events"),
+        level=EVENT_LOG_LEVEL,
+        levels=EVENT_LOG_LEVELS,
+    )
+
+    # What is animated, to play back with: python -m animation.replay <file>
+    animator = animation.utils
+    replay = None
+    if record:
+        replay = ReplayRecorder(
+            join("logs", f"{instance_type}_{timestamp}.replay.npz"),
+            renderer,
+            geometry,
+            isCache,
+            animation.utils,
+            meta={
+                "policy": instance_type,
+                "period": os.environ["PERIOD"],
+                "seed": seed,
+            },
+        )
+        renderer.replay = replay
+        animator = replay
+
     # init carpark class
-    carpark = sim_init(env, carpark_layout, stats_box, logger, isCache=isCache)
+    carpark = sim_init(
+        env,
+        carpark_layout,
+        stats_box,
+        logger,
+        animator=animator,
+        recorder=recorder,
+        policy=instance_type,
+        geometry=geometry,
+    )
 
     # Status Tracker
     status_tracker = Status_Tracker(carpark.lifts_store, carpark.shuttles_stores)
     renderer.add(status_tracker)
     carpark.status_tracker = status_tracker
-    carpark.policy = instance_type
+
+    if warp and frames is None:
+        # Nothing on screen changes before the next event while this holds
+        env.idle = lambda: carpark.idle() and not renderer.moving(env.now)
 
     # Car Arrival
     env.process(collect_floor(env, carpark, instance_type))
     env.process(stats_box.set_stat_time(env, stats_box))
-    env.process(vehicle_arrival(env, renderer, carpark, logger))
+    schedule = ArrivalSchedule(process_car_arrival_csv(), seed=seed)
+    arrivals = env.process(vehicle_arrival(env, renderer, carpark, schedule))
     env.process(carpark.update_status())
 
-    env.run()
-    stats_box.show_stats(carpark, instance_type)
+    if frames is not None:
+        env.run(until=arrivals if until is None else until, start=start)
+        frames.close()
+    else:
+        env.run(start=start)
+    if snapshots is not None:
+        snapshots.close()
+    recorder.close()
+    if replay is not None:
+        replay.close()
+    if config is None:
+        config = scenario_hash(make_scenario(instance_type, os.environ["PERIOD"], seed))
+    # A run stopped by ``until`` or a closed window before every car has left
+    # would pass for a whole one in the results store
+    complete = arrivals.triggered
+    if not complete:
+        logger.info(f"Run stopped at {env.now:.2f} before every car left, not stored")
+    stats_box.show_stats(carpark, instance_type, seed, config, store=complete)
+
+
+def parse_constant(option):
+    # NAME=v1;v2 -> ("NAME", [v1, v2])
+    name, values = option.split("=", 1)
+    return name, [ast.literal_eval(value) for value in values.split(";")]
 
 
 if __name__ == "__main__":
-    # Define the number of parallel simulations
-    simulations_type = [
-        "Nearest-First",
-        # "Randomised",
-        # "Balanced",
-        "Cache",
-    ]  # Adjust as needed
-
-    # Create a list to store process objects
-    processes = []
-
-    # for type in simulations_type:
-    #     process = multiprocessing.Process(target=simulation, args=(type,))
-    #     processes.append(process)
-    #     process.start()
-
-    # # Wait for all processes to finish
-    # for process in processes:
-    #     process.join()
-
-    # Test multiple time
-    # for i in range(3):
-    #     process = multiprocessing.Process(target=simulation, args=(f"Balanced",))
-    #     processes.append(process)
-    #     process.start()
-    # simulation("Nearest-First")
-    simulation("Cache")
+    parser = argparse.ArgumentParser(description="Mechanised Carpark Simulation")
+    parser.add_argument(
+        "policies",
+        nargs="*",
+        default=["Cache"],
+        help="policies to run, only the first one is animated, one of "
+        + ", ".join(PLACEMENT_POLICIES),
+    )
+    parser.add_argument(
+        "--sweep",
+        action="store_true",
+        help="run every policy x period x seed x constant headless on a process pool",
+    )
+    parser.add_argument("--periods", nargs="+", default=PERIODS)
+    parser.add_argument("--seeds", type=int, default=1, help="number of seeds")
+    parser.add_argument(
+        "--constant",
+        action="append",
+        default=[],
+        type=parse_constant,
+        help="constant values to sweep over, e.g. LIFT_SPEED=65;90",
+    )
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--time-limit", type=float, default=600)
+    parser.add_argument("--store", default=join("output", "sweep.jsonl"))
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        default=[],
+        help="scenario file(s) to run instead of the policies, see simulation/scenario.py",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="simulate runs already in output/cache"
+    )
+    parser.add_argument(
+        "--render-process",
+        action="store_true",
+        default=None,
+        help="draw the window from a separate process fed simulation snapshots, "
+        "RENDER_PROCESS by default",
+    )
+    parser.add_argument(
+        "--no-warp",
+        dest="warp",
+        action="store_false",
+        default=None,
+        help="keep to the wall clock even while nothing moves",
+    )
+    parser.add_argument(
+        "--record",
+        action="store_true",
+        default=None,
+        help="record the run to logs/ to play back with animation.replay, "
+        "RECORD_REPLAY by default",
+    )
+    parser.add_argument(
+        "--start",
+        type=parse_time,
+        default=0,
+        help="simulated time to start the animation at, e.g. 3:00 as on the stats "
+        "board, the run gets there as fast as it can without drawing",
+    )
+    parser.add_argument(
+        "--export",
+        default=None,
+        help="write the animation to a video (.mp4, needs ffmpeg) or a folder of "
+        "images, as fast as it can be drawn",
+    )
+    parser.add_argument(
+        "--frame-skip", type=int, default=1, help="export every n-th frame"
+    )
+    parser.add_argument(
+        "--resolution",
+        type=parse_resolution,
+        default=None,
+        help="size of the exported frames, e.g. 800x720",
+    )
+    parser.add_argument(
+        "--until", type=float, default=None, help="simulated mins an export stops at"
+    )
+    args = parser.parse_args()
+    export = None
+    if args.export is not None:
+        export = {
+            "path": args.export,
+            "frame_skip": args.frame_skip,
+            "resolution": args.resolution,
+        }
+    for policy in args.policies:
+        if policy not in PLACEMENT_POLICIES:
+            parser.error(f"unknown policy {policy}")
+
+    scenarios = [load_scenario(path) for path in args.scenario]
+    if args.sweep and scenarios:
+        sweep(
+            scenarios,
+            store_path=args.store,
+            workers=args.workers,
+            time_limit=args.time_limit,
+            cache_dir=None if args.no_cache else CACHE_DIR,
+        )
+    elif scenarios:
+        # Only the first scenario is animated
+        scenario = scenarios[0]
+        apply_constants(scenario["constants"])
+        os.environ["PERIOD"] = scenario["period"]
+        simulation(
+            scenario["policy"],
+            seed=scenario["seed"],
+            geometry=scenario_geometry(scenario),
+            config=scenario_hash(scenario),
+            render_process=args.render_process,
+            export=export,
+            until=args.until,
+            warp=args.warp,
+            start=args.start,
+            record=args.record,
+        )
+    elif args.sweep:
+        names = [name for name, _ in args.constant]
+        constants_grid = [
+            dict(zip(names, values))
+            for values in itertools.product(*[values for _, values in args.constant])
+        ]
+        runs = build_runs(args.policies, args.periods, args.seeds, constants_grid)
+        sweep(
+            runs,
+            store_path=args.store,
+            workers=args.workers,
+            time_limit=args.time_limit,
+            cache_dir=None if args.no_cache else CACHE_DIR,
+        )
+    else:
+        simulation(
+            args.policies[0],
+            render_process=args.render_process,
+            export=export,
+            until=args.until,
+            warp=args.warp,
+            start=args.start,
+            record=args.record,
+        )
@@ -0,0 +1,188 @@
+"""
+Every event type the simulation records, see simulation.recorder.
+The simulation time of an event is kept with it, so templates leave it out.
+"""
+
+from logging import DEBUG, INFO, WARNING
+from simulation.recorder import EventType
+
+# Arrivals and drivers
+ARRIVAL_OFFSETS = EventType("arrival", INFO, "Random list: %s", ("offsets",))
+ARRIVALS_DONE = EventType("arrival", INFO, "--No more incoming vehicles--")
+ARRIVED = EventType(
+    "arrival", INFO, "Car %d arrived at the entrance of the carpark", ("car",)
+)
+RETRIEVAL_SCHEDULED = EventType(
+    "arrival",
+    INFO,
+    "Car %d will be retrieved from parking lot %d at %.2f (+%.2f)",
+    ("car", "lot", "retrieval_time", "duration"),
+)
+RETRIEVAL_CALLED = EventType(
+    "arrival", INFO, "Car %d: Driver called for retrieval", ("car",)
+)
+
+# Lifts
+LIFTS_FREE = EventType("lift", INFO, "Lifts: %s", ("lifts",))
+LIFTS_AVAILABLE = EventType("lift", INFO, "Lifts %s are available", ("lifts",))
+LIFTS_ALL_BUSY = EventType(
+    "lift", INFO, "Car %d - Lifts are currently all occupied", ("car",)
+)
+LIFT_CALLED = EventType(
+    "lift",
+    INFO,
+    "[%s] Lift %d: Dest %d, pos: %d",
+    ("stage", "lift", "dest", "pos"),
+)
+LIFT_MOVED = EventType(
+    "lift",
+    INFO,
+    "Lift %d has moved from %d to %d (%d)",
+    ("lift", "from_level", "to_level", "levels"),
+)
+LIFT_INTERRUPTED = EventType(
+    "lift", WARNING, "Lift %d operation interrupted", ("lift",)
+)
+LIFT_DUAL_COMMAND = EventType(
+    "lift",
+    INFO,
+    "Lift %d at level %d takes car %d from level %d",
+    ("lift", "level", "car", "car_level"),
+)
+LIFT_RETURNED = EventType(
+    "lift", WARNING, "[%s] Lift %d back into store", ("stage", "lift")
+)
+LOBBY_RETURNED = EventType(
+    "lift", WARNING, "[%s] Lobby %d back into store", ("stage", "lobby")
+)
+
+# Shuttles
+SHUTTLE_POS = EventType("shuttle", WARNING, "shuttle pos %d", ("pos",))
+SHUTTLES_BUSY = EventType(
+    "shuttle", INFO, "Level %d's Shuttle is currently all occupied", ("level",)
+)
+SHUTTLE_HOME = EventType(
+    "shuttle", INFO, "Level %d's Shuttle back to default position", ("level",)
+)
+
+# Parking
+CACHE_LEVEL_LOTS = EventType(
+    "parking", INFO, "[CACHE] Level 1 Available lots: %d", ("lots",)
+)
+PARKING_ENTERED_LIFT = EventType(
+    "parking",
+    INFO,
+    "[Parking] Car %d entered in lift bay and took lift %d",
+    ("car", "lift"),
+)
+PARKING_AT_LEVEL = EventType(
+    "parking",
+    INFO,
+    "[Parking] Car %d took lift %d and at level %d",
+    ("car", "lift", "level"),
+)
+PARKING_SHUTTLE_READY = EventType(
+    "parking",
+    INFO,
+    "[Parking] Level %d's shuttle %d is ready for loading",
+    ("level", "shuttle"),
+)
+PARKED = EventType(
+    "parking", INFO, "[Parking] Car %d parked at parking lot %d", ("car", "lot")
+)
+
+# Exiting
+EXIT_LEAVING_LOT = EventType(
+    "exiting",
+    INFO,
+    "[Exiting] Car %d is at level %d leaving the parking lot",
+    ("car", "level"),
+)
+EXIT_RESERVING = EventType(
+    "exiting",
+    INFO,
+    "[Exiting] Car %d reserving lift %d and level %d shuttle",
+    ("car", "lift", "level"),
+)
+EXIT_RESERVED = EventType(
+    "exiting",
+    INFO,
+    "[Exiting] Car %d is at level %d reserved lift %d and level %d shuttle",
+    ("car", "level", "lift", "shuttle_level"),
+)
+EXIT_USING_SHUTTLE = EventType(
+    "exiting",
+    INFO,
+    "[Exiting] Car %d is at level %d using the shuttle",
+    ("car", "level"),
+)
+EXIT_ENTERED_LIFT = EventType(
+    "exiting",
+    INFO,
+    "[Exiting] Car %d entered in lift bay and took lift %d",
+    ("car", "lift"),
+)
+EXIT_LIFT_MOVED = EventType(
+    "exiting", INFO, "[Exiting] Lift %d move to level %d", ("lift", "level")
+)
+EXITED = EventType("exiting", INFO, "[Exiting] Car %d exited the carpark", ("car",))
+DROVE_OUT = EventType(
+    "exiting", INFO, "[Exiting] Car %d exits out of the carpark", ("car",)
+)
+
+# Cache shuffling, to a higher level and back down to the ground level
+CACHE_RESERVING_SHUTTLE = EventType(
+    "cache", INFO, "[Cache] Car %d is reserving shuttle", ("car",)
+)
+CACHE_RESERVED = EventType(
+    "cache",
+    INFO,
+    "[%s] Car %d reserving Lift %d and levels %d, %d shuttle",
+    ("stage", "car", "lift", "from_level", "to_level"),
+)
+CACHE_USING_SHUTTLE = EventType(
+    "cache",
+    INFO,
+    "[%s] Car %d is at level %d using the shuttle",
+    ("stage", "car", "level"),
+)
+CACHE_ENTERED_LIFT = EventType(
+    "cache",
+    INFO,
+    "[Cache] Car %d entered in lift bay and took lift %d",
+    ("car", "lift"),
+)
+CACHE_AT_LEVEL = EventType(
+    "cache",
+    INFO,
+    "[%s] Car %d took lift %d and at level %d",
+    ("stage", "car", "lift", "level"),
+)
+CACHE_PARKED = EventType(
+    "cache",
+    INFO,
+    "[Cache] Car %d parked at level %d parking lot %d",
+    ("car", "level", "lot"),
+)
+CACHE_STOPPED = EventType(
+    "cache",
+    INFO,
+    "[Cache] Car %d is not going to be shifted, stopped at state %d",
+    ("car", "state"),
+)
+CACHE_MOVE_CANCELLED = EventType(
+    "cache", INFO, "[Cache-MTG] Car %d cancel moving to ground level", ("car",)
+)
+CACHE_MOVE_ISSUED = EventType(
+    "cache",
+    INFO,
+    "[Cache] Moving car %d up, %d cars left on the ground level",
+    ("car", "waiting"),
+)
+PARKING_QUEUE = EventType("cache", DEBUG, "Parking Q: %d", ("queue",))
+PREFETCH_ISSUED = EventType(
+    "cache",
+    INFO,
+    "[Prefetch] Moving car %d down from level %d ahead of its driver's call",
+    ("car", "level"),
+)
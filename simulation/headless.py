@@ -0,0 +1,174 @@
+import os
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import sys
+import time
+import random
+import logging
+import numpy as np
+import simpy
+
+import animation.headless
+from animation.stats import StatsBox
+from classes.geometry import Geometry
+from constants import *
+from simulation.init import sim_init
+from simulation import events
+from simulation.recorder import EventRecorder
+from simulation.schedule import ArrivalSchedule
+from simulation.utils import collect_floor, process_car_arrival_csv, run
+
+
+class SimulationTimeout(Exception):
+    pass
+
+
+class HeadlessVehicle:
+    """
+    What ``Carpark`` needs to know about a car, without the sprite
+    """
+
+    def __init__(self, env, id):
+        self.env = env
+        self.id = id
+        self.parking_lot = [None, None]  # (level, lot)
+        self.popup = None
+        self.drive_in_time = None
+        self.drive_out_time = None
+
+
+def headless_logger(instance_type, level=logging.ERROR):
+    logger = logging.getLogger(f"{instance_type}-headless")
+    logger.setLevel(level)
+    logger.propagate = False
+    if not logger.handlers:
+        logger.addHandler(logging.NullHandler())
+
+    return logger
+
+
+def headless_vehicle_arrival(env, carpark, schedule):
+    cars = []
+
+    for car_ids in schedule.minutes():
+        for car_id in car_ids:
+            vehicle = HeadlessVehicle(env, car_id)
+            vehicle.drive_in_time, vehicle.drive_out_time = schedule.drive_times_of(
+                car_id
+            )
+            carpark.parking_queue.append(vehicle)
+            carpark.stats_box.stats["Cars Waiting"] += 1
+
+            cars.append(
+                env.process(
+                    run(
+                        env,
+                        None,
+                        carpark,
+                        car_id,
+                        schedule.offset_of(car_id),
+                        schedule.duration_of(car_id),
+                    )
+                )
+            )
+
+        yield env.timeout(1)
+    carpark.recorder.record(events.ARRIVALS_DONE)
+
+    # The run is over once the last car has left the carpark
+    yield env.all_of(cars)
+
+
+def watchdog(env, time_limit):
+    # Checked once per simulated minute, which is plenty for a run of seconds
+    deadline = time.monotonic() + time_limit
+    while True:
+        yield env.timeout(1)
+        if time.monotonic() > deadline:
+            raise SimulationTimeout(
+                "Gave up after %.0fs of wall-clock time at %.2f" % (time_limit, env.now)
+            )
+
+
+def headless_simulation(
+    instance_type,
+    period=None,
+    seed=None,
+    logger=None,
+    time_limit=None,
+    env=None,
+    trace=None,
+    geometry=None,
+    car_arrival_list=None,
+):
+    """
+    Runs one period slice as fast as possible on a plain ``simpy.Environment``.
+    No window is opened and no sprites are created, the returned ``StatsBox``
+    holds the same waiting/service/floor statistics as the animated run.
+
+    :param instance_type: parking policy, e.g. "Nearest-First" or "Cache"
+    :param period: file name in data/slices/, defaults to the PERIOD environment variable
+    :param seed: seeds the arrival schedule, ``random`` and ``numpy.random``,
+        ``RANDOM_SEEDS`` by default
+    :param time_limit: wall-clock seconds before :class:`SimulationTimeout` is raised
+    :param env: a fresh ``simpy.Environment`` (or subclass) to run on
+    :param trace: file to record the run's events to, see simulation.recorder
+    :param geometry: ``Geometry`` of the carpark, the ``LAYOUT`` one by default
+    :param car_arrival_list: number of cars arriving in each minute, those of
+        ``period`` by default
+    """
+    if seed is None:
+        seed = RANDOM_SEEDS
+    np.random.seed(seed=seed)
+    random.seed(seed)
+    if logger is None:
+        logger = headless_logger(instance_type)
+
+    if env is None:
+        env = simpy.Environment()
+    if geometry is None:
+        geometry = Geometry.load()
+    carpark_layout = {level: None for level in range(1, geometry.levels + 1)}
+    stats_box = StatsBox(logger, headless=True)
+    recorder = None
+    if trace is not None:
+        recorder = EventRecorder(
+            env, trace, level=EVENT_LOG_LEVEL, levels=EVENT_LOG_LEVELS
+        )
+
+    carpark = sim_init(
+        env,
+        carpark_layout,
+        stats_box,
+        logger,
+        animator=animation.headless,
+        recorder=recorder,
+        policy=instance_type,
+        geometry=geometry,
+    )
+
+    env.process(collect_floor(env, carpark, instance_type))
+    if car_arrival_list is None:
+        car_arrival_list = process_car_arrival_csv(period)
+    schedule = ArrivalSchedule(car_arrival_list, seed=seed)
+    arrivals = env.process(headless_vehicle_arrival(env, carpark, schedule))
+    if time_limit is not None:
+        env.process(watchdog(env, time_limit))
+
+    try:
+        env.run(until=arrivals)
+    finally:
+        if recorder is not None:
+            recorder.close()
+
+    return stats_box
+
+
+if __name__ == "__main__":
+    instance_type = sys.argv[1] if len(sys.argv) > 1 else "Nearest-First"
+    results = headless_simulation(instance_type).get_results()
+
+    for key in ["parking", "retrieval", "service_parking"]:
+        times = list(results[key].values())
+        print(f"{key}: {len(times)} cars, mean {np.mean(times):.3f} mins")
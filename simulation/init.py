@@ -7,43 +7,57 @@ from classes.lobby import Lobby
 from classes.shuttle import Shuttle
 from constants import *
 from classes.carpark import Carpark
-from simulation.utils import create_lifts_data
+from classes.state_change import ObservableStore, ObservableFilterStore
+from classes.travel_times import TravelTimes
+from classes.geometry import Geometry
+from classes.policies import get_policy
 
 
-def sim_init(env, carpark_layout, stats_box, logger, isCache=False):
+def sim_init(
+    env,
+    carpark_layout,
+    stats_box,
+    logger,
+    isCache=False,
+    animator=None,
+    recorder=None,
+    policy=None,
+    geometry=None,
+):
+    if policy is not None:
+        # The cache policy needs the lobby and fewer ground level lots
+        isCache = get_policy(policy).cache_level
+    if geometry is None:
+        geometry = Geometry.load()
+    if isCache and not geometry.lobby:
+        raise ValueError(f"Layout {geometry.name} has no lobby for the cache level")
+
+    # Every lift, lobby and shuttle times its trips from the same table
+    travel_times = TravelTimes(geometry)
+
     # Create Lobby Store
-    lobby_store, lobby_travel_data = None, None
-    total_parking_lots = simpy.Resource(env, NUM_OF_PARKING_PER_LEVEL * NUM_OF_LEVELS)
+    lobby_store = None
+    total_parking_lots = simpy.Resource(env, geometry.total_lots(isCache))
     if isCache:
-        lobby_store = simpy.Store(env, capacity=1)
-        lobby_travel_data = create_lifts_data(LOBBY, cache=True)[0]
-        lobby_store.items.append(Lobby(env, 1, lobby_travel_data))
-        total_parking_lots = simpy.Resource(
-            env, NUM_OF_PARKING_PER_LEVEL * NUM_OF_LEVELS - 3
-        )
+        lobby_store = ObservableStore(env, capacity=len(geometry.lobby))
+        for i in range(1, len(geometry.lobby) + 1):
+            lobby_store.items.append(Lobby(env, i, travel_times))
 
     # Create Lifts Store
-    lifts_travel_data = create_lifts_data(LIFTS, cache=False)
-
-    lifts_store = simpy.FilterStore(env, capacity=NUM_OF_LIFTS)
-    for i in range(1, NUM_OF_LIFTS + 1):
-        lifts_store.items.append(
-            Lift(
-                env,
-                i,
-                lifts_travel_data[i - 1],
-                DEFAULT_LIFT_STATE,
-                lobby_travel_data,
-            )
-        )
+    lifts_store = ObservableFilterStore(env, capacity=len(geometry.lifts))
+    for i in range(1, len(geometry.lifts) + 1):
+        lifts_store.items.append(Lift(env, i, travel_times, DEFAULT_LIFT_STATE))
 
     parking_lots_sets = []
     shuttles_stores = []
-    for _ in range(NUM_OF_LEVELS):
+    for _ in range(geometry.levels):
         # Create Shuttle Store
-        shuttles_store = simpy.Store(env, capacity=NUM_OF_SHUTTLE_PER_LEVEL)
-        for i in range(1, NUM_OF_SHUTTLE_PER_LEVEL + 1):
-            shuttles_store.items.append(Shuttle(env, i))
+        # One shuttle per track, got by its track
+        shuttles_store = ObservableFilterStore(
+            env, capacity=geometry.shuttles_per_level
+        )
+        for i in range(1, geometry.shuttles_per_level + 1):
+            shuttles_store.items.append(Shuttle(env, i, travel_times))
         shuttles_stores.append(shuttles_store)
 
         # Create Parking lot resources
@@ -59,7 +73,11 @@ def sim_init(env, carpark_layout, stats_box, logger, isCache=False):
         stats_box,
         logger,
         lobby_store,
+        travel_times,
         isCache=isCache,
+        animator=animator,
+        recorder=recorder,
+        policy=policy,
     )
 
     return carpark
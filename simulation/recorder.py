@@ -0,0 +1,261 @@
+"""
+Compact binary trace of what happens in a run. A call site records an event
+type and its raw arguments. Packing and writing happen on a background
+thread, and a line of text is only formatted when the trace is rendered:
+
+    python -m simulation.recorder "logs/Cache_<timestamp>.events" [category ...]
+
+Each event type belongs to a category, and a per-category level decides what
+is kept. Events below it are dropped before any work is done.
+"""
+
+import sys
+import json
+import queue
+import struct
+import logging
+import threading
+import re
+import numpy as np
+
+MAGIC = b"CPEV1\n"
+DEFINE, EVENT = 0, 1
+OFF = logging.CRITICAL + 10
+
+_KIND = struct.Struct("<B")
+_DEFINE = struct.Struct("<HI")
+_EVENT = struct.Struct("<Hd")
+_LENGTH = struct.Struct("<I")
+_CONVERSION = re.compile(r"%[-+ #0]*\d*(?:\.\d+)?([dfsr%])")
+# Field type -> how it is packed, anything else is stored as text
+_PACKERS = {"d": struct.Struct("<q"), "f": struct.Struct("<d")}
+
+_event_types = []
+
+
+class EventType:
+    """
+    :param category: e.g. "parking", what the per-category levels apply to
+    :param template: %-style message, one conversion per field
+    :param fields: names of the fields, used as column names when loading
+    """
+
+    def __init__(self, category, level, template, fields=()):
+        self.id = len(_event_types)
+        self.category = category
+        self.level = level
+        self.template = template
+        self.types = [t for t in _CONVERSION.findall(template) if t != "%"]
+        self.fields = tuple(fields) or tuple(f"f{i}" for i in range(len(self.types)))
+        if len(self.fields) != len(self.types):
+            raise ValueError(f"{template!r} has {len(self.types)} fields")
+        _event_types.append(self)
+
+    def definition(self):
+        return {
+            "category": self.category,
+            "level": self.level,
+            "template": self.template,
+            "fields": self.fields,
+            "types": self.types,
+        }
+
+
+def parse_levels(levels):
+    # Level names ("INFO", "OFF") or numbers -> numbers
+    return {
+        category: (
+            (OFF if level == "OFF" else logging.getLevelName(level))
+            if isinstance(level, str)
+            else level
+        )
+        for category, level in levels.items()
+    }
+
+
+class EventRecorder:
+    """
+    :param path: file the trace is written to, nothing is kept without one
+    :param level: lowest level kept, for categories missing from ``levels``
+    :param levels: ``{category: level}``, levels given as numbers or names
+    :param echo: logger that also gets every kept event, formatted lazily by logging
+    :param batch_size: events handed to the writer thread at a time
+    """
+
+    def __init__(
+        self,
+        env,
+        path=None,
+        level=logging.INFO,
+        levels=None,
+        echo=None,
+        batch_size=4096,
+    ):
+        self.env = env
+        self.path = path
+        self.echo = echo
+        self.levels = parse_levels(levels or {})
+        self.level = parse_levels({None: level})[None]
+        self.batch_size = batch_size
+        self._batch = []
+        self._enabled = []
+        self._writer = None
+
+        if path is not None:
+            self._queue = queue.SimpleQueue()
+            self._writer = threading.Thread(
+                target=self._write, args=(path,), name="event-writer", daemon=True
+            )
+            self._writer.start()
+
+    def enabled(self, event):
+        """Whether ``event`` would be kept, to skip preparing costly arguments"""
+        try:
+            return self._enabled[event.id]
+        except IndexError:
+            # Types defined after the recorder was created
+            self._enabled.extend(
+                (self._writer is not None or self.echo is not None)
+                and event_type.level >= self.levels.get(event_type.category, self.level)
+                for event_type in _event_types[len(self._enabled) :]
+            )
+            return self._enabled[event.id]
+
+    def record(self, event, *args):
+        if not self.enabled(event):
+            return
+
+        if self._writer is not None:
+            self._batch.append((event, self.env.now, args))
+            if len(self._batch) >= self.batch_size:
+                self.flush()
+        if self.echo is not None:
+            self.echo.log(
+                event.level,
+                "%.2f [%s] " + event.template,
+                self.env.now,
+                event.category,
+                *args,
+            )
+
+    def flush(self):
+        if self._writer is not None and self._batch:
+            self._queue.put(self._batch)
+            self._batch = []
+
+    def close(self):
+        """Writes out everything recorded and waits for the writer thread"""
+        if self._writer is not None:
+            self.flush()
+            self._queue.put(None)
+            self._writer.join()
+            self._writer = None
+
+    def _write(self, path):
+        defined = set()
+        with open(path, "wb") as file:
+            file.write(MAGIC)
+            while True:
+                batch = self._queue.get()
+                if batch is None:
+                    return
+
+                chunks = []
+                for event, time, args in batch:
+                    if event.id not in defined:
+                        defined.add(event.id)
+                        definition = json.dumps(event.definition()).encode()
+                        chunks.append(_KIND.pack(DEFINE))
+                        chunks.append(_DEFINE.pack(event.id, len(definition)))
+                        chunks.append(definition)
+
+                    chunks.append(_KIND.pack(EVENT))
+                    chunks.append(_EVENT.pack(event.id, time))
+                    for field_type, arg in zip(event.types, args):
+                        packer = _PACKERS.get(field_type)
+                        if packer is not None:
+                            chunks.append(packer.pack(arg))
+                        else:
+                            text = str(arg).encode()
+                            chunks.append(_LENGTH.pack(len(text)))
+                            chunks.append(text)
+                file.write(b"".join(chunks))
+
+
+def read_events(path):
+    """Yields ``(definition, time, args)`` for every event in the trace"""
+    with open(path, "rb") as file:
+        data = file.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{path} is not an event trace")
+
+    definitions = {}
+    offset = len(MAGIC)
+    while offset < len(data):
+        (kind,) = _KIND.unpack_from(data, offset)
+        offset += _KIND.size
+        if kind == DEFINE:
+            event_id, length = _DEFINE.unpack_from(data, offset)
+            offset += _DEFINE.size
+            definitions[event_id] = json.loads(data[offset : offset + length])
+            offset += length
+            continue
+
+        event_id, time = _EVENT.unpack_from(data, offset)
+        offset += _EVENT.size
+        definition = definitions[event_id]
+        args = []
+        for field_type in definition["types"]:
+            packer = _PACKERS.get(field_type)
+            if packer is not None:
+                (arg,) = packer.unpack_from(data, offset)
+                offset += packer.size
+            else:
+                (length,) = _LENGTH.unpack_from(data, offset)
+                offset += _LENGTH.size
+                arg = data[offset : offset + length].decode()
+                offset += length
+            args.append(arg)
+        yield definition, time, args
+
+
+def load_events(path):
+    """
+    The trace as columns, ``{template: {"time": array, <field>: array, ...}}``
+    """
+    rows = {}
+    for definition, time, args in read_events(path):
+        template = definition["template"]
+        if template not in rows:
+            rows[template] = (definition, [])
+        rows[template][1].append([time] + args)
+
+    columns = {}
+    for template, (definition, events) in rows.items():
+        names = ["time"] + list(definition["fields"])
+        columns[template] = {
+            name: np.array([event[i] for event in events])
+            for i, name in enumerate(names)
+        }
+
+    return columns
+
+
+def render_events(path, categories=None, out=sys.stdout):
+    for definition, time, args in read_events(path):
+        if categories and definition["category"] not in categories:
+            continue
+        message = definition["template"] % tuple(args)
+        out.write(
+            "%8.2f %-8s [%s] %s\n"
+            % (
+                time,
+                logging.getLevelName(definition["level"]),
+                definition["category"],
+                message,
+            )
+        )
+
+
+if __name__ == "__main__":
+    render_events(sys.argv[1], categories=sys.argv[2:])
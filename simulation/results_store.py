@@ -0,0 +1,321 @@
+"""
+Append-only columnar store of run results, in output/results/:
+
+- ``runs.jsonl`` one line per run, its id, policy, period, seed, config hash
+  and the rows it owns in each table
+- ``vehicles/`` one row per car, its waiting and service times
+- ``samples/`` one row per level per floor occupancy sample
+
+Every column is a flat file of a single dtype, appended to and read back with
+``np.memmap``. A query only reads the columns it asks for, of the runs its
+filters pick out, so thousands of runs are compared without loading them.
+
+    python -m simulation.results_store import output/*.pkl   # the original runs
+    python -m simulation.results_store [policy=Cache] [period=...]
+"""
+
+import os
+import sys
+import json
+import time
+import pickle
+from contextlib import contextmanager
+from os.path import join, exists, basename, getsize
+
+import numpy as np
+from constants import *
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+RESULTS_DIR = join("output", "results")
+TABLES = {
+    "vehicles": {
+        "run": "i4",
+        "car": "i4",
+        "parking": "f8",
+        "retrieval": "f8",
+        "service_parking": "f8",
+    },
+    "samples": {
+        "run": "i4",
+        "sample": "i4",
+        "time": "f8",
+        "level": "i2",
+        "occupancy": "f8",
+    },
+}
+# Run fields queries can filter on
+RUN_FIELDS = ("run", "policy", "period", "seed", "config")
+# Tries at the append lock on Windows, a second apart, before giving up
+LOCK_ATTEMPTS = 10
+
+
+def vehicle_rows(results):
+    """``get_results`` dicts to vehicle columns, NaN for times a car has not got"""
+    times = [results[kind] for kind in ("parking", "retrieval", "service_parking")]
+    cars = sorted({int(car) for kind in times for car in kind})
+    columns = {"car": np.asarray(cars)}
+    for name, kind in zip(("parking", "retrieval", "service_parking"), times):
+        # Car ids are strings once results have been through JSON
+        by_car = {int(car): value for car, value in kind.items()}
+        columns[name] = np.asarray([by_car.get(car, np.nan) for car in cars])
+    return columns
+
+
+def sample_rows(results):
+    floors = results["floors_occupancy"]
+    samples = min((len(floor) for floor in floors), default=0)
+    sample = np.tile(np.arange(samples), len(floors))
+    return {
+        "sample": sample,
+        "time": sample * DATA_COLLECTION_INTERVAL,
+        "level": np.repeat(np.arange(len(floors)), samples),
+        "occupancy": np.concatenate([floor[:samples] for floor in floors] or [[]]),
+    }
+
+
+@contextmanager
+def locked(path):
+    """
+    Holds an exclusive lock on the file at ``path`` for the block, waiting for
+    other processes to let go of it first. The lock goes with the process, so
+    a writer that dies does not leave the store locked. On Windows the wait is
+    bounded, ``OSError`` is raised once ``LOCK_ATTEMPTS`` tries have failed
+    """
+    with open(path, "a+b") as file:
+        if fcntl is not None:
+            fcntl.flock(file, fcntl.LOCK_EX)
+        else:
+            file.seek(0)
+            for attempt in range(LOCK_ATTEMPTS):
+                try:
+                    # LK_LOCK itself retries for about a second before failing
+                    msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    if attempt == LOCK_ATTEMPTS - 1:
+                        raise
+                    time.sleep(1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(file, fcntl.LOCK_UN)
+            else:
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class ResultsStore:
+    """
+    Many writers and readers. Appends take turns through a lock file, so the
+    runs of sweeps and windows open at the same time all make it in. A run is
+    only part of the store once its line is in runs.jsonl, written after its
+    rows, so rows left behind by an interrupted append are cut off by the next
+    one. Readers never look past the rows of the runs they have read
+
+    :param directory: folder of the store, created on the first append
+    """
+
+    def __init__(self, directory=RESULTS_DIR):
+        self.directory = directory
+        self.runs_path = join(directory, "runs.jsonl")
+        self.lock_path = join(directory, "append.lock")
+        self._runs = None
+        # Bytes of runs.jsonl read into _runs, up to the end of a whole line
+        self._runs_read = 0
+
+    def column_path(self, table, column):
+        return join(self.directory, table, f"{column}.{TABLES[table][column]}")
+
+    def runs(self, **filters):
+        """
+        Runs matching every filter, a value or a list of values, e.g.
+        ``runs(policy=["Cache", "Balanced"], seed=12345)``
+        """
+        if self._runs is None:
+            self._read_runs()
+
+        for field in filters:
+            if field not in RUN_FIELDS:
+                raise KeyError(f"Unknown run field {field}, one of {RUN_FIELDS}")
+        wanted = {
+            field: set(value) if isinstance(value, (list, tuple, set)) else {value}
+            for field, value in filters.items()
+        }
+        return [
+            run
+            for run in self._runs
+            if all(run[field] in values for field, values in wanted.items())
+        ]
+
+    def _read_runs(self):
+        # Only the lines other writers have added since the last read
+        if self._runs is None:
+            self._runs = []
+        if not exists(self.runs_path):
+            return
+        with open(self.runs_path, "rb") as file:
+            file.seek(self._runs_read)
+            tail = file.read()
+        # A line without its newline is still being written
+        whole = tail[: tail.rfind(b"\n") + 1]
+        self._runs.extend(json.loads(line) for line in whole.splitlines())
+        self._runs_read += len(whole)
+
+    def row_count(self, table):
+        """Rows of ``table`` owned by runs in the store"""
+        runs = self.runs()
+        # Every append starts where the last run's rows end
+        return runs[-1]["rows"][table][1] if runs else 0
+
+    def append(self, results, policy, period, seed=None, config=None):
+        """
+        Adds a run's ``StatsBox.get_results`` and returns its run id
+
+        :param config: scenario hash of the run, see simulation.scenario
+        """
+        tables = {"vehicles": vehicle_rows(results), "samples": sample_rows(results)}
+        os.makedirs(self.directory, exist_ok=True)
+        with locked(self.lock_path):
+            return self._append(tables, policy, period, seed, config)
+
+    def _append(self, tables, policy, period, seed, config):
+        # Other writers may have added runs since they were read
+        self._read_runs()
+        runs = self._runs
+        run_id = runs[-1]["run"] + 1 if runs else 0
+
+        rows = {}
+        for table, columns in tables.items():
+            start = self.row_count(table)
+            count = len(next(iter(columns.values())))
+            columns = dict(columns, run=np.full(count, run_id))
+            os.makedirs(join(self.directory, table), exist_ok=True)
+            for column, dtype in TABLES[table].items():
+                path = self.column_path(table, column)
+                with open(path, "ab") as file:
+                    # Rows of an append that never made it into runs.jsonl
+                    file.truncate(start * np.dtype(dtype).itemsize)
+                    file.write(np.asarray(columns[column], dtype=dtype).tobytes())
+            rows[table] = [start, start + count]
+
+        run = {
+            "run": run_id,
+            "policy": policy,
+            "period": period,
+            "seed": seed,
+            "config": config,
+            "rows": rows,
+        }
+        line = (json.dumps(run) + "\n").encode()
+        with open(self.runs_path, "a+b") as file:
+            # Cut off the line of an interrupted append
+            file.truncate(self._runs_read)
+            file.write(line)
+        self._runs.append(run)
+        self._runs_read += len(line)
+        return run_id
+
+    def column(self, table, column):
+        """Whole column as a read-only memmap, nothing is read until it is used"""
+        path = self.column_path(table, column)
+        dtype = np.dtype(TABLES[table][column])
+        rows = self.row_count(table)
+        if not exists(path) or rows == 0:
+            return np.empty(0, dtype)
+        # Not past the committed rows, an append may be underway
+        rows = min(rows, getsize(path) // dtype.itemsize)
+        return np.memmap(path, dtype=dtype, mode="r", shape=(rows,))
+
+    def query(self, table, columns=None, where=None, **filters):
+        """
+        Columns of the rows of ``table`` belonging to the runs matching
+        ``filters`` (see :meth:`runs`), as ``{column: array}``. Only the rows of
+        those runs are read, one run at a time
+
+        :param columns: columns to return, all of them by default
+        :param where: ``{column: function(array) -> bool mask}`` row predicates
+        """
+        columns = list(columns or TABLES[table])
+        where = where or {}
+        needed = list(dict.fromkeys(columns + list(where)))
+        memmaps = {column: self.column(table, column) for column in needed}
+
+        parts = {column: [] for column in columns}
+        for run in self.runs(**filters):
+            start, stop = run["rows"][table]
+            chunk = {column: memmaps[column][start:stop] for column in needed}
+            mask = np.ones(stop - start, dtype=bool)
+            for column, predicate in where.items():
+                mask &= predicate(chunk[column])
+            for column in columns:
+                parts[column].append(np.asarray(chunk[column][mask]))
+
+        return {
+            column: (
+                np.concatenate(arrays) if arrays else np.empty(0, TABLES[table][column])
+            )
+            for column, arrays in parts.items()
+        }
+
+    def run_results(self, run_id):
+        """One run back in the ``StatsBox.get_results`` form"""
+        (run,) = self.runs(run=run_id)
+        vehicles = self.query("vehicles", run=run_id)
+        results = {}
+        for kind in ("parking", "retrieval", "service_parking"):
+            known = ~np.isnan(vehicles[kind])
+            results[kind] = dict(
+                zip(vehicles["car"][known].tolist(), vehicles[kind][known].tolist())
+            )
+
+        samples = self.query("samples", ["level", "occupancy"], run=run_id)
+        levels = int(samples["level"].max()) + 1 if len(samples["level"]) else 0
+        results["floors_occupancy"] = [
+            samples["occupancy"][samples["level"] == level].tolist()
+            for level in range(levels)
+        ]
+        return results
+
+
+def import_pickles(paths, store):
+    """Per-run pickles of ``StatsBox.show_stats``, named ``<policy>-<period>.pkl``"""
+    for path in paths:
+        with open(path, "rb") as file:
+            results = pickle.load(file)
+        name = basename(path)[: -len(".pkl")]
+        # Policy names have dashes too, the period starts at the first digit
+        split = next(idx for idx, char in enumerate(name) if char.isdigit()) - 1
+        policy, period = name[:split], name[split + 1 :] + ".csv"
+        run_id = store.append(results, policy, period)
+        print(f"{path}: run {run_id}, {policy} {period}")
+
+
+if __name__ == "__main__":
+    store = ResultsStore()
+    if sys.argv[1:2] == ["import"]:
+        import_pickles(sys.argv[2:], store)
+        sys.exit()
+
+    filters = {}
+    for option in sys.argv[1:]:
+        field, value = option.split("=", 1)
+        filters[field] = int(value) if field in ("run", "seed") else value
+    for run in store.runs(**filters):
+        vehicles = store.query("vehicles", ["parking", "retrieval"], run=run["run"])
+        print(
+            "%4d %-14s %-16s %-6s parking %.3f, retrieval %.3f mins"
+            % (
+                run["run"],
+                run["policy"],
+                run["period"],
+                run["seed"],
+                np.nanmean(vehicles["parking"]),
+                np.nanmean(vehicles["retrieval"]),
+            )
+        )
@@ -0,0 +1,184 @@
+"""
+Statistics of waiting and service times kept up to date one value at a time,
+so the HUD, the logger and the sweep runner read them without going over
+every car served so far.
+
+- ``RunningStats`` count, mean, variance, min and max (Welford)
+- ``QuantileSketch`` quantiles to within a relative error, in log buckets
+- ``StreamingStats`` both together, what ``StatsBox`` keeps per kind of time
+
+All three merge, e.g. the runs of a sweep into one summary per policy.
+"""
+
+import math
+
+# Relative error of the quantiles
+SKETCH_ACCURACY = 0.01
+# Values at or below this count as 0, the times are rounded to 0.01 mins
+SKETCH_MIN_VALUE = 1e-6
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class RunningStats:
+    def __init__(self):
+        self.count = 0
+        self.mean = math.nan
+        self.min = math.nan
+        self.max = math.nan
+        # Sum of squared differences from the mean
+        self._m2 = 0.0
+
+    def add(self, value):
+        self.count += 1
+        if self.count == 1:
+            self.mean = self.min = self.max = value
+            return
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        if not other.count:
+            return self
+        if not self.count:
+            self.count, self.mean, self._m2 = other.count, other.mean, other._m2
+            self.min, self.max = other.min, other.max
+            return self
+
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self._m2 += other._m2 + delta**2 * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def variance(self):
+        """Population variance, as ``np.var``"""
+        return self._m2 / self.count if self.count else math.nan
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+
+class QuantileSketch:
+    """
+    Value ``v`` is counted in bucket ``ceil(log(v) / log(gamma))``, so every
+    value of a bucket is within ``accuracy`` of the bucket's estimate. Memory
+    grows with the range of the values, not their number. Sketches of the same
+    accuracy merge by adding up their buckets
+
+    :param accuracy: relative error of the quantiles, ``SKETCH_ACCURACY`` by default
+    """
+
+    def __init__(self, accuracy=None):
+        if accuracy is None:
+            accuracy = SKETCH_ACCURACY
+        self.accuracy = accuracy
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self._log_gamma = math.log(self.gamma)
+        # Bucket index -> number of values
+        self.buckets = {}
+        self.zero_count = 0
+        self.count = 0
+        # Sorted bucket indices and quantiles, until the next value comes in
+        self._indices = None
+        self._quantiles = {}
+
+    def add(self, value):
+        self.count += 1
+        self._quantiles = {}
+        if value <= SKETCH_MIN_VALUE:
+            self.zero_count += 1
+            return
+        index = math.ceil(math.log(value) / self._log_gamma)
+        if index not in self.buckets:
+            self.buckets[index] = 0
+            self._indices = None
+        self.buckets[index] += 1
+
+    def merge(self, other):
+        if other.accuracy != self.accuracy:
+            raise ValueError("Only sketches of the same accuracy can be merged")
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self._indices = None
+        self._quantiles = {}
+        return self
+
+    def quantile(self, q):
+        if not self.count:
+            return math.nan
+        if q in self._quantiles:
+            return self._quantiles[q]
+        if self._indices is None:
+            self._indices = sorted(self.buckets)
+
+        # Same rank as the lower of np.quantile's two neighbours
+        rank = q * (self.count - 1)
+        value = 0.0
+        seen = self.zero_count
+        if seen <= rank:
+            for index in self._indices:
+                seen += self.buckets[index]
+                if seen > rank:
+                    value = 2 * self.gamma**index / (self.gamma + 1)
+                    break
+        self._quantiles[q] = value
+        return value
+
+
+class StreamingStats:
+    def __init__(self, accuracy=None):
+        self.moments = RunningStats()
+        self.sketch = QuantileSketch(accuracy)
+
+    @classmethod
+    def of(cls, values):
+        stats = cls()
+        for value in values:
+            stats.add(value)
+        return stats
+
+    def add(self, value):
+        self.moments.add(value)
+        self.sketch.add(value)
+
+    def merge(self, other):
+        self.moments.merge(other.moments)
+        self.sketch.merge(other.sketch)
+        return self
+
+    @property
+    def count(self):
+        return self.moments.count
+
+    @property
+    def mean(self):
+        return self.moments.mean
+
+    @property
+    def std(self):
+        return self.moments.std
+
+    def quantile(self, q):
+        return self.sketch.quantile(q)
+
+    def summary(self):
+        summary = {
+            "count": self.count,
+            "mean": self.mean,
+            "std": self.std,
+            "min": self.moments.min,
+            "max": self.moments.max,
+        }
+        for q in QUANTILES:
+            summary[f"p{round(q * 100)}"] = self.quantile(q)
+        return summary
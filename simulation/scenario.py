@@ -0,0 +1,214 @@
+"""
+Scenario files, one headless run described in full, and a result cache keyed
+by the scenario's content hash. A scenario is a TOML file:
+
+    policy = "Cache"
+    period = "6-14 Hours.csv"         # file in data/slices/
+    seed = 10
+    layout = "default"                # name in layouts/, a path, or a [layout] table
+
+    [constants]                       # any constant of constants.py
+    LIFT_SPEED = 90
+    DRIVE_IN_OUT = [0.5, 1.0]
+
+The hash covers the policy, seed, constants, the layout it resolves to, the
+contents of the period slice and the simulation source code, so an unchanged
+scenario is only ever simulated once.
+
+    python -m simulation.scenario scenarios/peak-cache.toml [...]
+"""
+
+import os
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import sys
+import json
+import glob
+import time
+import hashlib
+import functools
+from os.path import join, exists, dirname
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    import tomli as tomllib
+
+import numpy as np
+
+import constants as project_constants
+from constants import *
+from classes.geometry import Geometry
+from classes.policies import get_policy
+from simulation.sweep import apply_constants, CACHE_DIR
+
+# Files a run's results depend on, besides the scenario and its period slice
+SOURCES = ["constants.py", "classes/*.py", "simulation/*.py", "animation/*.py"]
+SCENARIO_KEYS = ("policy", "period", "seed", "layout", "constants")
+
+
+def make_scenario(policy, period, seed=None, layout=None, constants=None):
+    """
+    Scenario with the same fields as a sweep run, plus ``layout``
+
+    :param layout: name or path of a layout file, a layout table, or None for
+        the ``LAYOUT`` constant
+    """
+    get_policy(policy)
+    overrides = dict(constants or {})
+    for name in overrides:
+        if not hasattr(project_constants, name):
+            raise KeyError(f"Unknown constant {name}")
+    if not exists(join("data", "slices", period)):
+        raise FileNotFoundError(f"No period slice data/slices/{period}")
+
+    if seed is None:
+        seed = RANDOM_SEEDS
+    scenario = {"policy": policy, "period": period, "seed": seed}
+    scenario["constants"] = overrides
+    if layout is not None:
+        scenario["layout"] = layout
+    return scenario
+
+
+def load_scenario(path):
+    with open(path, "rb") as file:
+        fields = tomllib.load(file)
+    unknown = set(fields) - set(SCENARIO_KEYS)
+    if unknown:
+        raise KeyError(f"Unknown scenario fields {sorted(unknown)} in {path}")
+    return make_scenario(**fields)
+
+
+def scenario_geometry(scenario):
+    """``Geometry`` of the scenario, once its constants are applied"""
+    layout = scenario.get("layout")
+    if isinstance(layout, dict):
+        return Geometry(name="scenario", **layout)
+    return Geometry.load(layout)
+
+
+@functools.lru_cache(maxsize=None)
+def source_digest():
+    digest = hashlib.sha256()
+    for pattern in SOURCES:
+        for path in sorted(glob.glob(pattern)):
+            digest.update(path.encode())
+            with open(path, "rb") as file:
+                digest.update(file.read())
+    return digest.hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def file_digest(path):
+    with open(path, "rb") as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def scenario_hash(scenario):
+    """Hex digest of everything the scenario's results depend on"""
+    previous = apply_constants(scenario["constants"])
+    try:
+        geometry = scenario_geometry(scenario)
+    finally:
+        apply_constants(previous)
+
+    canonical = {
+        "policy": scenario["policy"],
+        "seed": scenario["seed"],
+        "constants": scenario["constants"],
+        "layout": geometry.to_dict(),
+        "period": file_digest(join("data", "slices", scenario["period"])),
+        "source": source_digest(),
+    }
+    text = json.dumps(canonical, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    ``StatsBox.get_results`` of finished runs, one JSON file per scenario hash.
+    Written to a temporary file first, so parallel sweep workers never read a
+    half written result
+    """
+
+    def __init__(self, directory=CACHE_DIR):
+        self.directory = directory
+
+    def path(self, key):
+        return join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key):
+        path = self.path(key)
+        if not exists(path):
+            return None
+        with open(path) as file:
+            return json.load(file)
+
+    def put(self, key, results):
+        path = self.path(key)
+        os.makedirs(dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as file:
+            json.dump(results, file)
+        os.replace(temp_path, path)
+
+
+def run_scenario(scenario, cache=None, time_limit=None):
+    """
+    Results of the scenario, from ``cache`` when it has been run before.
+    Returns ``(results, cached)``, car ids are strings either way, as in JSON
+
+    :param cache: ``ResultCache``, or None to always simulate
+    """
+    key = scenario_hash(scenario) if cache is not None else None
+    if key is not None:
+        results = cache.get(key)
+        if results is not None:
+            return results, True
+
+    # Only needed, and slow to import, when the scenario is simulated
+    from simulation.headless import headless_simulation
+
+    previous = apply_constants(scenario["constants"])
+    try:
+        stats_box = headless_simulation(
+            scenario["policy"],
+            scenario["period"],
+            seed=scenario["seed"],
+            time_limit=time_limit,
+            geometry=scenario_geometry(scenario),
+        )
+    finally:
+        apply_constants(previous)
+
+    # Same form as a cached result
+    results = json.loads(json.dumps(stats_box.get_results()))
+    if key is not None:
+        cache.put(key, results)
+    return results, False
+
+
+if __name__ == "__main__":
+    cache = ResultCache()
+    for path in sys.argv[1:]:
+        scenario = load_scenario(path)
+        started = time.perf_counter()
+        results, cached = run_scenario(scenario, cache)
+        means = {
+            key: np.mean(list(results[key].values()))
+            for key in ["parking", "retrieval", "service_parking"]
+        }
+        print(
+            "%s %s %s (%.2fs): parking %.3f, retrieval %.3f, service %.3f mins"
+            % (
+                path,
+                scenario_hash(scenario)[:12],
+                "cached" if cached else "ran",
+                time.perf_counter() - started,
+                means["parking"],
+                means["retrieval"],
+                means["service_parking"],
+            )
+        )
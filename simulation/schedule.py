@@ -0,0 +1,63 @@
+"""
+Every random draw a car needs, sampled for the whole period slice up front
+from one NumPy generator, so a run is reproducible from its seed alone.
+"""
+
+import numpy as np
+from constants import *
+
+
+class ArrivalSchedule:
+    """
+    Cars are numbered from 1 in arrival order, car ``car_id`` is entry
+    ``car_id - 1`` of every array.
+
+    :param car_arrival_list: number of cars arriving in each minute of the slice
+    :param seed: seed of the generator the whole schedule is drawn from,
+        ``RANDOM_SEEDS`` by default
+    """
+
+    def __init__(self, car_arrival_list, seed=None):
+        if seed is None:
+            seed = RANDOM_SEEDS
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        counts = np.asarray(car_arrival_list, dtype=int)
+        num_of_cars = int(counts.sum())
+
+        # Minute of the slice each car arrives in, and its offset within it
+        self.minute = np.repeat(np.arange(len(counts)), counts)
+        self.offset = np.round(rng.uniform(0.0, 1.0, num_of_cars), 2)
+        # How long each car stays parked
+        self.duration = (
+            rng.weibull(CAR_DURATION_SHAPE, num_of_cars) * CAR_DURATION_SCALE * 60
+        )
+        # Driver driving into the loading bay, then out of the lift bay
+        self.drive_in = rng.uniform(*DRIVE_IN_OUT, num_of_cars)
+        self.drive_out = rng.uniform(*DRIVE_IN_OUT, num_of_cars)
+
+        self.counts = counts.tolist()
+        # Python floats, as simpy timeouts are handed one value at a time
+        self._offset = self.offset.tolist()
+        self._duration = self.duration.tolist()
+        self._drive_in = self.drive_in.tolist()
+        self._drive_out = self.drive_out.tolist()
+
+    def __len__(self):
+        return len(self._offset)
+
+    def minutes(self):
+        """Yields the car ids arriving in each minute of the slice, in order"""
+        car_id = 1
+        for count in self.counts:
+            yield range(car_id, car_id + count)
+            car_id += count
+
+    def offset_of(self, car_id):
+        return self._offset[car_id - 1]
+
+    def duration_of(self, car_id):
+        return self._duration[car_id - 1]
+
+    def drive_times_of(self, car_id):
+        return self._drive_in[car_id - 1], self._drive_out[car_id - 1]
@@ -0,0 +1,301 @@
+"""
+Runs the cross product of policy x period slice x seed x constants overrides
+as headless simulations spread over a process pool. Every finished run is
+appended to one JSON-lines file as soon as it comes back, so a crashed or
+interrupted sweep can be resumed where it stopped. Its results go to the
+columnar results store, see simulation.results_store.
+"""
+
+import os
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import sys
+import json
+import time
+import itertools
+import traceback
+from os.path import join, exists
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+
+import constants
+from constants import *
+from classes.policies import PLACEMENT_POLICIES, get_policy
+from simulation.results_store import ResultsStore, RESULTS_DIR
+
+POLICIES = list(PLACEMENT_POLICIES)
+# Results of every run, keyed by scenario hash, see simulation.scenario
+CACHE_DIR = join("output", "cache")
+PERIODS = ["0-6 Hours.csv", "6-14 Hours.csv", "14-20 Hours.csv", "20-24 Hours.csv"]
+
+# Packages whose modules pick up constants through ``from constants import *``,
+# and the script being run
+PROJECT_PACKAGES = (
+    "constants",
+    "core",
+    "main",
+    "__main__",
+    "animation",
+    "classes",
+    "simulation",
+)
+
+
+def build_runs(policies, periods, seeds, constants_grid=None):
+    """
+    :param seeds: list of seeds, or the number of seeds counting up from RANDOM_SEEDS
+    :param constants_grid: list of ``{name: value}`` overrides, one entry per carpark variant
+    """
+    if isinstance(seeds, int):
+        seeds = [RANDOM_SEEDS + i for i in range(seeds)]
+    if not constants_grid:
+        constants_grid = [{}]
+    for policy in policies:
+        get_policy(policy)  # Fail before starting any run
+
+    runs = []
+    for policy, period, seed, overrides in itertools.product(
+        policies, periods, seeds, constants_grid
+    ):
+        runs.append(
+            {
+                "policy": policy,
+                "period": period,
+                "seed": seed,
+                "constants": dict(overrides),
+            }
+        )
+
+    return runs
+
+
+def run_key(run):
+    key = [run["policy"], run["period"], run["seed"], run["constants"]]
+    if "layout" in run:
+        key.append(run["layout"])
+    return json.dumps(key, sort_keys=True)
+
+
+def run_label(record):
+    """Policy, period and seed of a run, and what sets its carpark apart"""
+    label = "%s %s seed %d" % (record["policy"], record["period"], record["seed"])
+    if record["constants"]:
+        overrides = sorted(record["constants"].items())
+        label += " " + ", ".join(f"{name}={value!r}" for name, value in overrides)
+    if "config" in record:
+        label += " [%s]" % record["config"][:12]
+    return label
+
+
+def apply_constants(overrides):
+    """
+    Sets constants for this process, including the copies made by star imports.
+    Returns the previous values so they can be put back with the same function.
+    """
+    previous = {}
+    for name, value in overrides.items():
+        if not hasattr(constants, name):
+            raise KeyError(f"Unknown constant {name}")
+        previous[name] = getattr(constants, name)
+
+        for module_name, module in list(sys.modules.items()):
+            if module_name.split(".")[0] not in PROJECT_PACKAGES:
+                continue
+            if name in vars(module):
+                setattr(module, name, value)
+
+    return previous
+
+
+def run_one(run, time_limit=None, cache_dir=None):
+    """
+    Worker entry point, runs a single simulation and returns its record. A run
+    is a scenario, see simulation.scenario, its results are taken from the
+    result cache in ``cache_dir`` when it has been run before
+    """
+    from simulation.headless import SimulationTimeout
+    from simulation.scenario import ResultCache, run_scenario, scenario_hash
+    from simulation.running_stats import StreamingStats
+
+    record = dict(run)
+    started = time.perf_counter()
+    cache = ResultCache(cache_dir) if cache_dir is not None else None
+    try:
+        record["config"] = scenario_hash(run)
+        record["results"], record["cached"] = run_scenario(run, cache, time_limit)
+        # Kept with the run's record, the rows themselves go to the results store
+        record["summary"] = {
+            kind: StreamingStats.of(record["results"][kind].values()).summary()
+            for kind in ["parking", "retrieval", "service_parking"]
+        }
+        record["status"] = "ok"
+    except SimulationTimeout:
+        record["status"] = "timeout"
+        record["error"] = traceback.format_exc()
+    except Exception:
+        record["status"] = "error"
+        record["error"] = traceback.format_exc()
+    record["wall_time"] = round(time.perf_counter() - started, 3)
+
+    return record
+
+
+def load_finished(store_path):
+    finished = set()
+    if exists(store_path):
+        with open(store_path) as file:
+            for line in file:
+                record = json.loads(line)
+                if record["status"] == "ok":
+                    finished.add(run_key(record))
+
+    return finished
+
+
+def kill_pool(executor):
+    # A stuck worker never returns, so the pool has to be torn down by force
+    for process in list(getattr(executor, "_processes", {}).values()):
+        process.terminate()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def sweep(
+    runs,
+    store_path=join("output", "sweep.jsonl"),
+    workers=None,
+    time_limit=600,
+    retries=1,
+    resume=True,
+    logger=None,
+    cache_dir=CACHE_DIR,
+    results_dir=RESULTS_DIR,
+):
+    """
+    Runs every entry of ``runs`` (see :func:`build_runs`) on a process pool sized
+    to the cores. At most one run per worker is in flight, so a run's submit time
+    is also its start time and a worker that outlives ``time_limit`` by a grace
+    period is killed. Runs lost to a crashed or killed worker are retried up to
+    ``retries`` times before being stored as failed. Runs already in the result
+    cache at ``cache_dir`` come back without being simulated, None turns it off.
+    Results are appended to the ``ResultsStore`` in ``results_dir``, the
+    record only keeps their run id. A run whose config hash is already in the
+    store, like one out of the cache, gets the id it was stored under.
+    """
+    workers = workers or os.cpu_count()
+    finished = load_finished(store_path) if resume else set()
+    pending = [run for run in runs if run_key(run) not in finished]
+    attempts = {run_key(run): 0 for run in pending}
+    # Leave the worker its own watchdog first, only kill it if that fails
+    grace = time_limit * 0.5 + 30 if time_limit else None
+
+    def log(message):
+        if logger:
+            logger.info(message)
+        else:
+            print(message)
+
+    log(f"Sweep: {len(pending)} runs to do, {len(runs) - len(pending)} already stored")
+
+    done_count = 0
+    results_store = ResultsStore(results_dir)
+    # config hash -> id of the last run stored under it
+    stored = {run["config"]: run["run"] for run in results_store.runs()}
+    with open(store_path, "a") as store:
+
+        def save(record):
+            nonlocal done_count
+            if "results" in record:
+                results = record.pop("results")
+                # A cached run was stored when it first ran, only its id is needed
+                if record["config"] not in stored:
+                    stored[record["config"]] = results_store.append(
+                        results,
+                        record["policy"],
+                        record["period"],
+                        record["seed"],
+                        record["config"],
+                    )
+                record["run_id"] = stored[record["config"]]
+            store.write(json.dumps(record) + "\n")
+            store.flush()
+            done_count += 1
+            log(
+                "[%d/%d] %s: %s (%.1fs)"
+                % (
+                    done_count,
+                    len(pending),
+                    run_label(record),
+                    record["status"],
+                    record.get("wall_time", 0.0),
+                )
+            )
+
+        def lost(run, reason):
+            key = run_key(run)
+            attempts[key] += 1
+            if attempts[key] > retries:
+                save(dict(run, status=reason, error=f"worker {reason}"))
+            else:
+                queue.append(run)
+
+        queue = list(reversed(pending))
+        # Runs that were in flight when a worker died, rerun one at a time so
+        # only the run that brings the worker down uses up its retries
+        suspects = []
+        while queue or suspects:
+            executor = ProcessPoolExecutor(max_workers=workers)
+            in_flight = {}
+            try:
+                while queue or suspects or in_flight:
+                    if suspects:
+                        if not in_flight:
+                            run = suspects.pop()
+                            future = executor.submit(
+                                run_one, run, time_limit, cache_dir
+                            )
+                            in_flight[future] = (run, time.monotonic())
+                    else:
+                        while queue and len(in_flight) < workers:
+                            run = queue.pop()
+                            future = executor.submit(
+                                run_one, run, time_limit, cache_dir
+                            )
+                            in_flight[future] = (run, time.monotonic())
+
+                    done, _ = wait(in_flight, timeout=5, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        record = future.result()
+                        del in_flight[future]
+                        save(record)
+
+                    if grace is not None:
+                        now = time.monotonic()
+                        stuck = [
+                            future
+                            for future, (_, submitted) in in_flight.items()
+                            if now - submitted > time_limit + grace
+                        ]
+                        if stuck:
+                            kill_pool(executor)
+                            for future in stuck:
+                                lost(in_flight.pop(future)[0], "timeout")
+                            # The rest were killed along with the pool, run them again
+                            queue.extend(run for run, _ in in_flight.values())
+                            in_flight = {}
+                            break
+            except BrokenProcessPool:
+                if len(in_flight) == 1:
+                    for run, _ in in_flight.values():
+                        lost(run, "crashed")
+                else:
+                    suspects.extend(run for run, _ in in_flight.values())
+            finally:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+    return store_path
+
+
+def load_sweep(store_path=join("output", "sweep.jsonl")):
+    with open(store_path) as file:
+        return [json.loads(line) for line in file]
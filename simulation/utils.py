@@ -2,41 +2,30 @@ import pandas as pd
 import os
 from simpy.util import start_delayed
 import random
-from scipy.stats import weibull_min
 from constants import *
 from os.path import join
 
 from classes.vehicle import Vehicle
+from simulation.schedule import ArrivalSchedule
+from simulation import events
 from animation.popup import Popup
 
 import logging
 import datetime
 
 
-def process_car_arrival_csv():
-    period = os.environ["PERIOD"]
+def process_car_arrival_csv(period=None):
+    if period is None:
+        period = os.environ["PERIOD"]
     df = pd.read_csv(join("data", "slices", period))
     # df = pd.read_csv(join("data", "slices", "6-14 Hours.csv"))
     # df = pd.read_csv(join("data", "slices", "test.csv"))
     return df["car_arrival_rate"].tolist()
 
 
-def generate_times(car_arrival, logger):
-    times = []
-
-    for _ in range(car_arrival):
-        # Generate a random time between 0 and the remaining time
-        time_interval = round(random.uniform(0.0, 1.0), 2)
-        times.append(time_interval)
-
-    return times
-
-
-def run(env, renderer, carpark, car_id, delay, logger):
+def run(env, renderer, carpark, car_id, delay, duration):
     yield env.timeout(delay)
-    logger.info(
-        "Car %d arrived at the entrance of the carpark at %.2f." % (car_id, env.now)
-    )
+    carpark.recorder.record(events.ARRIVED, car_id)
     # Log waiting time - START
     time_start = env.now
 
@@ -44,44 +33,38 @@ def run(env, renderer, carpark, car_id, delay, logger):
     yield parking_lot_request
     vehicle = carpark.parking_queue.pop(0)
 
-    renderer.add(vehicle)
+    if renderer is not None:
+        renderer.add(vehicle)
     yield env.process(carpark.park(vehicle, time_start))
 
-    duration = weibull_min.rvs(c=CAR_DURATION_SHAPE, scale=CAR_DURATION_SCALE) * 60
     # duration = expon.rvs(scale=1 / CAR_RATE)
     # duration = 0.7  # 0.7  # 0.67  # 0.65  # 0.6  # 0.46  # 0.42  # 0.4  # 0.35  # 0.3
     # duration = random.randint(1, 2)
     # duration = 15
-    vehicle.popup.set_text("exiting time", round(env.now + duration, 2))
-    logger.info(
-        "Car %d will be retrieved from parking lot %d at %.2f (+%.2f)"
-        % (
-            vehicle.id,
-            vehicle.parking_lot[1],
-            env.now + duration,
-            duration,
-        )
+    if vehicle.popup is not None:
+        vehicle.popup.set_text("exiting time", round(env.now + duration, 2))
+    carpark.recorder.record(
+        events.RETRIEVAL_SCHEDULED,
+        vehicle.id,
+        vehicle.parking_lot[1],
+        env.now + duration,
+        duration,
     )
 
-    buffer = duration - CALL_FOR_RETRIEVAL
+    # Drivers back within CALL_FOR_RETRIEVAL mins call as soon as they are parked
+    buffer = max(0, duration - CALL_FOR_RETRIEVAL)
     buffer_duration = env.timeout(buffer)
-    if carpark.policy == "Cache" and vehicle.parking_lot[0] == 0:
-        # Drivers will alert 10 mins before collecting their vehicles
-        move_process = env.process(
-            carpark.move_vehicle_on_idle_shuttle(vehicle, parking_lot_request)
-        )
-        yield buffer_duration | move_process
-
-        if not move_process.triggered:
-            move_process.interrupt()
-        else:
-            yield buffer_duration
-            yield env.process(
-                move_ground_to_exit(env, carpark, vehicle, parking_lot_request)
-            )
-
+    # The policy may move the car around until the driver alerts, 10 mins
+    # before collecting their vehicle
+    carpark.placement.parked(vehicle, parking_lot_request, env.now + buffer)
+    yield buffer_duration
+
+    move_process = carpark.placement.called(vehicle)
+    if move_process is not None:
+        move_process.interrupt()
+        # The interrupted shuffle takes the car out itself
+        yield move_process
     else:
-        yield buffer_duration
         yield env.process(
             move_ground_to_exit(env, carpark, vehicle, parking_lot_request)
         )
@@ -91,19 +74,13 @@ def move_ground_to_exit(env, carpark, vehicle, parking_lot_request):
     remain_time = env.timeout(CALL_FOR_RETRIEVAL)
     remain_time_end = env.now + CALL_FOR_RETRIEVAL
 
-    if vehicle.parking_lot[0] > 0:
-        print("Car %d: Driver called for retrieval at %.2f" % (vehicle.id, env.now))
-        ground_time_process = env.process(
-            carpark.move_to_ground_level(vehicle, remain_time_end)
-        )
-
-        yield ground_time_process
+    yield from carpark.placement.prestage(vehicle, remain_time_end)
 
     yield remain_time
-    env.process(carpark.exit(vehicle, parking_lot_request))
+    yield env.process(carpark.exit(vehicle, parking_lot_request))
 
 
-def vehicle_arrival(env, renderer, carpark, logger):
+def vehicle_arrival(env, renderer, carpark, schedule=None):
     files_list = os.listdir(join("assets", "Cars"))
     car_names = [os.path.splitext(file)[0] for file in files_list]
     vehicle_placement = (
@@ -111,20 +88,26 @@ def vehicle_arrival(env, renderer, carpark, logger):
         HEIGHT - 2 * STATS_HEIGHT - 5,
     )  # 24 = half the width of vehicle sprite
 
-    car_arrival_list = process_car_arrival_csv()
-    car_id = 1
+    if schedule is None:
+        schedule = ArrivalSchedule(process_car_arrival_csv())
+    # Car sprites are picked from their own stream, seeded like the run, so the
+    # look of a run never shifts the random draws the simulation depends on
+    cosmetic_random = random.Random(schedule.seed)
 
-    for car_arrival in car_arrival_list:
+    cars = []
+    for car_ids in schedule.minutes():
         # logger.warn(f"Time now: {env.now}")
-        if car_arrival != 0:
-            random_times_list = generate_times(car_arrival, logger)
-            formatted_list = ", ".join(map(str, random_times_list))
-            logger.info(f"Random list: {formatted_list}")
+        if car_ids:
+            if carpark.recorder.enabled(events.ARRIVAL_OFFSETS):
+                random_times_list = [schedule.offset_of(car_id) for car_id in car_ids]
+                carpark.recorder.record(
+                    events.ARRIVAL_OFFSETS, ", ".join(map(str, random_times_list))
+                )
 
-            for random_time in random_times_list:
+            for car_id in car_ids:
                 popup = Popup(car_id)
 
-                car_name = random.choice(car_names)
+                car_name = cosmetic_random.choice(car_names)
                 vehicle = Vehicle(
                     vehicle_placement[0],
                     vehicle_placement[1],
@@ -133,96 +116,41 @@ def vehicle_arrival(env, renderer, carpark, logger):
                     car_png=car_name,
                     popup=popup,
                 )
+                vehicle.drive_in_time, vehicle.drive_out_time = schedule.drive_times_of(
+                    car_id
+                )
                 carpark.parking_queue.append(vehicle)
                 carpark.stats_box.stats["Cars Waiting"] += 1
 
-                env.process(run(env, renderer, carpark, car_id, random_time, logger))
-                car_id += 1
+                cars.append(
+                    env.process(
+                        run(
+                            env,
+                            renderer,
+                            carpark,
+                            car_id,
+                            schedule.offset_of(car_id),
+                            schedule.duration_of(car_id),
+                        )
+                    )
+                )
 
         yield env.timeout(1)
-    logger.info("--No more incoming vehicles--")
-
-
-# v_lot is wrt to x axis
-# a_lot is the actual lot number
-def lift_wrt_lot(pos, v_lot, a_lot, turning):
-    time_taken_from_lift_to_pallet = round(WIDTH_PER_CAR / PALLET_SPEED, 2)
-
-    time_taken_from_origin_to_lot = round(
-        (WIDTH_PER_CAR * (abs(pos - v_lot))) / SHUTTLE_SPEED, 2
-    )
+    carpark.recorder.record(events.ARRIVALS_DONE)
 
-    # Rotate vehicle
-    time_taken_to_rotate = round(180 / (ROTARY * 360), 2)
-
-    # Pallet to lot
-    time_taken_from_pallet_to_lot = round(WIDTH_PER_CAR / PALLET_SPEED, 2)
-
-    time_takens = {
-        "lift_pallet": time_taken_from_lift_to_pallet,  # lift to pallet
-        "pallet_lot": time_taken_from_pallet_to_lot,  # pallet to lot
-        "origin_lot": time_taken_from_origin_to_lot,  # origin to lot
-        "turning": 0,
-    }
-
-    # logger.info("--------------")
-    # logger.info("%.2f time taken for lift to pallet" % time_taken_from_lift_to_pallet)
-    # logger.info(
-    #     "%.2f time taken to travel %.2fm"
-    #     % (
-    #         time_taken_from_origin_to_lot,
-    #         WIDTH_PER_CAR * (abs(pos- v_lot)),
-    #     )
-    # )
-    if turning:
-        time_takens["turning"] = time_taken_to_rotate
-        # logger.info("%.2f time taken to rotate car" % time_taken_to_rotate)
-    # logger.info("%.2f time taken for pallet to lot" % time_taken_from_pallet_to_lot)
-
-    total = 0
-    for value in time_takens.values():
-        total += value
-    time_takens["total"] = round(total, 2)
-
-    return time_takens
-
-
-def create_lifts_data(lifts_pos, cache=False):
-    lifts = []
-    for lift in lifts_pos:
-        cur_lots = {}
-        # North part of carpark (v_lot same as a_lot)
-        for v_lot in range(1, 27):
-            cur_lots[v_lot] = lift_wrt_lot(lift, v_lot, v_lot, True)
-
-        # South-West part of carpark
-        range_end = 5 if cache else 8  # for cache
-        a_lot = 27
-        for v_lot in range(1, range_end):
-            cur_lots[a_lot] = lift_wrt_lot(lift, v_lot, a_lot, True)
-            a_lot += 1
-
-        # South-East part of carpark
-        a_lot = 34
-        for v_lot in range(20, 26):
-            cur_lots[a_lot] = lift_wrt_lot(lift, v_lot, a_lot, True)
-            a_lot += 1
-
-        lifts.append(cur_lots)
-
-    return lifts
+    # Done once the last car has left the carpark, where an export stops
+    yield env.all_of(cars)
 
 
 def collect_floor(env, carpark, instance_type):
     floors = carpark.stats_box.utilization_stats["floors"]
 
-    isCache = True if instance_type == "Cache" else False
+    isCache = carpark.placement.cache_level
+    lots_per_level = carpark.geometry.lots_per_level(isCache)
+    floors.extend([] for _ in range(len(floors), len(lots_per_level)))
 
     while True:
-        for lvl in range(NUM_OF_LEVELS):
-            parking_per_level = NUM_OF_PARKING_PER_LEVEL
-            if lvl == 0 and isCache:
-                parking_per_level = NUM_OF_PARKING_LOBBY
+        for lvl, parking_per_level in enumerate(lots_per_level):
             cars_per_lvl = (
                 parking_per_level - carpark.available_parking_lots_per_level[lvl]
             )